@@ -0,0 +1,301 @@
+"""
+Banco de balanceamento: muitas partidas headless em paralelo.
+
+Cada sessão é um Game headless com uma semente, um jogador (script ou piloto
+automático) e, opcionalmente, uma variante dos dados do AssetManager
+(bullet_properties, enemy_definitions, movement_patterns, ...). As sessões
+rodam num pool de processos, uma por núcleo, e os resultados são agregados
+num relatório:
+
+    - tempo até a morte (TTK) por arma e por tipo de inimigo: frames entre o
+      primeiro acerto e o abate, e quantos acertos foram precisos (só os abates
+      em que uma única arma causou todo o dano; os outros são contados à parte);
+    - tempo para limpar cada onda;
+    - dano recebido pelo jogador, por origem;
+    - custo de frame (p50/p99 do update).
+
+Tudo, menos o custo de frame, depende só da semente, do script e da variante:
+a mesma linha de comando produz o mesmo relatório em qualquer máquina e com
+qualquer número de processos.
+
+Uso:
+    python balance.py --seeds 32 --frames 7200
+    python balance.py --override mais_dano.json --override '{"bullet_properties": {"blue": {"damage": 1}}}'
+    python balance.py --weapon orange --category asteroids --json relatorio.json
+    python balance.py --player autopilot --seeds 64
+
+Um override é um arquivo JSON (ou o próprio JSON na linha de comando) com as
+seções a mesclar, no formato de AssetManager.apply_overrides. Cada override é
+uma variante; a variante 'base' (sem override) sempre roda para comparação.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import weakref
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyxel
+
+from benchmark import make_invulnerable, select_weapon
+from ship_gamev21 import Asteroid, AssetManager, AutopilotInput, FrameClock, Game, GameplayHooks, ScriptedInput, SeededRandom
+
+WEAPON_CYCLE_FRAMES = 600 # O script 'cycle' troca de arma a cada 10 segundos de jogo
+CHARGE_RELEASE_FRAMES = 50 # Solta o tiro a cada 50 frames, para as armas de carga dispararem
+SWEEP_FRAMES = 128 # Frames para a nave (1 px por frame) atravessar a tela de uma borda à outra
+
+
+def sweep_fire(frame):
+    """
+    Segura o tiro e varre a tela de borda a borda: sai do centro para a direita e
+    vai e volta a cada SWEEP_FRAMES, passando por baixo de todas as colunas da formação.
+    """
+    keys = {pyxel.KEY_Z}
+    keys.add(pyxel.KEY_RIGHT if ((frame + SWEEP_FRAMES // 2) // SWEEP_FRAMES) % 2 == 0 else pyxel.KEY_LEFT)
+    return keys
+
+
+def charged_fire(frame):
+    """Segura o tiro e varre a tela, soltando o botão de vez em quando (armas de carga)."""
+    keys = sweep_fire(frame)
+    if frame % CHARGE_RELEASE_FRAMES == CHARGE_RELEASE_FRAMES - 1:
+        keys.discard(pyxel.KEY_Z)
+    return keys
+
+
+def weapon_cycle(frame):
+    """Como charged_fire, mas passando para a próxima arma a cada WEAPON_CYCLE_FRAMES."""
+    keys = charged_fire(frame)
+    if frame % WEAPON_CYCLE_FRAMES == WEAPON_CYCLE_FRAMES - 1:
+        keys.add(pyxel.KEY_X)
+    return keys
+
+
+PLAYERS = {
+    'cycle': weapon_cycle,
+    'fixed': charged_fire,
+    'autopilot': None, # AutopilotInput: desvia, mira e troca de arma como 'cycle' (ou fica na arma de --weapon)
+}
+
+
+def target_name(enemy):
+    """Nome do alvo nas tabelas: o tipo do inimigo, ou o tamanho no caso dos asteroides."""
+    if isinstance(enemy, Asteroid):
+        return f"asteroid_{enemy.size_type}"
+    return enemy.type
+
+
+class SessionStats(GameplayHooks):
+    """Coleta os eventos de uma partida (ver GameplayHooks). Os tempos são contados no relógio do jogo."""
+    def __init__(self, clock):
+        self.clock = clock
+        # Inimigo -> [arma, frame do primeiro acerto, nº de acertos, só essa arma acertou?].
+        # Com referências fracas, os inimigos que saem da tela sem morrer não ficam presos aqui.
+        self.engaged = weakref.WeakKeyDictionary()
+        # (arma, alvo) -> [(frames até o abate, acertos), ...]. Só entram os abates em que
+        # uma única arma causou todo o dano; os demais são contados em mixed_kills.
+        self.kills = defaultdict(list)
+        self.mixed_kills = defaultdict(int)
+        self.damage_taken = defaultdict(int) # origem -> dano
+        self.wave_clears = [] # (categoria, onda, frames)
+        self._wave_start = None
+
+    def enemy_damaged(self, enemy, weapon, amount):
+        record = self.engaged.get(enemy)
+        if record is None:
+            self.engaged[enemy] = [weapon, self.clock.frame_count, 1, True]
+        else:
+            record[2] += 1
+            if record[0] != weapon:
+                record[3] = False
+
+    def enemy_killed(self, enemy, weapon):
+        record = self.engaged.pop(enemy, None)
+        key = (weapon, target_name(enemy))
+        if record is None or not record[3] or record[0] != weapon:
+            self.mixed_kills[key] += 1
+        else:
+            self.kills[key].append((self.clock.frame_count - record[1], record[2]))
+
+    def player_damaged(self, amount, source):
+        self.damage_taken[source] += amount
+
+    def wave_started(self, category, wave_number):
+        self._wave_start = (category, wave_number, self.clock.frame_count)
+
+    def wave_cleared(self, category, wave_number):
+        if self._wave_start is not None and self._wave_start[:2] == (category, wave_number):
+            self.wave_clears.append((category, wave_number, self.clock.frame_count - self._wave_start[2]))
+            self._wave_start = None
+
+
+def run_session(job):
+    """
+    Roda uma sessão. 'job' é um dict simples (precisa atravessar o pool de processos):
+    variant, overrides, seed, frames, player, weapon, category, invulnerable.
+    """
+    clock = FrameClock()
+    if job['player'] == 'autopilot':
+        source = AutopilotInput(weapon_period=None if job['weapon'] else WEAPON_CYCLE_FRAMES, category_period=None)
+    else:
+        source = ScriptedInput(PLAYERS[job['player']])
+    stats = SessionStats(clock)
+    game = Game(headless=True, input_source=source, clock=clock, rng=SeededRandom(job['seed']),
+                asset_overrides=job['overrides'], hooks=stats)
+    if job['player'] == 'autopilot':
+        source.attach(game)
+    if job['category'] != game.current_enemy_category:
+        game.current_enemy_category = job['category']
+        game.wave_timeline.clear()
+        game.wave_number = 1
+        game._setup_wave()
+    if job['weapon']:
+        select_weapon(game, job['weapon'])
+    if job['invulnerable']:
+        make_invulnerable(game)
+
+    frame_times = np.zeros(job['frames'])
+    frames_run = 0
+    perf_counter = time.perf_counter
+    for frame in range(job['frames']):
+        start = perf_counter()
+        game.update()
+        frame_times[frame] = perf_counter() - start
+        frames_run += 1
+        if game.state_manager.active_state.name == "game_over":
+            break
+
+    return {
+        'variant': job['variant'],
+        'seed': job['seed'],
+        'frames': frames_run,
+        'game_over': game.state_manager.active_state.name == "game_over",
+        'score': game.score,
+        'kills': dict(stats.kills),
+        'mixed_kills': dict(stats.mixed_kills),
+        'damage_taken': dict(stats.damage_taken),
+        'wave_clears': stats.wave_clears,
+        'frame_ms': frame_times[:frames_run] * 1000,
+    }
+
+
+def _summary(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {'n': int(values.size), 'mean': float(values.mean()), 'p50': float(np.percentile(values, 50)),
+            'min': float(values.min()), 'max': float(values.max())}
+
+
+def aggregate(results):
+    """Junta os resultados das sessões de uma variante (na ordem das sementes) num relatório."""
+    kills = defaultdict(list)
+    mixed_kills = defaultdict(int)
+    wave_clears = defaultdict(list)
+    damage = defaultdict(list)
+    for result in results:
+        for key, samples in result['kills'].items():
+            kills[key].extend(samples)
+        for key, count in result['mixed_kills'].items():
+            mixed_kills[key] += count
+        for category, wave, frames in result['wave_clears']:
+            wave_clears[(category, wave)].append(frames)
+        for source in ('enemy_bullet', 'collision'):
+            damage[source].append(result['damage_taken'].get(source, 0))
+        damage['total'].append(sum(result['damage_taken'].values()))
+    frame_ms = np.concatenate([result['frame_ms'] for result in results])
+
+    return {
+        'sessions': len(results),
+        'frames': sum(result['frames'] for result in results),
+        'game_overs': sum(result['game_over'] for result in results),
+        'score': _summary([result['score'] for result in results]),
+        'ttk': {f"{weapon}/{target}": {'frames': _summary([f for f, _ in samples]),
+                                       'hits': _summary([h for _, h in samples])}
+                for (weapon, target), samples in sorted(kills.items())},
+        'mixed_kills': {f"{weapon}/{target}": count for (weapon, target), count in sorted(mixed_kills.items())},
+        'wave_clear': {f"{category}/{wave}": _summary(frames)
+                       for (category, wave), frames in sorted(wave_clears.items())},
+        'damage_taken': {source: _summary(values) for source, values in damage.items()},
+        # O único bloco que depende da máquina (e da carga dos outros processos)
+        'frame_cost_ms': {'mean': float(frame_ms.mean()), 'p50': float(np.percentile(frame_ms, 50)),
+                          'p99': float(np.percentile(frame_ms, 99))},
+    }
+
+
+def load_override(spec, index):
+    """Lê um override de um arquivo JSON ou do próprio texto. Retorna (nome da variante, dict)."""
+    if os.path.exists(spec):
+        with open(spec) as f:
+            return os.path.splitext(os.path.basename(spec))[0], json.load(f)
+    return f"override{index}", json.loads(spec)
+
+
+def print_report(name, report):
+    print(f"=== {name}: {report['sessions']} sessões, {report['frames']} frames, "
+          f"{report['game_overs']} game overs, pontos p50 {report['score']['p50']:.1f}")
+    print(f"{'arma/alvo':<26} {'abates':>7} {'mistos':>7} {'TTK p50':>8} {'TTK médio':>10} {'acertos':>8}")
+    for key in sorted(set(report['ttk']) | set(report['mixed_kills'])):
+        mixed = report['mixed_kills'].get(key, 0)
+        entry = report['ttk'].get(key)
+        if entry is None:
+            print(f"{key:<26} {0:>7} {mixed:>7} {'-':>8} {'-':>10} {'-':>8}")
+        else:
+            print(f"{key:<26} {entry['frames']['n']:>7} {mixed:>7} {entry['frames']['p50']:>8.0f} "
+                  f"{entry['frames']['mean']:>10.1f} {entry['hits']['mean']:>8.1f}")
+    print(f"{'onda':<26} {'limpas':>7} {'p50 s':>8} {'média s':>10}")
+    for key, entry in report['wave_clear'].items():
+        print(f"{key:<26} {entry['n']:>7} {entry['p50'] / 60:>8.1f} {entry['mean'] / 60:>10.1f}")
+    damage = report['damage_taken']
+    print(f"dano recebido por sessão: média {damage['total']['mean']:.1f} "
+          f"(balas {damage['enemy_bullet']['mean']:.1f}, colisões {damage['collision']['mean']:.1f}), "
+          f"máx {damage['total']['max']:.0f}")
+    cost = report['frame_cost_ms']
+    print(f"custo de frame: p50 {cost['p50']:.3f} ms, p99 {cost['p99']:.3f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Partidas headless em paralelo para balancear armas, inimigos e ondas.")
+    parser.add_argument('--seeds', type=int, default=16, help="sessões por variante (sementes consecutivas)")
+    parser.add_argument('--first-seed', type=int, default=1)
+    parser.add_argument('-f', '--frames', type=int, default=3600, help="frames por sessão (60 = 1 segundo de jogo)")
+    parser.add_argument('--player', choices=sorted(PLAYERS), default='cycle', help="quem joga: um script ou o piloto automático")
+    parser.add_argument('--weapon', help="arma inicial (com --player fixed, a única usada)")
+    parser.add_argument('--category', choices=('aliens', 'asteroids'), default='aliens')
+    parser.add_argument('--invulnerable', action='store_true',
+                        help="o jogador nunca morre (as sessões sempre vão até o fim)")
+    parser.add_argument('--override', action='append', default=[],
+                        help="variante: arquivo JSON ou JSON com as seções a mesclar (pode repetir)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="processos (padrão: todos os núcleos)")
+    parser.add_argument('--json', help="grava o relatório completo neste arquivo")
+    args = parser.parse_args(argv)
+
+    variants = [('base', {})] + [load_override(spec, i) for i, spec in enumerate(args.override, 1)]
+    if args.weapon and args.weapon not in AssetManager().get_bullet_properties():
+        parser.error(f"arma desconhecida: {args.weapon}")
+    jobs = [{'variant': name, 'overrides': overrides, 'seed': seed, 'frames': args.frames,
+             'player': args.player, 'weapon': args.weapon, 'category': args.category,
+             'invulnerable': args.invulnerable}
+            for name, overrides in variants
+            for seed in range(args.first_seed, args.first_seed + args.seeds)]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(run_session, jobs)) # map preserva a ordem dos jobs
+    elapsed = time.perf_counter() - start
+
+    reports = {}
+    for name, _ in variants:
+        reports[name] = aggregate([result for result in results if result['variant'] == name])
+        print_report(name, reports[name])
+    print(f"{len(jobs)} sessões em {elapsed:.1f} s com {args.workers} processos")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
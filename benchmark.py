@@ -0,0 +1,253 @@
+"""
+Benchmark da simulação do jogo, sem janela.
+
+Cada cenário monta uma situação de estresse num Game headless (semente fixa) e
+roda o pipeline real do PlayingState.update por um número fixo de frames.
+Para cada cenário são medidos: ticks por segundo, tempo de frame p50/p99 e o
+pico de memória alocada (tracemalloc, numa segunda passada para não distorcer
+os tempos). O desenho não entra na medição: sem janela não há onde desenhar.
+
+Uso:
+    python benchmark.py                      # roda tudo e compara com a linha de base
+    python benchmark.py --write-baseline     # grava a linha de base desta máquina
+    python benchmark.py -s asteroids_500 -f 1200 --threshold 0.1
+
+A linha de base (benchmark_baseline.json) depende da máquina, por isso não vai
+para o repositório. Com regressões acima do limite, o script sai com código 1.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pyxel
+
+import ship_gamev21 as game_module
+from ship_gamev21 import Asteroid, Enemy, Game, ScriptedInput, SeededRandom, rt
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+
+def hold_fire(frame):
+    """Script de entrada: segura o tiro e balança a nave para os lados."""
+    keys = {pyxel.KEY_Z}
+    keys.add(pyxel.KEY_LEFT if (frame // 40) % 2 else pyxel.KEY_RIGHT)
+    return keys
+
+
+def make_invulnerable(game):
+    # O jogador continua sendo atingido (as colisões são medidas), mas nunca morre
+    game.player_hp = game.player_max_hp = 10 ** 9
+    game.player_lives = 10 ** 6
+
+
+def select_weapon(game, weapon):
+    game.current_bullet_type_index = game.bullet_type_keys.index(weapon)
+
+
+# --- CENÁRIOS ---
+# Cada cenário recebe o jogo recém-criado, prepara o estado e retorna
+# (script de entrada, função chamada antes de cada frame ou None).
+
+def scenario_asteroids_500(game):
+    """500 asteroides à deriva, com o jogador atirando para que se partam."""
+    patterns = game.asset_manager.get_movement_patterns()
+    game.enemies = [Asteroid(rt.rndf(0, rt.width - 24), rt.rndf(-rt.height, rt.height * 0.6),
+                             rt.choice(['small', 'medium', 'large']), patterns['asteroid_slow_drift'],
+                             game.asset_manager)
+                    for _ in range(500)]
+    select_weapon(game, 'blue')
+    return hold_fire, None
+
+
+def scenario_bullets_300(game):
+    """Cerca de 300 balas vivas ao mesmo tempo, de todos os tipos de projétil, contra uma grade de alvos."""
+    defs = game.asset_manager.get_enemy_definitions()
+    pattern = dict(game.asset_manager.get_movement_patterns()['alien_grid_formation'], speed_range=(0, 0))
+    game.enemies = []
+    for row in range(4):
+        for col in range(8):
+            enemy_type = game.specific_enemy_types[(row + col) % len(game.specific_enemy_types)]
+            enemy = Enemy(8 + col * 15, 10 + row * 12, enemy_type, defs[enemy_type]['color'], 10 ** 9,
+                          pattern, game.asset_manager)
+            game.enemies.append(enemy)
+
+    bullet_props = game.asset_manager.get_bullet_properties()
+    weapons = [name for name, props in bullet_props.items() if name != 'red']
+    state = {'next': 0}
+
+    def top_up(frame):
+        # Dispara as armas em rodízio, de posições espalhadas, até ter 300 balas
+        while len(game.bullets) < 300:
+            weapon = weapons[state['next'] % len(weapons)]
+            state['next'] += 1
+            game.player.x = rt.rndi(0, rt.width - game.player.width)
+            game._fire_projectiles(bullet_props[weapon])
+
+    return None, top_up
+
+
+def scenario_debris_20k(game):
+    """Cerca de 20 mil partículas de detritos vivas, renovadas continuamente."""
+    game.particle_budget.cap = 40000 # O cenário mede o sistema de partículas, não o corte do orçamento
+    particles = game.particles
+    rng = particles.rng
+    lifetime = 30
+    per_frame = 20000 // lifetime
+
+    def spawn_debris(frame):
+        particles.spawn(rng.uniform(0, rt.width, per_frame), rng.uniform(0, rt.height, per_frame),
+                        rng.uniform(-1.5, 1.5, per_frame), rng.uniform(-1.5, 1.5, per_frame),
+                        4, lifetime, friction=game_module.ParticleSystem.DEBRIS_FRICTION,
+                        effect='asteroid_debris')
+
+    return None, spawn_debris
+
+
+def scenario_yellow_formation(game):
+    """Formação de 30 inimigos amarelos parados, atirando no jogador, que atira de volta."""
+    defs = game.asset_manager.get_enemy_definitions()
+    pattern = game.asset_manager.get_movement_patterns()['alien_side_entry_align']
+    game.enemies = []
+    for i in range(30):
+        kwargs = {'final_x': 8 + (i % 10) * 11, 'final_y': 10 + (i // 10) * 12, 'direction': 1 if i % 2 == 0 else -1}
+        enemy = Enemy(kwargs['final_x'], kwargs['final_y'], 'yellow', defs['yellow']['color'], 10 ** 9,
+                      pattern, game.asset_manager, **kwargs)
+        # Já em formação: a entrada lateral cruza a tela e colidiria com o jogador
+        enemy.x, enemy.y, enemy.state = enemy.final_x, enemy.final_y, 'HALTED'
+        enemy.shoot_cooldown = rt.rndi(30, 60) # Mais tiros que no jogo, para estressar as balas inimigas
+        game.enemies.append(enemy)
+    select_weapon(game, 'yellow')
+    return hold_fire, None
+
+
+def scenario_bullet_hell_2000(game):
+    """Mais de 2 mil balas inimigas na tela: formação parada disparando anéis, espirais e leques."""
+    defs = game.asset_manager.get_enemy_definitions()
+    pattern = game.asset_manager.get_movement_patterns()['alien_side_entry_align']
+    emitters = ['radial', 'spiral', 'fan', 'aimed_burst']
+    game.enemies = []
+    for i in range(40):
+        kwargs = {'final_x': 4 + (i % 10) * 12, 'final_y': 6 + (i // 10) * 10,
+                  'emitter': emitters[i % len(emitters)]}
+        enemy = Enemy(kwargs['final_x'], kwargs['final_y'], 'purple', defs['purple']['color'], 10 ** 9,
+                      pattern, game.asset_manager, **kwargs)
+        enemy.x, enemy.y, enemy.state = enemy.final_x, enemy.final_y, 'HALTED'
+        enemy.shoot_cooldown = min(enemy.shoot_cooldown, rt.rndi(8, 14))
+        game.enemies.append(enemy)
+    return hold_fire, None
+
+
+SCENARIOS = {
+    'asteroids_500': scenario_asteroids_500,
+    'bullets_300': scenario_bullets_300,
+    'debris_20k': scenario_debris_20k,
+    'yellow_formation': scenario_yellow_formation,
+    'bullet_hell_2000': scenario_bullet_hell_2000,
+}
+
+
+def build_game(name, seed):
+    """Cria o jogo headless do cenário. Retorna (jogo, função por frame)."""
+    script_holder = {}
+    game = Game(headless=True, input_source=ScriptedInput(lambda frame: script_holder['script'](frame)),
+                rng=SeededRandom(seed))
+    game.wave_timeline.clear()
+    make_invulnerable(game)
+    script, per_frame = SCENARIOS[name](game)
+    script_holder['script'] = script or (lambda frame: ())
+    return game, per_frame
+
+
+def run_frames(game, per_frame, frames, frame_times=None):
+    for frame in range(frames):
+        if per_frame is not None:
+            per_frame(frame)
+        start = time.perf_counter()
+        game.update()
+        if frame_times is not None:
+            frame_times[frame] = time.perf_counter() - start
+
+
+def run_scenario(name, frames, warmup, seed):
+    # Passada 1: tempos de frame
+    game, per_frame = build_game(name, seed)
+    run_frames(game, per_frame, warmup)
+    frame_times = np.zeros(frames)
+    run_frames(game, per_frame, frames, frame_times)
+    total = float(frame_times.sum())
+
+    # Passada 2: pico de memória (o tracemalloc deixa tudo bem mais lento)
+    tracemalloc.start()
+    game, per_frame = build_game(name, seed)
+    run_frames(game, per_frame, warmup + frames)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ticks_per_sec': frames / total if total > 0 else float('inf'),
+        'p50_ms': float(np.percentile(frame_times, 50) * 1000),
+        'p99_ms': float(np.percentile(frame_times, 99) * 1000),
+        'peak_kb': peak / 1024,
+    }
+
+
+def find_regressions(result, baseline, threshold):
+    """Compara com a linha de base. Retorna as descrições das métricas que pioraram além do limite."""
+    problems = []
+    if result['ticks_per_sec'] < baseline['ticks_per_sec'] * (1 - threshold):
+        problems.append(f"ticks/s {result['ticks_per_sec']:.0f} < {baseline['ticks_per_sec']:.0f}")
+    for metric in ('p50_ms', 'p99_ms', 'peak_kb'):
+        if result[metric] > baseline[metric] * (1 + threshold):
+            problems.append(f"{metric} {result[metric]:.2f} > {baseline[metric]:.2f}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark headless da simulação do jogo.")
+    parser.add_argument('-s', '--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="cenário a rodar (pode repetir; padrão: todos)")
+    parser.add_argument('-f', '--frames', type=int, default=600, help="frames medidos por cenário")
+    parser.add_argument('--warmup', type=int, default=60, help="frames iniciais descartados")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="arquivo JSON da linha de base")
+    parser.add_argument('--write-baseline', action='store_true', help="grava os resultados como nova linha de base")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="piora relativa tolerada antes de acusar regressão (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.write_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, regressions = {}, 0
+    print(f"{'cenário':<18} {'ticks/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'pico KB':>9}")
+    for name in args.scenario or SCENARIOS:
+        result = results[name] = run_scenario(name, args.frames, args.warmup, args.seed)
+        line = (f"{name:<18} {result['ticks_per_sec']:>9.0f} {result['p50_ms']:>8.3f} "
+                f"{result['p99_ms']:>8.3f} {result['peak_kb']:>9.0f}")
+        if name in baseline:
+            problems = find_regressions(result, baseline[name], args.threshold)
+            if problems:
+                regressions += 1
+                line += "  REGRESSÃO: " + "; ".join(problems)
+            else:
+                line += "  ok"
+        print(line)
+
+    if args.write_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Linha de base gravada em {args.baseline}")
+    elif not baseline:
+        print(f"Sem linha de base em {args.baseline}; use --write-baseline para criar uma.")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Diagnóstico de vazamentos de memória e de entidades que vivem demais.
+
+LeakDiagnostics é um observador da partida (GameplayHooks): a cada onda limpa
+ele tira uma amostra do jogo com
+
+    - o tamanho das listas de entidades (bullets, enemies, particles,
+      flame_particles, enemy_bullets, powerups);
+    - o número de instâncias vivas de cada classe do jogo (contadas pelo
+      coletor de lixo, depois de um gc.collect());
+    - referências penduradas: mísseis mirando inimigos que já saíram da lista,
+      balas devolvidas ao pool ainda segurando objetos, e inimigos vivos na
+      memória além dos que estão na lista (com os tipos de quem os segura);
+    - uma fotografia do tracemalloc, comparada com a da amostra anterior.
+
+Com a memória e as listas estáveis, uma partida longa tem um perfil plano: o
+que cresce de onda em onda aparece em growth() e em problems(). É pensado para
+sessões headless (soak.py --diagnostics); o tracemalloc deixa o jogo bem mais lento.
+"""
+import gc
+import tracemalloc
+
+import ship_gamev21 as game_module
+from ship_gamev21 import Enemy, GameplayHooks
+
+ENTITY_LISTS = ('bullets', 'enemies', 'powerups', 'particles', 'flame_particles', 'enemy_bullets')
+
+# Todas as classes definidas no módulo do jogo; as instâncias vivas de cada uma são contadas
+GAME_CLASSES = frozenset(cls for cls in vars(game_module).values()
+                         if isinstance(cls, type) and cls.__module__ == game_module.__name__)
+
+
+def live_instances():
+    """Número de instâncias vivas de cada classe do jogo, por nome da classe."""
+    gc.collect()
+    counts = {}
+    for obj in gc.get_objects():
+        cls = type(obj)
+        if cls in GAME_CLASSES:
+            counts[cls.__name__] = counts.get(cls.__name__, 0) + 1
+    return counts
+
+
+def _attribute_owners():
+    """id de cada valor de atributo dos objetos do jogo -> 'Classe.atributo'."""
+    owners = {}
+    for obj in gc.get_objects():
+        if type(obj) in GAME_CLASSES and hasattr(obj, '__dict__'):
+            for name, value in vars(obj).items():
+                owners[id(value)] = f"{type(obj).__name__}.{name}"
+    return owners
+
+
+def retained_enemies(game):
+    """
+    Inimigos ainda na memória que não estão na lista do jogo. Retorna (quantidade,
+    {quem segura: quantas referências}); quem segura é dado como 'Classe.atributo'
+    quando a referência vem de um atributo de um objeto do jogo (ou de um
+    contêiner dentro dele), senão pelo tipo do objeto.
+    """
+    listed = set(map(id, game.enemies))
+    retained = [obj for obj in gc.get_objects()
+                if isinstance(obj, Enemy) and id(obj) not in listed]
+    if not retained:
+        return 0, {}
+    owners = _attribute_owners()
+    ignore = {id(retained)}
+    holders = {}
+    for obj in retained:
+        for referrer in gc.get_referrers(obj):
+            if id(referrer) in ignore or referrer is obj.__dict__:
+                continue
+            name = owners.get(id(referrer))
+            if name is None:
+                # Um nível acima: tuplas dentro de uma lista, listas dentro de um dict...
+                name = next((owners[id(outer)] for outer in gc.get_referrers(referrer)
+                             if id(outer) in owners), type(referrer).__name__)
+            holders[name] = holders.get(name, 0) + 1
+    return len(retained), holders
+
+
+def dangling_references(game):
+    """Conta as referências a entidades mortas ou fora de uso, por tipo."""
+    enemies = set(game.enemies)
+    return {
+        # Mísseis mirando um inimigo que já foi removido
+        'bullet_target_removed': sum(1 for bullet in game.bullets
+                                     if bullet.target_enemy is not None and bullet.target_enemy not in enemies),
+        # Balas no pool que não soltaram o alvo, o rastro ou o comportamento (ver Bullet.release)
+        'pooled_bullet_refs': sum(1 for bullet in game.bullet_pool.free
+                                  if getattr(bullet, 'target_enemy', None) is not None or
+                                  getattr(bullet, 'particle_list', None) is not None),
+        # Inimigos mortos que continuam na lista
+        'dead_enemies_listed': sum(1 for enemy in game.enemies if enemy.health <= 0),
+    }
+
+
+class LeakDiagnostics(GameplayHooks):
+    """
+    Amostra o jogo a cada 'every' ondas limpas (ver o topo do módulo). É passado
+    como Game(hooks=...) e, depois de criado o jogo, recebe attach(game); quem roda
+    o jogo chama end_frame() depois de cada update. Liga o tracemalloc ao ser
+    criado se ele ainda não estiver ligado, com 'frames' níveis de pilha por
+    alocação; stop() o desliga de novo.
+    """
+    TOP_GROWTH = 8 # Linhas do tracemalloc que mais cresceram, guardadas por amostra
+
+    def __init__(self, every=1, frames=1):
+        self.game = None
+        self.every = every
+        self.cleared = 0 # Ondas limpas desde o início (para soak.py)
+        self.samples = []
+        self._pending = None # (categoria, onda) a amostrar no fim do frame
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start(frames)
+        self._first_snapshot = self._last_snapshot = None
+
+    def attach(self, game):
+        """Associa o jogo já criado; a fotografia de referência do tracemalloc é tirada aqui."""
+        self.game = game
+        self._first_snapshot = self._last_snapshot = self._snapshot()
+
+    def stop(self):
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def _snapshot(self):
+        # O próprio módulo de diagnóstico, o tracemalloc e as importações tardias não entram na conta
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+
+    def wave_cleared(self, category, wave_number):
+        self.cleared += 1
+        if self.cleared % self.every == 0:
+            self._pending = (category, wave_number)
+
+    def end_frame(self):
+        """
+        Chamado por quem roda o jogo depois de cada game.update(). A amostra de uma
+        onda limpa é tirada aqui, com o frame já concluído: no meio do update, as
+        variáveis locais do frame ainda seguram os inimigos recém-destruídos.
+        """
+        if self._pending is not None:
+            category, wave_number = self._pending
+            self._pending = None
+            self.sample(category, wave_number)
+
+    def sample(self, category=None, wave_number=None):
+        """Tira uma amostra agora. Retorna o dict da amostra."""
+        game = self.game
+        retained, holders = retained_enemies(game)
+        snapshot = self._snapshot()
+        growth = snapshot.compare_to(self._last_snapshot, 'lineno')
+        self._last_snapshot = snapshot
+        row = {
+            'waves_cleared': self.cleared,
+            'category': category,
+            'wave': wave_number,
+            'frame': game_module.rt.frame_count,
+            'entities': {name: len(getattr(game, name)) for name in ENTITY_LISTS},
+            'instances': live_instances(),
+            'retained_enemies': retained,
+            'retained_by': holders,
+            'dangling': dangling_references(game),
+            # Só o que ficou na fotografia filtrada: as próprias amostras não contam
+            'traced_kb': sum(trace.size for trace in snapshot.traces) / 1024,
+            'top_growth': [str(stat) for stat in growth[:self.TOP_GROWTH] if stat.size_diff > 0],
+        }
+        self.samples.append(row)
+        return row
+
+    def growth(self):
+        """Variação de cada lista, das instâncias de cada classe e da memória entre a primeira e a última amostra."""
+        if len(self.samples) < 2:
+            return {}
+        first, last = self.samples[0], self.samples[-1]
+        changes = {name: last['entities'][name] - first['entities'][name] for name in ENTITY_LISTS}
+        for name in set(first['instances']) | set(last['instances']):
+            changes[name] = last['instances'].get(name, 0) - first['instances'].get(name, 0)
+        changes['traced_kb'] = last['traced_kb'] - first['traced_kb']
+        return changes
+
+    def total_growth(self, limit=10):
+        """Linhas de código que mais acumularam memória desde o início das amostras."""
+        stats = self._last_snapshot.compare_to(self._first_snapshot, 'lineno')
+        return [str(stat) for stat in stats[:limit] if stat.size_diff > 0]
+
+    def problems(self, memory_slack_kb=256, instance_slack=64):
+        """Descrições do que parece vazamento: referências penduradas e crescimento além das folgas."""
+        found = []
+        for row in self.samples:
+            for kind, count in row['dangling'].items():
+                if count:
+                    found.append(f"onda {row['waves_cleared']}: {count} referência(s) pendurada(s) ({kind})")
+            if row['retained_enemies']:
+                found.append(f"onda {row['waves_cleared']}: {row['retained_enemies']} inimigo(s) fora da lista "
+                             f"ainda na memória, referenciados por {row['retained_by']}")
+        if len(self.samples) >= 4:
+            # A primeira metade das amostras dá a referência; a última amostra não pode ter passado dela
+            half = self.samples[:len(self.samples) // 2]
+            last = self.samples[-1]
+            if last['traced_kb'] > max(row['traced_kb'] for row in half) + memory_slack_kb:
+                found.append(f"memória rastreada cresceu para {last['traced_kb']:.0f} KB")
+            for name, count in last['instances'].items():
+                if count > max(row['instances'].get(name, 0) for row in half) + instance_slack:
+                    found.append(f"instâncias de {name} cresceram para {count}")
+        return found
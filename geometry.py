@@ -0,0 +1,151 @@
+"""
+Funções de geometria usadas na narrowphase de colisão do jogo.
+
+Os polígonos são passados como sequências "planas" de coordenadas
+[x0, y0, x1, y1, ...], já em coordenadas do mundo. Assim os testes percorrem
+os números diretamente, sem criar tuplas, listas ou pontos de interseção
+intermediários a cada chamada.
+"""
+
+
+# --- REJEIÇÃO RÁPIDA POR CÍRCULO ENVOLVENTE ---
+
+def point_in_circle(px, py, cx, cy, radius):
+    """Retorna True se o ponto está dentro (ou na borda) do círculo."""
+    dx = px - cx
+    dy = py - cy
+    return dx * dx + dy * dy <= radius * radius
+
+
+def circle_overlaps_aabb(cx, cy, radius, x, y, width, height):
+    """Retorna True se o círculo toca a caixa alinhada aos eixos (x, y, largura, altura)."""
+    # Ponto da caixa mais próximo do centro do círculo
+    nearest_x = min(max(cx, x), x + width)
+    nearest_y = min(max(cy, y), y + height)
+    return point_in_circle(nearest_x, nearest_y, cx, cy, radius)
+
+
+# --- PONTO DENTRO DE POLÍGONO ---
+
+def point_in_polygon(px, py, coords):
+    """
+    Teste de "crossing number": conta quantas arestas um raio horizontal que sai
+    do ponto para a direita cruza. Número ímpar = ponto dentro do polígono.
+    Funciona também para polígonos côncavos.
+    """
+    n = len(coords)
+    if n < 6:
+        return False # Não é um polígono válido
+
+    inside = False
+    xj, yj = coords[n - 2], coords[n - 1] # Começa pela aresta que liga o último vértice ao primeiro
+    for i in range(0, n, 2):
+        xi, yi = coords[i], coords[i + 1]
+        # A aresta cruza a linha horizontal do ponto, e o cruzamento está à direita dele?
+        if (yi > py) != (yj > py) and px < (xj - xi) * (py - yi) / (yj - yi) + xi:
+            inside = not inside
+        xj, yj = xi, yi
+    return inside
+
+
+# --- TESTES DE EIXO SEPARADOR (SAT) ---
+
+def _project(coords, axis_x, axis_y):
+    """Projeta todos os vértices no eixo e retorna o intervalo (mínimo, máximo)."""
+    lo = hi = axis_x * coords[0] + axis_y * coords[1]
+    for k in range(2, len(coords), 2):
+        p = axis_x * coords[k] + axis_y * coords[k + 1]
+        if p < lo:
+            lo = p
+        elif p > hi:
+            hi = p
+    return lo, hi
+
+
+def _has_separating_edge(coords, other):
+    """Procura, entre as normais das arestas de 'coords', um eixo que separe os dois polígonos."""
+    n = len(coords)
+    x0, y0 = coords[n - 2], coords[n - 1]
+    for i in range(0, n, 2):
+        x1, y1 = coords[i], coords[i + 1]
+        # Normal da aresta (não precisa ser normalizada para comparar intervalos)
+        axis_x, axis_y = y0 - y1, x1 - x0
+        lo_a, hi_a = _project(coords, axis_x, axis_y)
+        lo_b, hi_b = _project(other, axis_x, axis_y)
+        if hi_a < lo_b or hi_b < lo_a:
+            return True
+        x0, y0 = x1, y1
+    return False
+
+
+def polygons_intersect(coords_a, coords_b):
+    """
+    Teorema do eixo separador para dois polígonos convexos.
+    Em polígonos côncavos o teste é conservador: nunca deixa de detectar uma
+    sobreposição real, mas pode acusar contato nas reentrâncias.
+    """
+    if len(coords_a) < 6 or len(coords_b) < 6:
+        return False
+    return not (_has_separating_edge(coords_a, coords_b) or _has_separating_edge(coords_b, coords_a))
+
+
+def polygon_intersects_aabb(coords, x, y, width, height):
+    """
+    Teorema do eixo separador entre um polígono convexo e uma caixa alinhada aos eixos.
+    Os eixos da caixa são testados com os limites do polígono; depois, as normais
+    das arestas do polígono são testadas contra os quatro cantos da caixa.
+    """
+    n = len(coords)
+    if n < 6:
+        return False
+
+    # Eixos X e Y (as normais da caixa)
+    right, bottom = x + width, y + height
+    lo, hi = _project(coords, 1, 0)
+    if hi < x or lo > right:
+        return False
+    lo, hi = _project(coords, 0, 1)
+    if hi < y or lo > bottom:
+        return False
+
+    # Normais das arestas do polígono
+    x0, y0 = coords[n - 2], coords[n - 1]
+    for i in range(0, n, 2):
+        x1, y1 = coords[i], coords[i + 1]
+        axis_x, axis_y = y0 - y1, x1 - x0
+        lo_a, hi_a = _project(coords, axis_x, axis_y)
+        # Projeção da caixa: canto mínimo/máximo conforme o sinal de cada componente do eixo
+        lo_b = axis_x * (x if axis_x >= 0 else right) + axis_y * (y if axis_y >= 0 else bottom)
+        hi_b = axis_x * (right if axis_x >= 0 else x) + axis_y * (bottom if axis_y >= 0 else y)
+        if hi_a < lo_b or hi_b < lo_a:
+            return False
+        x0, y0 = x1, y1
+    return True
+
+
+# --- RAIO VERTICAL (LASER) ---
+
+def vertical_segment_hit(coords, x, y_top, y_bottom):
+    """
+    Interseção de um segmento vertical (coluna x, de y_top até y_bottom) com as
+    arestas do polígono. Retorna o maior y de contato (o ponto mais baixo, o
+    primeiro atingido por um raio que sobe a partir de y_bottom) ou None.
+    Arestas verticais (paralelas ao segmento) são ignoradas.
+    """
+    n = len(coords)
+    if n < 6:
+        return None
+
+    best_y = None
+    x0, y0 = coords[n - 2], coords[n - 1]
+    for i in range(0, n, 2):
+        x1, y1 = coords[i], coords[i + 1]
+        if x0 != x1:
+            # Posição do cruzamento ao longo da aresta (0 = início, 1 = fim)
+            u = (x - x0) / (x1 - x0)
+            if 0 <= u <= 1:
+                y = y0 + u * (y1 - y0)
+                if y_top <= y <= y_bottom and (best_y is None or y > best_y):
+                    best_y = y
+        x0, y0 = x1, y1
+    return best_y
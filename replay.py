@@ -0,0 +1,65 @@
+"""
+Formato binário dos replays do jogo.
+
+Um replay guarda só o que é preciso para refazer a sessão: a semente do gerador
+de números aleatórios e, para cada frame, a máscara de bits das teclas
+pressionadas. Como a máscara quase sempre se repete por vários frames seguidos,
+os frames são gravados em "run-length encoding": pares (máscara, repetições).
+
+Layout (little-endian):
+    cabeçalho: MAGIC (4 bytes), versão (u16), semente (u64), nº de frames (u32), nº de pares (u32)
+    corpo:     nº de pares x (máscara u32, repetições u32)
+"""
+import struct
+
+MAGIC = b'SGRP'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sHQII')
+_RUN = struct.Struct('<II')
+
+
+def append_mask(runs, mask):
+    """Acrescenta um frame à lista de pares [máscara, repetições], estendendo o último par se possível."""
+    if runs and runs[-1][0] == mask:
+        runs[-1][1] += 1
+    else:
+        runs.append([mask, 1])
+
+
+def expand_runs(runs):
+    """Converte os pares (máscara, repetições) de volta numa máscara por frame."""
+    masks = []
+    for mask, count in runs:
+        masks.extend([mask] * count)
+    return masks
+
+
+def save(path, seed, runs):
+    """Grava o replay. 'runs' é a lista de pares (máscara, repetições), na ordem dos frames."""
+    frame_count = sum(count for _, count in runs)
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, seed, frame_count, len(runs)))
+        for mask, count in runs:
+            f.write(_RUN.pack(mask, count))
+    return frame_count
+
+
+def load(path):
+    """Lê um replay e retorna (semente, pares de máscaras). Gera ValueError se o arquivo for inválido."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path}: arquivo de replay truncado")
+    magic, version, seed, frame_count, run_count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: não é um arquivo de replay")
+    if version != VERSION:
+        raise ValueError(f"{path}: versão de replay {version} não suportada")
+    if len(data) != _HEADER.size + run_count * _RUN.size:
+        raise ValueError(f"{path}: arquivo de replay truncado")
+
+    runs = [list(run) for run in _RUN.iter_unpack(data[_HEADER.size:])]
+    if sum(count for _, count in runs) != frame_count:
+        raise ValueError(f"{path}: número de frames não confere com o cabeçalho")
+    return seed, runs
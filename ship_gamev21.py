@@ -1,6 +1,480 @@
 import pyxel
 import random
 import math
+import time
+import csv
+import heapq
+import itertools
+import operator
+from collections import OrderedDict, deque
+from types import MappingProxyType
+import numpy as np
+
+import geometry
+import replay
+
+
+class PyxelInput:
+    """
+    Fonte de entrada padrão: lê o teclado/gamepad diretamente do pyxel.
+    Com o laço de passo fixo, um frame do pyxel pode rodar vários ticks; as
+    bordas (btnp/btnr) só valem no primeiro deles, senão um toque contaria
+    várias vezes.
+    """
+    def __init__(self):
+        self.first_tick = True
+        self._pyxel_frame = None
+
+    def poll(self, frame):
+        # O próprio pyxel atualiza o estado das teclas a cada frame
+        self.first_tick = pyxel.frame_count != self._pyxel_frame
+        self._pyxel_frame = pyxel.frame_count
+
+    def btn(self, key):
+        return pyxel.btn(key)
+
+    def btnp(self, key):
+        return self.first_tick and pyxel.btnp(key)
+
+    def btnr(self, key):
+        return self.first_tick and pyxel.btnr(key)
+
+
+class ScriptedInput:
+    """
+    Fonte de entrada programável, usada no modo headless.
+    'script' é uma função que recebe o número do frame e retorna as teclas
+    pressionadas naquele frame. Sem script, nenhuma tecla é pressionada.
+    """
+    def __init__(self, script=None):
+        self.script = script
+        self.held = frozenset()
+        self.previous = frozenset()
+
+    def poll(self, frame):
+        self.previous = self.held
+        self.held = frozenset(self.script(frame)) if self.script else frozenset()
+
+    def btn(self, key):
+        return key in self.held
+
+    def btnp(self, key):
+        return key in self.held and key not in self.previous
+
+    def btnr(self, key):
+        return key in self.previous and key not in self.held
+
+
+class SnapshotInput:
+    """
+    Entrada baseada em "fotografias" por frame: a cada poll() o estado de todas
+    as teclas usadas pelo jogo (INPUT_KEYS) vira uma máscara de bits. btnp/btnr
+    saem da comparação com a máscara do frame anterior, então o jogo vê
+    exatamente as mesmas bordas ao vivo e ao reproduzir um replay.
+    """
+    # Todas as teclas que o jogo consulta. A ordem define o bit de cada uma no
+    # formato de replay; novas teclas devem ser acrescentadas no fim.
+    INPUT_KEYS = (
+        pyxel.KEY_LEFT, pyxel.KEY_RIGHT, pyxel.KEY_UP, pyxel.KEY_DOWN,
+        pyxel.KEY_Z, pyxel.KEY_X, pyxel.KEY_C, pyxel.KEY_V, pyxel.KEY_G,
+        pyxel.KEY_P, pyxel.KEY_SPACE, pyxel.KEY_F1, pyxel.KEY_F2, pyxel.KEY_F3,
+        pyxel.GAMEPAD1_BUTTON_A, pyxel.GAMEPAD1_BUTTON_B, pyxel.GAMEPAD1_BUTTON_X,
+        pyxel.GAMEPAD1_BUTTON_Y, pyxel.GAMEPAD1_BUTTON_START,
+        pyxel.GAMEPAD1_BUTTON_DPAD_LEFT, pyxel.GAMEPAD1_BUTTON_DPAD_RIGHT,
+        pyxel.GAMEPAD1_BUTTON_DPAD_UP, pyxel.GAMEPAD1_BUTTON_DPAD_DOWN,
+    )
+    KEY_BITS = {key: 1 << bit for bit, key in enumerate(INPUT_KEYS)}
+
+    def __init__(self):
+        self.mask = 0
+        self.previous_mask = 0
+
+    def set_mask(self, mask):
+        self.previous_mask = self.mask
+        self.mask = mask
+
+    def btn(self, key):
+        return bool(self.mask & self.KEY_BITS.get(key, 0))
+
+    def btnp(self, key):
+        bit = self.KEY_BITS.get(key, 0)
+        return bool(self.mask & bit) and not (self.previous_mask & bit)
+
+    def btnr(self, key):
+        bit = self.KEY_BITS.get(key, 0)
+        return bool(self.previous_mask & bit) and not (self.mask & bit)
+
+
+class RecordingInput(SnapshotInput):
+    """
+    Lê as teclas de outra fonte (por padrão, o pyxel) e grava a máscara de cada
+    frame, já comprimida em pares (máscara, repetições), para salvar como replay.
+    """
+    def __init__(self, source=None):
+        super().__init__()
+        self.source = source or PyxelInput()
+        self.runs = []
+
+    def poll(self, frame):
+        self.source.poll(frame)
+        mask = 0
+        for key, bit in self.KEY_BITS.items():
+            if self.source.btn(key):
+                mask |= bit
+        self.set_mask(mask)
+        replay.append_mask(self.runs, mask)
+
+
+class ReplayInput(SnapshotInput):
+    """Reproduz as máscaras gravadas, uma por frame. Depois do fim, nenhuma tecla fica pressionada."""
+    def __init__(self, runs):
+        super().__init__()
+        self.masks = replay.expand_runs(runs)
+        self.position = 0
+
+    @property
+    def finished(self):
+        return self.position >= len(self.masks)
+
+    def poll(self, frame):
+        self.set_mask(self.masks[self.position] if self.position < len(self.masks) else 0)
+        self.position += 1
+
+
+class AutopilotInput(SnapshotInput):
+    """
+    Jogador automático para testes longos sem ninguém nos controles. A cada
+    frame olha o estado do jogo e "aperta" as teclas como um jogador: atira sem
+    parar (soltando o tiro carregado quando fica pronto), desvia das balas
+    inimigas e dos inimigos, se alinha embaixo do alvo mais próximo, troca de
+    arma (X) e de categoria (V) periodicamente e reinicia depois do game over.
+    As decisões dependem só do estado do jogo, sem sorteios: a mesma semente
+    refaz a mesma partida, e a entrada pode ser gravada numa RecordingInput.
+    Depois de criar o jogo, chame attach(game); antes disso nenhuma tecla é apertada.
+    """
+    # Movimentos candidatos: direção (dx, dy) e as teclas correspondentes
+    MOVES = tuple(
+        (dx, dy, tuple(key for key, on in ((pyxel.KEY_LEFT, dx < 0), (pyxel.KEY_RIGHT, dx > 0),
+                                           (pyxel.KEY_UP, dy < 0), (pyxel.KEY_DOWN, dy > 0)) if on))
+        for dy in (0, -1, 1) for dx in (0, -1, 1)
+    )
+    DANGER_COST = 1000 # Custo de uma colisão prevista no próximo frame (cai com a distância no tempo)
+    BODY_MARGIN = 2 # Folga, em pixels, em volta dos inimigos
+
+    def __init__(self, weapon_period=900, category_period=7200, horizon=16, home_margin=16):
+        super().__init__()
+        self.weapon_period = weapon_period # Frames entre trocas de arma (None = nunca troca)
+        self.category_period = category_period # Frames entre trocas de categoria (None = nunca troca)
+        self.horizon = horizon # Quantos frames à frente o desvio enxerga
+        self.home_margin = home_margin # Distância do fundo da tela onde a nave prefere ficar
+        self.game = None
+        self._steps = np.arange(1, horizon + 1, dtype=np.float64)
+        self._weights = 1.0 / self._steps # Perigos próximos pesam mais que os distantes
+        self._move_dx = np.array([[dx] for dx, _, _ in self.MOVES], dtype=np.float64)
+        self._move_dy = np.array([[dy] for _, dy, _ in self.MOVES], dtype=np.float64)
+        self._last_positions = {} # Inimigo -> posição no frame anterior (para estimar a velocidade)
+
+    def attach(self, game):
+        self.game = game
+        self._last_positions = {}
+
+    def poll(self, frame):
+        self.set_mask(self._decide(frame) if self.game is not None else 0)
+
+    def _press(self, keys):
+        mask = 0
+        for key in keys:
+            mask |= self.KEY_BITS[key]
+        return mask
+
+    def _decide(self, frame):
+        game = self.game
+        state = game.state_manager.active_state.name
+        if state == "game_over":
+            # Reinicia: a tecla precisa ser solta e apertada de novo para contar como btnp
+            return 0 if self.mask else self.KEY_BITS[pyxel.KEY_SPACE]
+        if state != "playing":
+            return 0
+
+        keys = list(self._steer())
+        player = game.player
+        weapon = game.bullet_type_keys[game.current_bullet_type_index]
+        if not (weapon == 'purple' and player.is_fully_charged):
+            keys.append(pyxel.KEY_Z) # Arma de carga: solta o tiro quando estiver carregada
+        if self.weapon_period and frame % self.weapon_period == self.weapon_period - 1:
+            keys.append(pyxel.KEY_X)
+        if self.category_period and frame % self.category_period == self.category_period - 1:
+            keys.append(pyxel.KEY_V)
+        return self._press(keys)
+
+    def _steer(self):
+        """
+        Escolhe o movimento de menor custo: colisões previstas com balas e inimigos
+        nos próximos 'horizon' frames, mais a distância até a posição desejada.
+        Todos os movimentos são avaliados de uma vez, em arrays (movimentos, frames, objetos).
+        """
+        game = self.game
+        player = game.player
+        steps = self._steps
+        pw, ph, speed = player.width, player.height, player.speed
+        reach = speed * self.horizon + 32
+
+        # Trajetória da nave para cada movimento, presa à tela como em Player.update: (movimentos, frames)
+        xs = np.clip(player.x + self._move_dx * (speed * steps), 0, rt.width - pw)
+        ys = np.clip(player.y + self._move_dy * (speed * steps), 0, rt.height - ph)
+        danger = np.zeros(len(self.MOVES))
+
+        # Balas que podem chegar perto da nave dentro do horizonte, com posição em cada frame
+        store = game.enemy_bullets
+        n = store.count
+        if n:
+            bx, by, bdx, bdy, bsize = store.x[:n], store.y[:n], store.dx[:n], store.dy[:n], store.size[:n]
+            near = ((np.abs(bx - player.x) < reach + np.abs(bdx) * self.horizon) &
+                    (np.abs(by - player.y) < reach + np.abs(bdy) * self.horizon))
+            if near.any():
+                danger += self._collisions(xs, ys, pw, ph, bx[near], by[near], bdx[near], bdy[near],
+                                           bsize[near], bsize[near], 0)
+
+        # Inimigos próximos, com a velocidade estimada pela posição no frame anterior
+        last_positions, positions = self._last_positions, {}
+        bodies = []
+        for enemy in game.enemies:
+            x, y, w, h = enemy.get_bounds()
+            positions[enemy] = (x, y)
+            if abs(x - player.x) < reach and abs(y - player.y) < reach:
+                last_x, last_y = last_positions.get(enemy, (x, y))
+                bodies.append((x, y, x - last_x, y - last_y, w, h))
+        self._last_positions = positions # Só os vivos: inimigos removidos não ficam presos aqui
+        if bodies:
+            ex, ey, edx, edy, ew, eh = np.array(bodies, dtype=np.float64).T
+            danger += self._collisions(xs, ys, pw, ph, ex, ey, edx, edy, ew, eh, self.BODY_MARGIN)
+
+        target_x = self._target_x()
+        home_y = rt.height - self.home_margin
+        cost = (self.DANGER_COST * danger + np.abs(xs[:, 0] + pw / 2 - target_x) +
+                0.5 * np.abs(ys[:, 0] - home_y))
+        return self.MOVES[int(cost.argmin())][2]
+
+    def _collisions(self, xs, ys, pw, ph, ox, oy, odx, ody, ow, oh, margin):
+        """Perigo de cada movimento: soma dos pesos dos frames em que a nave toca algum dos objetos."""
+        steps = self._steps[:, None]
+        fx = ox + steps * odx # (frames, objetos)
+        fy = oy + steps * ody
+        px, py = xs[:, :, None], ys[:, :, None] # (movimentos, frames, 1)
+        touching = ((fx - margin < px + pw) & (fx + ow + margin > px) &
+                    (fy - margin < py + ph) & (fy + oh + margin > py))
+        return touching.any(axis=2) @ self._weights
+
+    def _target_x(self):
+        """Centro x do inimigo visível mais baixo (o mais perto da nave), ou o meio da tela."""
+        target = None
+        for enemy in self.game.enemies:
+            if enemy.y >= 0 and enemy.y < self.game.player.y and (target is None or enemy.y > target.y):
+                target = enemy
+        if target is None:
+            return rt.width / 2
+        x, _, w, _ = target.get_bounds()
+        return x + w / 2
+
+
+class FrameClock:
+    """
+    Relógio da simulação, avançado uma vez por frame pelo próprio jogo.
+    Não depende do contador do pyxel, então um replay vê a mesma sequência de frames.
+    """
+    def __init__(self, frame_count=0):
+        self.frame_count = frame_count
+
+    def tick(self):
+        self.frame_count += 1
+
+
+class LoopController:
+    """
+    Laço de passo fixo entre o pyxel e a simulação. A cada frame do pyxel, o
+    tempo real decorrido (multiplicado pela escala de tempo) entra num
+    acumulador, e begin_frame() diz quantos ticks de 1/tick_rate segundo a
+    simulação deve rodar: zero, um ou vários. Assim um desenho lento não deixa
+    o jogo mais lento, só menos fluido.
+
+    Sob carga, o número de ticks por frame é limitado (o excesso do acumulador
+    é descartado, para não entrar numa espiral de recuperação) e o desenho do
+    frame é pulado enquanto a simulação estiver atrasada, até max_skipped_draws
+    seguidos, para a tela nunca congelar. Um frame sem desenho mantém a imagem
+    anterior na tela.
+    """
+    TIME_SCALES = (1.0, 2.0, 4.0, 0.25, 0.5) # Ciclo da tecla de depuração
+
+    def __init__(self, tick_rate=60, max_ticks_per_frame=4, max_skipped_draws=3, timer=time.perf_counter):
+        self.tick_rate = tick_rate
+        self.tick_seconds = 1.0 / tick_rate
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.max_skipped_draws = max_skipped_draws
+        self.timer = timer
+        self.time_scale = 1.0
+        self.accumulator = 0.0
+        self.last_time = None
+        self.draw_this_frame = True
+        self.skipped_in_row = 0
+        # Contadores da janela de 1 segundo e os valores da última janela fechada
+        self.window_start = None
+        self.window_ticks = self.window_frames = self.window_skipped = 0
+        self.ticks_per_second = self.frames_per_second = self.skipped_per_second = 0
+        self.dropped_seconds = 0.0 # Tempo de simulação descartado pelo limite de ticks
+
+    def set_time_scale(self, scale):
+        self.time_scale = max(0.0, scale)
+
+    def cycle_time_scale(self):
+        scales = self.TIME_SCALES
+        index = scales.index(self.time_scale) + 1 if self.time_scale in scales else 0
+        self.set_time_scale(scales[index % len(scales)])
+
+    def begin_frame(self):
+        """Registra o tempo real do frame e retorna quantos ticks de simulação rodar agora."""
+        now = self.timer()
+        if self.last_time is None:
+            elapsed = self.tick_seconds / max(self.time_scale, 1e-9) # Primeiro frame: um tick
+            self.window_start = now
+        else:
+            elapsed = now - self.last_time
+        self.last_time = now
+        self.accumulator += elapsed * self.time_scale
+
+        # Em avanço rápido o limite de ticks por frame cresce junto com a escala
+        limit = self.max_ticks_per_frame * max(1, math.ceil(self.time_scale))
+        ticks = min(int(self.accumulator / self.tick_seconds), limit)
+        self.accumulator -= ticks * self.tick_seconds
+        # O atraso que sobra fica para os próximos frames, mas no máximo um frame de ticks
+        self._drop_backlog(limit * self.tick_seconds)
+
+        # Ainda atrasada depois dos ticks deste frame: pula o desenho para recuperar (com limite)
+        behind = self.accumulator >= self.tick_seconds
+        self.draw_this_frame = not behind or self.skipped_in_row >= self.max_skipped_draws
+        if self.draw_this_frame:
+            self.skipped_in_row = 0
+            if behind:
+                self._drop_backlog(self.tick_seconds) # Desistiu de alcançar: o jogo desacelera
+        else:
+            self.skipped_in_row += 1
+            self.window_skipped += 1
+
+        self.window_ticks += ticks
+        if self.draw_this_frame:
+            self.window_frames += 1
+        if now - self.window_start >= 1.0:
+            seconds = now - self.window_start
+            self.ticks_per_second = self.window_ticks / seconds
+            self.frames_per_second = self.window_frames / seconds
+            self.skipped_per_second = self.window_skipped / seconds
+            self.window_start = now
+            self.window_ticks = self.window_frames = self.window_skipped = 0
+        return ticks
+
+    def _drop_backlog(self, keep):
+        """Descarta o atraso do acumulador acima de 'keep' segundos (múltiplos inteiros de tick)."""
+        excess = self.accumulator - keep
+        if excess > 0:
+            dropped = math.ceil(excess / self.tick_seconds) * self.tick_seconds
+            self.dropped_seconds += dropped
+            self.accumulator -= dropped
+
+    def stats(self):
+        """Ticks de simulação e frames desenhados por segundo (última janela de 1 s)."""
+        return {
+            'ticks_per_second': self.ticks_per_second,
+            'frames_per_second': self.frames_per_second,
+            'skipped_draws_per_second': self.skipped_per_second,
+            'time_scale': self.time_scale,
+            'dropped_seconds': self.dropped_seconds,
+        }
+
+
+class SeededRandom:
+    """
+    Serviço único de números aleatórios, usado por todos os spawners e efeitos.
+    Da semente saem dois fluxos independentes: o da jogabilidade (rndi, rndf,
+    random, choice) e o dos efeitos visuais em lote ('fx', um gerador do NumPy).
+    Assim, cortar ou afinar partículas nunca muda o que acontece no jogo.
+    Sem semente, uma é sorteada e fica guardada em 'seed' (para gravar o replay).
+    """
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(63)
+        self.seed = seed
+        gameplay_seed, fx_seed = np.random.SeedSequence(seed).spawn(2)
+        self.gameplay = random.Random(int.from_bytes(gameplay_seed.generate_state(4).tobytes(), 'little'))
+        self.fx = np.random.default_rng(fx_seed)
+
+    def rndi(self, a, b):
+        return self.gameplay.randint(a, b)
+
+    def rndf(self, a, b):
+        return self.gameplay.uniform(a, b)
+
+    def random(self):
+        return self.gameplay.random()
+
+    def choice(self, seq):
+        return self.gameplay.choice(seq)
+
+
+class Runtime:
+    """
+    Fachada para tudo o que a lógica do jogo consulta do "mundo externo":
+    entrada, relógio, números aleatórios e tamanho da tela.
+    Com as implementações padrão, a entrada vem do pyxel (gravada para replay),
+    o relógio é o do próprio jogo e os números aleatórios vêm de um gerador com
+    semente; no modo headless, permite rodar a simulação sem janela e com
+    fontes injetadas.
+    """
+    def __init__(self, input_source=None, clock=None, rng=None, width=128, height=128, headless=False):
+        self.input = input_source or (ScriptedInput() if headless else RecordingInput(PyxelInput()))
+        self.clock = clock or FrameClock()
+        self.rng = rng or SeededRandom()
+        self.width = width
+        self.height = height
+        self.headless = headless
+
+    @property
+    def frame_count(self):
+        return self.clock.frame_count
+
+    def begin_frame(self):
+        """Avança o relógio e lê a entrada do novo frame."""
+        self.clock.tick()
+        self.input.poll(self.clock.frame_count)
+
+    def btn(self, key):
+        return self.input.btn(key)
+
+    def btnp(self, key):
+        return self.input.btnp(key)
+
+    def btnr(self, key):
+        return self.input.btnr(key)
+
+    def rndi(self, a, b):
+        return self.rng.rndi(a, b)
+
+    def rndf(self, a, b):
+        return self.rng.rndf(a, b)
+
+    def random(self):
+        return self.rng.random()
+
+    def choice(self, seq):
+        return self.rng.choice(seq)
+
+
+# Runtime ativo, usado por todas as classes do jogo. O Game instala o seu ao ser criado.
+rt = Runtime()
+
+
+def set_runtime(runtime):
+    """Instala o runtime usado pela lógica do jogo."""
+    global rt
+    rt = runtime
 
 
 class AssetManager:
@@ -70,7 +544,7 @@ class AssetManager:
             'purple': {'color': 8, 'health': 4},
             'blue': {'color': 2, 'health': 4},
             'green': {'color': 3, 'health': 4},
-            'yellow': {'color': 15, 'health': 4},
+            'yellow': {'color': 15, 'health': 4, 'emitter': 'aimed'},
             'orange': {'color': 5, 'health': 4},
             'asteroid': {'color': 4, 'health': 5}
         }
@@ -140,12 +614,94 @@ class AssetManager:
                         'max_speed': 0.5, 'acceleration': 0.02, 'initial_angle_deg': -90}}
         }
 
+        # --- PADRÕES DE TIRO DOS INIMIGOS (ver BulletEmitter) ---
+        # 'count' balas por disparo, a 'speed' pixels por frame. Sem 'color', a bala
+        # pisca entre amarelo e laranja; 'cooldown' (frames) substitui o intervalo
+        # sorteado do inimigo. Um inimigo recebe o padrão pela sua definição
+        # ('emitter' em enemy_definitions) ou pela onda ('emitter' na definição da onda).
+        self.emitter_patterns = {
+            # Uma bala na direção do jogador (o tiro original dos inimigos amarelos)
+            'aimed': {'type': 'aimed', 'count': 1, 'spread_deg': 0, 'speed': 1.0, 'size': 2},
+            # Rajada mirada: leque estreito centrado no jogador
+            'aimed_burst': {'type': 'aimed', 'count': 3, 'spread_deg': 24, 'speed': 1.2, 'size': 2},
+            # Leque fixo para baixo (90 graus = para baixo na tela)
+            'fan': {'type': 'fan', 'count': 5, 'arc_deg': 70, 'direction_deg': 90, 'speed': 1.0, 'size': 2},
+            # Anel completo
+            'radial': {'type': 'radial', 'count': 16, 'speed': 0.8, 'size': 2, 'color': 8},
+            # Anel pequeno que gira um pouco a cada disparo
+            'spiral': {'type': 'spiral', 'count': 4, 'step_deg': 13, 'speed': 0.9, 'size': 2, 'color': 2,
+                       'cooldown': 5},
+        }
+
         self.asteroid_sizes = {
             'small': 6,
             'medium': 12,
             'large': 24
         }
 
+        # --- DEFINIÇÕES DAS ONDAS (compiladas pela WaveTimeline quando cada onda começa) ---
+        # 'interval' é o número de frames entre um spawn e o seguinte; 'interval_range'
+        # sorteia esse intervalo a cada spawn. Sem intervalo, todos surgem juntos.
+        alien_types = ['red', 'purple', 'blue', 'green', 'yellow', 'orange']
+        self.wave_definitions = {
+            'aliens': [
+                # Onda 1: Formação de Grade (Inspirado na Fase 1)
+                {'formation': 'grid', 'pattern': 'alien_grid_formation', 'types': alien_types,
+                 'rows': 3, 'cols': 5, 'spacing': (16, 12)},
+                # Onda 2: Entrada Galaga (Inspirado na Fase 2), terminando em linha
+                {'formation': 'entry', 'pattern': 'alien_galaga_entry', 'types': alien_types,
+                 'count': 8, 'spawn': (0, -10), 'slots': {'origin': (20, 40), 'step': (12, 0), 'per_row': 8},
+                 'interval': 30},
+                # Onda 3: Entrada Lateral (Inspirado na Fase 3), terminando num grid 2x5
+                {'formation': 'entry', 'pattern': 'alien_side_entry_align', 'types': alien_types,
+                 'count': 10, 'spawn': (0, 0), 'slots': {'origin': (20, 20), 'step': (18, 15), 'per_row': 5},
+                 'alternate_direction': True, 'interval': 20},
+            ],
+            'asteroids': [
+                {'formation': 'asteroid_field', 'patterns': ['asteroid_slow_drift'], 'sizes': ['medium', 'large'],
+                 'count': 5, 'y_range': (-40, -20), 'interval_range': (0, 60)},
+                {'formation': 'asteroid_field', 'patterns': ['asteroid_slow_drift', 'asteroid_fast_fall'],
+                 'sizes': ['medium', 'large'], 'count': 8, 'y_range': (-40, -20), 'interval_range': (0, 60)},
+            ],
+        }
+
+        # Tabelas de pixels dos sprites dos inimigos, montadas uma vez no carregamento
+        # (ver build_sprite_pixel_tables). Chave: (tipo do inimigo, índice do frame).
+        self.sprite_pixel_tables = {}
+
+        # Cache de contornos rotacionados dos asteroides (AsteroidSpriteCache); None no modo headless
+        self.asteroid_sprite_cache = None
+
+    def build_sprite_pixel_tables(self, sprite_w, sprite_h, image=None):
+        """
+        Lê da folha de sprites, uma única vez, os pixels visíveis (cor != 0) de cada
+        frame de animação de cada inimigo e guarda seus offsets e cores em arrays.
+        A folha não muda durante o jogo, então as explosões podem usar a tabela em
+        vez de chamar pget() pixel a pixel a cada inimigo destruído.
+        Sem imagem (modo headless), o sprite inteiro é considerado visível, na cor
+        definida para o inimigo.
+        """
+        self.sprite_pixel_tables = {}
+        for enemy_type, frames in self.enemy_animation_data.items():
+            for frame_index, (u, v) in enumerate(frames):
+                offsets_x, offsets_y, colors = [], [], []
+                for y_offset in range(sprite_h):
+                    for x_offset in range(sprite_w):
+                        if image is None:
+                            pixel_color = self.enemy_definitions[enemy_type]['color']
+                        else:
+                            pixel_color = image.pget(u + x_offset, v + y_offset)
+                        # A cor 0 é a cor de transparência padrão do Pyxel.
+                        if pixel_color != 0:
+                            offsets_x.append(x_offset)
+                            offsets_y.append(y_offset)
+                            colors.append(pixel_color)
+                self.sprite_pixel_tables[(enemy_type, frame_index)] = (
+                    np.array(offsets_x, dtype=np.float64),
+                    np.array(offsets_y, dtype=np.float64),
+                    np.array(colors, dtype=np.int32),
+                )
+
     # --- MÉTODOS DE ACESSO (GETTERS) ---
     # Fornecem uma interface limpa para outras classes obterem os dados.
 
@@ -166,9 +722,173 @@ class AssetManager:
 
     def get_bullet_properties(self):
         return self.bullet_properties
+    def get_emitter_pattern(self, name):
+        return self.emitter_patterns[name]
+
     def get_asteroid_sizes(self):
         return self.asteroid_sizes
 
+    def get_wave_definitions(self, category):
+        return self.wave_definitions[category]
+
+    def get_sprite_pixel_table(self, enemy_type, frame_index):
+        """Retorna (offsets_x, offsets_y, cores) dos pixels visíveis de um frame do inimigo."""
+        return self.sprite_pixel_tables[(enemy_type, frame_index)]
+
+    # Seções de dados de jogo que podem ser sobrescritas (balanceamento, testes)
+    OVERRIDABLE_SECTIONS = ('enemy_definitions', 'movement_patterns', 'bullet_properties',
+                            'emitter_patterns', 'asteroid_sizes', 'wave_definitions')
+
+    def apply_overrides(self, overrides):
+        """
+        Mescla 'overrides' nos dados de jogo, por seção: {'bullet_properties': {'blue': {'damage': 2}}}.
+        Dicionários são mesclados recursivamente; qualquer outro valor substitui o original.
+        Precisa ser chamado antes de o jogo montar as AssetTables (ver Game(asset_overrides=...)).
+        """
+        for section, values in overrides.items():
+            if section not in self.OVERRIDABLE_SECTIONS:
+                raise KeyError(f"seção de assets desconhecida ou não sobrescrevível: {section!r}")
+            _merge_into(getattr(self, section), values)
+
+
+def _merge_into(target, values):
+    for key, value in values.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge_into(target[key], value)
+        else:
+            target[key] = value
+
+
+def _freeze(value):
+    """Cópia somente leitura de dados de configuração: dicts viram MappingProxyType e listas viram tuplas."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class AssetTables:
+    """
+    Tabelas imutáveis e já resolvidas, montadas uma vez a partir do AssetManager
+    na inicialização. Os caminhos quentes indexam tuplas pelo índice da arma
+    atual em vez de buscar o dicionário de propriedades pelo nome a cada frame,
+    e como nada aqui pode ser alterado, as tabelas podem ser compartilhadas sem
+    cópias defensivas.
+    """
+    def __init__(self, asset_manager):
+        bullet_properties = asset_manager.get_bullet_properties()
+        self.weapon_names = tuple(bullet_properties)
+        self.weapons = tuple(_freeze(bullet_properties[name]) for name in self.weapon_names)
+        self.weapon_index = MappingProxyType({name: i for i, name in enumerate(self.weapon_names)})
+        # O que a HUD mostra de cada arma: a inicial do nome, na cor da bala
+        self.weapon_labels = tuple(name[0].upper() for name in self.weapon_names)
+        self.weapon_colors = tuple(weapon['color'] for weapon in self.weapons)
+        self.enemy_definitions = _freeze(asset_manager.get_enemy_definitions())
+
+
+class WaveTimeline:
+    """
+    Agenda de spawns das ondas. Quando uma onda começa, a sua definição (dados do
+    AssetManager) é compilada em eventos com o frame absoluto de cada spawn, numa
+    fila ordenada. A cada frame, tick() avança o relógio da agenda e due() entrega
+    só os eventos que venceram: cada spawn custa O(1), e os inimigos de uma onda
+    grande só são criados quando chega a vez deles.
+    """
+    def __init__(self, asset_manager, width=128):
+        self.asset_manager = asset_manager
+        self.width = width
+        self.frame = 0 # Relógio da agenda; só anda enquanto o jogo está rodando (não na pausa)
+        self.events = deque() # (frame absoluto, dados do spawn), em ordem de frame
+
+    def __len__(self):
+        return len(self.events)
+
+    def clear(self):
+        self.events.clear()
+
+    def tick(self):
+        self.frame += 1
+
+    def load(self, category, wave_number):
+        """
+        Compila a onda 'wave_number' da categoria, agendando os spawns a partir do
+        próximo frame. Depois da última onda, o ciclo recomeça na onda 1.
+        Retorna o número da onda efetivamente carregada.
+        """
+        waves = self.asset_manager.get_wave_definitions(category)
+        if not 1 <= wave_number <= len(waves):
+            wave_number = 1
+        wave = waves[wave_number - 1]
+        compile_formation = getattr(self, '_compile_' + wave['formation'])
+
+        self.events.clear()
+        spawns = compile_formation(wave)
+        spawns.sort(key=lambda spawn: spawn[0]) # Ordenação estável: empates mantêm a ordem da definição
+        start = self.frame + 1 # A onda começa no próximo tick
+        self.events.extend((start + offset, data) for offset, data in spawns)
+        return wave_number
+
+    def due(self):
+        """Retira e retorna os spawns cujo frame já chegou."""
+        events = self.events
+        ready = []
+        while events and events[0][0] <= self.frame:
+            ready.append(events.popleft()[1])
+        return ready
+
+    # --- COMPILADORES DE FORMAÇÃO ---
+    # Cada um retorna uma lista de (frames desde o início da onda, dados do spawn).
+
+    def _next_offset(self, wave, offset):
+        if 'interval_range' in wave:
+            return offset + rt.rndi(*wave['interval_range'])
+        return offset + wave.get('interval', 0)
+
+    def _compile_grid(self, wave):
+        pattern = self.asset_manager.get_movement_patterns()[wave['pattern']]
+        rows, cols = wave['rows'], wave['cols']
+        spacing_x, spacing_y = wave['spacing']
+        start_x = (self.width - (cols * Enemy.SPRITE_W + (cols - 1) * spacing_x)) / 2
+        start_y = -((rows * Enemy.SPRITE_H) + ((rows - 1) * spacing_y))
+        spawns = []
+        for row in range(rows):
+            for col in range(cols):
+                x, y = start_x + col * (Enemy.SPRITE_W + spacing_x), start_y + row * (Enemy.SPRITE_H + spacing_y)
+                spawn = {'x': x, 'y': y, 'type': rt.choice(wave['types']), 'pattern': pattern}
+                if 'emitter' in wave:
+                    spawn['kwargs'] = {'emitter': wave['emitter']}
+                spawns.append((0, spawn))
+        return spawns
+
+    def _compile_entry(self, wave):
+        pattern = self.asset_manager.get_movement_patterns()[wave['pattern']]
+        spawn_x, spawn_y = wave['spawn']
+        slots = wave['slots']
+        (origin_x, origin_y), (step_x, step_y), per_row = slots['origin'], slots['step'], slots['per_row']
+        spawns, offset = [], 0
+        for i in range(wave['count']):
+            kwargs = {'final_x': origin_x + (i % per_row) * step_x, 'final_y': origin_y + (i // per_row) * step_y}
+            if 'emitter' in wave:
+                kwargs['emitter'] = wave['emitter']
+            if wave.get('alternate_direction'):
+                kwargs['direction'] = 1 if i % 2 == 0 else -1
+            spawns.append((offset, {'x': spawn_x, 'y': spawn_y, 'type': rt.choice(wave['types']),
+                                    'pattern': pattern, 'kwargs': kwargs}))
+            offset = self._next_offset(wave, offset)
+        return spawns
+
+    def _compile_asteroid_field(self, wave):
+        movement_patterns = self.asset_manager.get_movement_patterns()
+        asteroid_sizes = self.asset_manager.get_asteroid_sizes()
+        spawns, offset = [], 0
+        for _ in range(wave['count']):
+            movement_pattern = movement_patterns[rt.choice(wave['patterns'])]
+            size_type = rt.choice(wave['sizes'])
+            x, y = rt.rndi(0, self.width - asteroid_sizes[size_type]), rt.rndi(*wave['y_range'])
+            offset = self._next_offset(wave, offset)
+            spawns.append((offset, {'is_asteroid': True, 'x': x, 'y': y, 'size': size_type, 'pattern': movement_pattern}))
+        return spawns
 
 
 class BaseState:
@@ -229,18 +949,21 @@ class PlayingState(BaseState):
         
 
 
-        if pyxel.btnp(pyxel.KEY_P):
+        if rt.btnp(pyxel.KEY_P):
                 self.game.state_manager.change_state("paused")
                 return # Retorna imediatamente para não processar o resto do frame
 
+        profiler = self.game.profiler
+        profiler.begin()
 
+        # Lógica de gerenciamento de ondas (uma vez por frame)
         self.game._update_wave_spawner()
-
+        profiler.mark('wave_spawner')
 
  # --- LÓGICA DO SCREEN SHAKE ---
         if self.game.shake_duration > 0:
-            self.game.shake_offset_x = pyxel.rndi(-self.game.shake_intensity, self.game.shake_intensity)
-            self.game.shake_offset_y = pyxel.rndi(-self.game.shake_intensity, self.game.shake_intensity)
+            self.game.shake_offset_x = rt.rndi(-self.game.shake_intensity, self.game.shake_intensity)
+            self.game.shake_offset_y = rt.rndi(-self.game.shake_intensity, self.game.shake_intensity)
             self.game.shake_duration -= 1
         else:
             self.game.shake_offset_x = 0
@@ -248,10 +971,10 @@ class PlayingState(BaseState):
         # --- FIM DA LÓGICA DO SCREEN SHAKE ---
 
         
-        self.game.game_time = pyxel.frame_count // self.game.game_fps 
+        self.game.game_time = rt.frame_count // self.game.game_fps 
 
         # Lógica de ativação/desativação do boost
-        if pyxel.btnp(pyxel.KEY_C) or pyxel.btnp(pyxel.GAMEPAD1_BUTTON_X):
+        if rt.btnp(pyxel.KEY_C) or rt.btnp(pyxel.GAMEPAD1_BUTTON_X):
             self.game.is_boosting = not self.game.is_boosting
             if self.game.is_boosting: 
                 self.game.boost_timer = self.game.boost_duration 
@@ -276,41 +999,43 @@ class PlayingState(BaseState):
             if self.game.player_energy < self.game.player_max_energy:
                 self.game.player_energy += 1
             self.game.energy_recharge_timer = 0
+        profiler.mark('input')
 
-        # Atualiza todas as partículas de fundo (estrelas e asteroides de fundo)
-        for p in self.game.background_particles: p.update()
-        for p in self.game.midground_particles: p.update()
-        for p in self.game.foreground_particles: p.update()
+        # Atualiza as camadas de fundo (só a camada próxima é atualizada elemento a elemento)
+        for layer in self.game.background_layers: layer.update()
+        self.game.foreground_stars.update()
+        profiler.mark('background')
 
         # Geração de partículas de rastro para a nave do jogador
         if self.game.is_boosting:
             min_dy, max_dy, num_particles, c1, c2 = 1.0, 2.0, 6, 8, 2  
-            flame_size = 2 if random.random() < 0.4 else 1 
+            flame_size = 2 if rt.random() < 0.4 else 1 
         else:
             min_dy, max_dy, num_particles, c1, c2 = 0.5, 1.0, 2, 4, 5 
             flame_size = 1
         
-        flame_color = c1 if pyxel.frame_count % 4 < 2 else c2 
-        flame_dx_offset = 0.5 if pyxel.btn(pyxel.KEY_LEFT) else -0.5 if pyxel.btn(pyxel.KEY_RIGHT) else 0
-
-        for _ in range(num_particles):
-            flame_x = self.game.player.x + pyxel.rndf(3, self.game.player.width - 4) #tamanho da chama
-            # A chama é gerada na parte inferior da nave, com um pequeno deslocamento aleatório
-            flame_y = self.game.player.y + self.game.player.height-1
-            dx = pyxel.rndf(-0.5, 0.5) + flame_dx_offset
-            dy = pyxel.rndf(min_dy, max_dy) 
-            self.game.flame_particles.append(FlameParticle(flame_x, flame_y, dx, dy, flame_color, pyxel.rndi(5,15), flame_size))
-
-        for p in self.game.flame_particles:
-            p.update()
-        # Depois, filtramos a lista
-        self.game.flame_particles[:] = [p for p in self.game.flame_particles if p.lifetime > 0]
+        flame_color = c1 if rt.frame_count % 4 < 2 else c2 
+        flame_dx_offset = 0.5 if rt.btn(pyxel.KEY_LEFT) else -0.5 if rt.btn(pyxel.KEY_RIGHT) else 0
+
+        flames = self.game.flame_particles
+        rng = flames.rng
+        flame_x = self.game.player.x + rng.uniform(3, self.game.player.width - 4, num_particles) #tamanho da chama
+        # A chama é gerada na parte inferior da nave, com um pequeno deslocamento aleatório
+        flame_y = self.game.player.y + self.game.player.height-1
+        dx = rng.uniform(-0.5, 0.5, num_particles) + flame_dx_offset
+        dy = rng.uniform(min_dy, max_dy, num_particles)
+        flames.spawn(flame_x, flame_y, dx, dy, flame_color, rng.integers(5, 16, num_particles), flame_size, effect='engine_flame')
+
+        # Integra e remove as chamas expiradas numa única passada vetorizada
+        flames.update()
+        profiler.mark('flames')
 
                 # --- LÓGICA DE DISPARO ---
         enemies_destroyed_this_frame = []
+        hooks = self.game.hooks
         
-        current_bullet_type_name = self.game.bullet_type_keys[self.game.current_bullet_type_index]
-        props = self.game.asset_manager.get_bullet_properties()[current_bullet_type_name]
+        current_bullet_type_name = self.game.tables.weapon_names[self.game.current_bullet_type_index]
+        props = self.game.tables.weapons[self.game.current_bullet_type_index]
         self.game.is_laser_active = False 
         self.game.laser_draw_end_y = 0 
         self.game.laser_spark_point = None
@@ -319,7 +1044,7 @@ class PlayingState(BaseState):
         self.game.player.is_fully_charged = False
 
         if current_bullet_type_name == 'red':
-            if pyxel.btn(pyxel.KEY_Z) or pyxel.btn(pyxel.GAMEPAD1_BUTTON_A):
+            if rt.btn(pyxel.KEY_Z) or rt.btn(pyxel.GAMEPAD1_BUTTON_A):
             # ### LÓGICA ADICIONADA ###
             # Capturamos o retorno do método _fire_laser.
                 killed_enemy = self.game._fire_laser(props)
@@ -328,14 +1053,14 @@ class PlayingState(BaseState):
                 if killed_enemy:
                     enemies_destroyed_this_frame.append(killed_enemy)
         elif current_bullet_type_name == 'purple':
-            if pyxel.btn(pyxel.KEY_Z) or pyxel.btn(pyxel.GAMEPAD1_BUTTON_A):
+            if rt.btn(pyxel.KEY_Z) or rt.btn(pyxel.GAMEPAD1_BUTTON_A):
                 self.game.is_charging_weapon = True
                 self.game.player.is_charging = True
                 if self.game.charge_timer < props['charge_time']:
                     self.game.charge_timer += 1
                 if self.game.charge_timer >= props['charge_time']:
                     self.game.player.is_fully_charged = True
-            elif (pyxel.btnr(pyxel.KEY_Z) or pyxel.btnr(pyxel.GAMEPAD1_BUTTON_A)) and self.game.is_charging_weapon:
+            elif (rt.btnr(pyxel.KEY_Z) or rt.btnr(pyxel.GAMEPAD1_BUTTON_A)) and self.game.is_charging_weapon:
                 if self.game.charge_timer >= props['charge_time']:
                     self.game._fire_projectiles(props)
                 self.game.is_charging_weapon = False
@@ -345,72 +1070,90 @@ class PlayingState(BaseState):
                 self.game.charge_timer = 0
         # --- START REPLACEMENT HERE ---
         else: # This handles 'yellow' and any other projectile types that are not red/purple
-            if pyxel.btn(pyxel.KEY_Z) or pyxel.btn(pyxel.GAMEPAD1_BUTTON_A):
+            if rt.btn(pyxel.KEY_Z) or rt.btn(pyxel.GAMEPAD1_BUTTON_A):
                 # Simple cooldown check for regular projectiles
-                is_ready_to_fire = (pyxel.frame_count - self.game.last_shot_frame[current_bullet_type_name] >= props['cooldown'])
+                is_ready_to_fire = (rt.frame_count - self.game.last_shot_frame[current_bullet_type_name] >= props['cooldown'])
                 
                 if is_ready_to_fire:
                     if self.game._fire_projectiles(props): # This will now always return True
-                        self.game.last_shot_frame[current_bullet_type_name] = pyxel.frame_count
+                        self.game.last_shot_frame[current_bullet_type_name] = rt.frame_count
 
                                 
-        if pyxel.btnp(pyxel.KEY_X) or pyxel.btnp(pyxel.GAMEPAD1_BUTTON_B):
+        if rt.btnp(pyxel.KEY_X) or rt.btnp(pyxel.GAMEPAD1_BUTTON_B):
             self.game.current_bullet_type_index = (self.game.current_bullet_type_index + 1) % len(self.game.bullet_type_keys)
             self.game.yellow_burst_count = 0
 
-        if pyxel.btnp(pyxel.KEY_V) or pyxel.btnp(pyxel.GAMEPAD1_BUTTON_Y):
+        if rt.btnp(pyxel.KEY_V) or rt.btnp(pyxel.GAMEPAD1_BUTTON_Y):
             self.game.current_enemy_category = 'asteroids' if self.game.current_enemy_category == 'aliens' else 'aliens'
             # Limpa tudo para a transição
             self.game.enemies.clear()
-            self.game.enemies_to_spawn.clear()
+            self.game.wave_timeline.clear()
             # Reseta para a onda 1 da nova categoria e a prepara
             self.game.wave_number = 1
             self.game._setup_wave()
             self.game.game_state = 'playing'
 
 
-        if pyxel.btnp(pyxel.KEY_G):
+        if rt.btnp(pyxel.KEY_G):
             self.game.glow_mode = (self.game.glow_mode + 1) % 5
+        profiler.mark('firing')
 
-        # Atualiza todos os inimigos
+        # Atualiza todos os inimigos: movimento em grupo, depois animação e tiro de cada um
+        self.game.enemy_movement.advance(self.game.enemies)
         for enemy in self.game.enemies: 
-            new_bullet = enemy.update(self.game.player)
-            if new_bullet:
-                self.game.enemy_bullets.append(new_bullet)
+            enemy.act(self.game.player, self.game.enemy_bullets)
 
 
         # Tecla 'C' para forçar a próxima onda.
-        if pyxel.btnp(pyxel.KEY_C):
+        if rt.btnp(pyxel.KEY_C):
             self.game.enemies.clear()
-            self.game.enemies_to_spawn.clear()
+            self.game.wave_timeline.clear()
             self.game.wave_spawn_timer = self.game.wave_spawn_delay # Força a transição imediata
+        profiler.mark('enemy_update')
 
         # --- SEÇÃO DE COLISÃO DE BALAS E PROCESSAMENTO DE DESTRUIÇÃO ---
         bullets_to_keep = []
-        
-        
+
+        # Broadphase: a grade é reconstruída uma vez por frame, depois que os inimigos se moveram.
+        enemy_grid = self.game.enemy_grid
+        enemy_grid.rebuild(self.game.enemies)
+
+        # Índice de vizinho mais próximo para a aquisição de alvo dos mísseis,
+        # reconstruído no máximo uma vez por frame (só se algum míssil estiver procurando alvo).
+        enemy_index = None
+        # Inimigos vivos, para os mísseis largarem alvos que já saíram da lista (montado só se preciso)
+        live_enemies = None
+        width, height = rt.width, rt.height
+
         for bullet in self.game.bullets:
+            if bullet.target_enemy is not None:
+                if live_enemies is None:
+                    live_enemies = set(self.game.enemies)
+                if bullet.target_enemy not in live_enemies:
+                    bullet.target_enemy = None # O update() passa a bala para 'lost_target'
             if bullet.state == 'seeking' and not bullet.target_enemy:
-                closest_enemy, min_dist_sq = None, float('inf')
-                for enemy in self.game.enemies:
-                    if not isinstance(enemy, Asteroid): 
-                        dist_sq = ((enemy.x + enemy.width / 2) - bullet.x)**2 + ((enemy.y + enemy.height / 2) - bullet.y)**2
-                        if dist_sq < min_dist_sq:
-                            min_dist_sq, closest_enemy = dist_sq, enemy
-                if closest_enemy and min_dist_sq <= bullet.homing_distance_sq:
+                if enemy_index is None:
+                    enemy_index = self.game.enemy_index
+                    enemy_index.rebuild(self.game.enemies)
+                closest_enemy = enemy_index.nearest(bullet.x, bullet.y, math.sqrt(bullet.homing_distance_sq),
+                                                    exclude_types=('asteroid',))
+                if closest_enemy:
                     bullet.target_enemy, bullet.state = closest_enemy, 'homing'
             
             bullet.update() 
             
             bullet_should_be_removed = False
-            for enemy in self.game.enemies:
+            # Só testa (narrowphase) os inimigos que compartilham células com a bala.
+            for enemy in enemy_grid.query(bullet.x, bullet.y, bullet.width, bullet.height):
                 collided = False
                 if isinstance(enemy, Asteroid):
                     # Para asteroides, usamos a verificação precisa de polígono.
                     # Pegamos o centro da bala como o ponto a ser verificado.
                     bullet_center_x = bullet.x + bullet.width / 2
                     bullet_center_y = bullet.y + bullet.height / 2
-                    if self.game._is_point_in_polygon(bullet_center_x, bullet_center_y, enemy.get_rotated_vertices()):
+                    # Rejeição rápida pelo círculo envolvente antes do teste do polígono.
+                    if (geometry.point_in_circle(bullet_center_x, bullet_center_y, *enemy.get_bounding_circle()) and
+                            geometry.point_in_polygon(bullet_center_x, bullet_center_y, enemy.get_world_coords())):
                         collided = True
                 else:
                     # Para inimigos normais (não rotacionados), o AABB é eficiente e correto.
@@ -430,17 +1173,28 @@ class PlayingState(BaseState):
                     if isinstance(enemy, Asteroid) and bullet.type == 'orange':
                         damage_to_deal *= 1.5
 
+                    hooks.enemy_damaged(enemy, bullet.type, damage_to_deal)
                     if enemy.take_damage(damage_to_deal): 
+                        if enemy not in enemies_destroyed_this_frame:
+                            hooks.enemy_killed(enemy, bullet.type)
                         enemies_destroyed_this_frame.append(enemy) 
                         self.game.score += 1 
                     
                     if bullet_should_be_removed:
                         break 
             
-            if bullet.y > -bullet.height and not bullet_should_be_removed:
+            # Descarta as balas que saíram por cima ou por baixo, e pelos lados só as que não voltam (ver gone_sideways)
+            if (not bullet_should_be_removed and bullet.y > -bullet.height and bullet.y < height and
+                    ((bullet.x > -bullet.width and bullet.x < width) or not bullet.gone_sideways(width))):
                 bullets_to_keep.append(bullet)
+            else:
+                self.game.bullet_pool.release(bullet)
         
         self.game.bullets = bullets_to_keep 
+        # Os índices são do frame atual: soltá-los evita que segurem inimigos já removidos
+        enemy_grid.clear()
+        if enemy_index is not None:
+            enemy_index.clear()
 
         # --- Processa os inimigos destruídos e cria as explosões ---
         newly_destroyed_enemies = [e for e in self.game.enemies if e in enemies_destroyed_this_frame]
@@ -465,61 +1219,61 @@ class PlayingState(BaseState):
         
         # Atualiza a lista de inimigos, removendo os destruídos e adicionando fragmentos
         self.game.enemies = [e for e in self.game.enemies if e not in newly_destroyed_enemies] + new_fragments
+        profiler.mark('bullet_collision')
+
+        # Balas dos inimigos: integração, colisão com o jogador e remoção em lote
+        enemy_bullets = self.game.enemy_bullets
+        enemy_bullets.update()
+        player = self.game.player
+        # Verifica a colisão apenas se o jogador estiver vivo e sem invencibilidade.
+        # Um acerto liga a invencibilidade, então no máximo uma bala acerta por frame.
+        if player.is_alive and player.invincibility_timer == 0:
+            hit = enemy_bullets.first_hit(player.x, player.y, player.width, player.height)
+            if hit is not None:
+                bullet_color = enemy_bullets.remove(hit)
+                self.game.player_hp -= 10 # Player toma 10 de dano
+                self.game.hooks.player_damaged(10, 'enemy_bullet')
+                self.game.trigger_screen_shake(duration=15, intensity=2) # Ativa o shake
+
+                # Cria faíscas no jogador quando atingido.
+                self.game.create_hit_sparks(player.x + player.width / 2, player.y + player.height / 2, bullet_color, effect='player_hit')
 
-        enemy_bullets_to_keep = []
-        for bullet in self.game.enemy_bullets:
-            bullet.update()
-            
-            collided_with_player = False
-            # Verifica a colisão apenas se o jogador estiver vivo e sem invencibilidade.
-            if self.player.is_alive and self.player.invincibility_timer == 0:
-                if self.game._check_aabb_collision(bullet.x, bullet.y, bullet.width, bullet.height,
-                                            self.player.x, self.player.y, self.player.width, self.player.height):
-                    
-                    collided_with_player = True
-                    self.player_hp -= 10 # Player toma 10 de dano
-                    self.game.trigger_screen_shake(duration=15, intensity=2) # Ativa o shake
-                    
-                    # Cria faíscas no jogador quando atingido.
-                    self.game.create_hit_sparks(self.game.player.x + self.game.player.width / 2, self.game.player.y + self.game.player.height / 2, bullet.color)
-
-                    if self.game.player_hp <= 0:
-                        self.game.player_lives -= 1
-                        if self.game.player_lives <= 0:
-                            self.game.player.is_alive = False
-                            self.game.state_manager.change_state("game_over")
-                        else:
-                            self.game.player_hp = self.game.player_max_hp # Reseta HP ao perder uma vida
-                            self.game.player.take_damage() # Ativa invencibilidade
-                    else: # Se o HP ainda está acima de zero
-                        self.game.player.take_damage() # Ativa a invencibilidade temporária.
-            
-            # Mantém a bala se ela não atingiu o jogador e ainda está na tela.
-            if not collided_with_player and bullet.y < pyxel.height and bullet.y > -bullet.height:
-                enemy_bullets_to_keep.append(bullet)
-                
-        self.game.enemy_bullets = enemy_bullets_to_keep
+                if self.game.player_hp <= 0:
+                    self.game.player_lives -= 1
+                    if self.game.player_lives <= 0:
+                        player.is_alive = False
+                        self.game.state_manager.change_state("game_over")
+                    else:
+                        self.game.player_hp = self.game.player_max_hp # Reseta HP ao perder uma vida
+                        player.take_damage() # Ativa invencibilidade
+                else: # Se o HP ainda está acima de zero
+                    player.take_damage() # Ativa a invencibilidade temporária.
+
+        # Mantém só as balas que ainda estão na tela
+        enemy_bullets.cull(rt.width, rt.height)
+        profiler.mark('enemy_bullets')
 
         # --- FIM DA SEÇÃO DE COLISÃO DE BALAS ---
 
         # Atualiza e remove partículas de explosão/detritos
-        self.game.particles[:] = [p for p in self.game.particles if p.update()]
+        self.game.particles.update()
+        profiler.mark('particles')
 
         # --- SEÇÃO DE COLISÃO JOGADOR-INIMIGO ---
         if self.game.player.is_alive and self.game.player.invincibility_timer == 0:
             enemies_collided_with_player = []
             
-            # Define os vértices do retângulo do jogador uma vez
+            # Define o retângulo do jogador uma vez
             px, py = self.game.player.x, self.game.player.y
             pw, ph = self.game.player.width, self.game.player.height
-            player_vertices = [(px, py), (px + pw, py), (px + pw, py + ph), (px, py + ph)]
 
             for enemy in self.game.enemies:
                 collided = False
                 if isinstance(enemy, Asteroid):
-                    # Para asteroides, usamos a colisão precisa de polígonos
-                    asteroid_vertices = enemy.get_rotated_vertices()
-                    if self.game._check_polygon_collision(player_vertices, asteroid_vertices):
+                    # Para asteroides, usamos a colisão precisa polígono x retângulo (SAT),
+                    # depois de uma rejeição rápida pelo círculo envolvente.
+                    if (geometry.circle_overlaps_aabb(*enemy.get_bounding_circle(), px, py, pw, ph) and
+                            geometry.polygon_intersects_aabb(enemy.get_world_coords(), px, py, pw, ph)):
                         collided = True
                 else:
                     # Para inimigos normais, AABB é suficiente e mais rápido
@@ -531,6 +1285,7 @@ class PlayingState(BaseState):
 
             if enemies_collided_with_player:
                 self.game.player_hp -= 25 # Dano de colisão direta (maior)
+                self.game.hooks.player_damaged(25, 'collision')
                 self.game.trigger_screen_shake(duration=20, intensity=3) # Shake mais forte
 
                 # Para cada inimigo que colidiu, cria sua respectiva explosão
@@ -557,59 +1312,64 @@ class PlayingState(BaseState):
                     self.game.player.take_damage()        # --- FIM DA SEÇÃO DE COLISÃO JOGADOR-INIMIGO ---
 
         # Remove inimigos que saíram da tela ou foram destruídos
-        self.game.enemies[:] = [e for e in self.game.enemies if e.health > 0 and e.y < pyxel.height and e.x < pyxel.width and e.x + e.width > 0]
-
-        # Lógica de gerenciamento de ondas
-        self.game._update_wave_spawner()
+        self.game.enemies[:] = [e for e in self.game.enemies if e.health > 0 and e.y < rt.height and e.x < rt.width and e.x + e.width > 0]
+        profiler.mark('player_collision')
 
         # Atualiza e coleta power-ups
         powerups_to_keep = []
         for p in self.game.powerups:
             p.update()
-            if self.game._check_aabb_collision(self.player.x, self.player.y, self.player.width, self.player.height, p.x, p.y, p.width, p.height):
+            if self.game._check_aabb_collision(self.game.player.x, self.game.player.y, self.game.player.width, self.game.player.height, p.x, p.y, p.width, p.height):
                 if p.type == 'boost':
                     self.game.is_boosting, self.game.boost_timer = True, self.game.boost_duration 
-            elif p.y < pyxel.height: 
+            elif p.y < rt.height: 
                 powerups_to_keep.append(p)
         self.game.powerups = powerups_to_keep
-
-
-        pass
+        profiler.mark('powerups')
 
     def draw(self):
         # A MAIORIA DO CÓDIGO DO Game.draw() VEM PARA CÁ.
+        profiler = self.game.profiler
+        profiler.begin()
                 # Aplica o offset do shake ANTES de limpar a tela e desenhar o fundo
         pyxel.camera(self.game.shake_offset_x, self.game.shake_offset_y)
 
         pyxel.cls(0) # Fundo da tela: Preto (0)
         # 1. Desenha as camadas de fundo
-        for p in self.game.background_particles: p.draw()
-        for p in self.game.midground_particles: p.draw()
-        for p in self.game.foreground_particles: p.draw()
+        for layer in self.game.background_layers: layer.draw()
+        self.game.foreground_stars.draw()
+        profiler.mark('draw_background')
         
         # 2. Desenha os objetos principais do jogo
         self.game.player.draw() 
         for e in self.game.enemies: e.draw(self.game.glow_mode) # Passa o modo de glow para os inimigos
         for p in self.game.powerups: p.draw()
+        profiler.mark('draw_actors')
 
         # 3. Desenha os efeitos e projéteis por cima dos objetos
-        for p in self.game.flame_particles: p.draw()
+        self.game.flame_particles.draw()
         if self.game.is_laser_active: 
             laser_x = self.game.player.x + (self.game.player.width // 2)
             pyxel.line(laser_x, self.game.player.y, laser_x, self.game.laser_draw_end_y, 4) 
         for b in self.game.bullets: b.draw()
-        for b in self.game.enemy_bullets: b.draw() # Desenha as balas dos inimigos.
+        self.game.enemy_bullets.draw() # Desenha as balas dos inimigos.
+        profiler.mark('draw_projectiles')
         
         ### CORREÇÃO: A LINHA ABAIXO FOI MOVIDA PARA DEPOIS DE DESENHAR OS INIMIGOS ###
         # Agora as partículas de explosão são desenhadas por cima de tudo.
-        for p in self.game.particles: p.draw() 
+        self.game.particles.draw()
+        profiler.mark('draw_particles')
 
         # Reseta a câmera para desenhar elementos da UI que NÃO DEVEM tremer
         pyxel.camera(0, 0)
 
         # 4. Desenha a Interface do Usuário (HUD), que sempre fica na camada mais alta
         self.game.hud.draw()
-        pass
+        profiler.mark('draw_hud')
+
+        # Sobreposição do profiler (fora das medições)
+        if profiler.show_overlay:
+            profiler.draw_overlay(self.game.loop.stats())
 
 # ADICIONE ESTA NOVA CLASSE
 class PausedState(BaseState):
@@ -619,7 +1379,7 @@ class PausedState(BaseState):
 
     def update(self):
         # Apenas verifica a tecla para despausar.
-        if pyxel.btnp(pyxel.KEY_P):
+        if rt.btnp(pyxel.KEY_P):
             # Usa o StateManager para voltar ao estado de jogo.
             self.game.state_manager.change_state("playing")
 
@@ -628,9 +1388,9 @@ class PausedState(BaseState):
         self.game.playing_state.draw()
         
         # Depois, desenha a sobreposição de pausa por cima.
-        pyxel.bltm(0, 0, 0, 0, 126, pyxel.width, pyxel.height, 0)
+        pyxel.bltm(0, 0, 0, 0, 126, rt.width, rt.height, 0)
         text = "PAUSED"
-        text_x = (pyxel.width - len(text) * 4) / 2
+        text_x = (rt.width - len(text) * 4) / 2
         pyxel.text(text_x, 60, text, 7)
 
 # ADICIONE ESTA NOVA CLASSE
@@ -641,7 +1401,7 @@ class GameOverState(BaseState):
 
     def update(self):
         # Apenas verifica a tecla para reiniciar.
-        if pyxel.btnp(pyxel.KEY_SPACE) or pyxel.btnp(pyxel.GAMEPAD1_BUTTON_START):
+        if rt.btnp(pyxel.KEY_SPACE) or rt.btnp(pyxel.GAMEPAD1_BUTTON_START):
             self.game.restart_game()
 
     def draw(self):
@@ -650,12 +1410,12 @@ class GameOverState(BaseState):
         
         # Desenha a mensagem "GAME OVER" por cima.
         text = "GAME OVER"
-        text_x = (pyxel.width - len(text) * 4) / 2
+        text_x = (rt.width - len(text) * 4) / 2
         pyxel.text(text_x, 50, text, 15)
         
         prompt = "PRESS SPACE TO RESTART"
-        prompt_x = (pyxel.width - len(prompt) * 4) / 2
-        if pyxel.frame_count % 30 < 20:
+        prompt_x = (rt.width - len(prompt) * 4) / 2
+        if rt.frame_count % 30 < 20:
             pyxel.text(prompt_x, 60, prompt, 7)
     
 
@@ -711,25 +1471,25 @@ class Player:
 
         # --- LÓGICA DE MOVIMENTO ---
         # Mover para a esquerda
-        if pyxel.btn(pyxel.KEY_LEFT) or pyxel.btn(pyxel.GAMEPAD1_BUTTON_DPAD_LEFT):
+        if rt.btn(pyxel.KEY_LEFT) or rt.btn(pyxel.GAMEPAD1_BUTTON_DPAD_LEFT):
             self.x = max(0, self.x - self.speed)
         # Mover para a direita
-        if pyxel.btn(pyxel.KEY_RIGHT) or pyxel.btn(pyxel.GAMEPAD1_BUTTON_DPAD_RIGHT):
-            self.x = min(pyxel.width - self.width, self.x + self.speed)
+        if rt.btn(pyxel.KEY_RIGHT) or rt.btn(pyxel.GAMEPAD1_BUTTON_DPAD_RIGHT):
+            self.x = min(rt.width - self.width, self.x + self.speed)
         # Mover para cima
-        if pyxel.btn(pyxel.KEY_UP) or pyxel.btn(pyxel.GAMEPAD1_BUTTON_DPAD_UP):
+        if rt.btn(pyxel.KEY_UP) or rt.btn(pyxel.GAMEPAD1_BUTTON_DPAD_UP):
             self.y = max(0, self.y - self.speed)
         # Mover para baixo
-        if pyxel.btn(pyxel.KEY_DOWN) or pyxel.btn(pyxel.GAMEPAD1_BUTTON_DPAD_DOWN):
-            self.y = min(pyxel.height - self.height, self.y + self.speed)
+        if rt.btn(pyxel.KEY_DOWN) or rt.btn(pyxel.GAMEPAD1_BUTTON_DPAD_DOWN):
+            self.y = min(rt.height - self.height, self.y + self.speed)
 
         # --- LÓGICA DE ANIMAÇÃO DE INCLINAÇÃO ---
         
         # 1. Determinar o estado alvo da inclinação com base no input do jogador.
         target_tilt = 0
-        if pyxel.btn(pyxel.KEY_LEFT) or pyxel.btn(pyxel.GAMEPAD1_BUTTON_DPAD_LEFT):
+        if rt.btn(pyxel.KEY_LEFT) or rt.btn(pyxel.GAMEPAD1_BUTTON_DPAD_LEFT):
             target_tilt = -4  # Alvo: inclinação máxima para a esquerda
-        elif pyxel.btn(pyxel.KEY_RIGHT) or pyxel.btn(pyxel.GAMEPAD1_BUTTON_DPAD_RIGHT):
+        elif rt.btn(pyxel.KEY_RIGHT) or rt.btn(pyxel.GAMEPAD1_BUTTON_DPAD_RIGHT):
             target_tilt = 4   # Alvo: inclinação máxima para a direita
 
         # 2. Controlar o tempo da animação.
@@ -752,7 +1512,7 @@ class Player:
         # Se o jogador estiver invencível, a nave pisca.
         if self.invincibility_timer > 0:
             # Em frames pares, pulamos o desenho para criar o efeito de piscar.
-            if pyxel.frame_count % 2 == 0:
+            if rt.frame_count % 2 == 0:
                 return 
 
         # --- LÓGICA DE FEEDBACK VISUAL DE CARREGAMENTO (existente) ---
@@ -760,14 +1520,14 @@ class Player:
         center_y = self.y + self.height / 2
         
         if self.is_fully_charged:
-            pulse = math.sin(pyxel.frame_count * 0.4) * 1.5 
+            pulse = math.sin(rt.frame_count * 0.4) * 1.5 
             radius = 7 + pulse
-            color = 10 if pyxel.frame_count % 10 < 5 else 6
+            color = 10 if rt.frame_count % 10 < 5 else 6
             pyxel.circb(center_x, center_y, radius, color)
         elif self.is_charging:
-            pulse = math.sin(pyxel.frame_count * 0.3) 
+            pulse = math.sin(rt.frame_count * 0.3) 
             radius = 6 + pulse
-            color = 10 if pyxel.frame_count % 12 < 6 else 9
+            color = 10 if rt.frame_count % 12 < 6 else 9
             pyxel.circb(center_x, center_y, radius, color)
 
         # --- LÓGICA DE DESENHO DA NAVE (existente) ---
@@ -783,8 +1543,21 @@ class Player:
         pyxel.blt(self.x, self.y, self.SPRITE_BANK, u, v, self.SPRITE_W, self.SPRITE_H, 0)
 
 class Bullet:
+    # Layout compacto (sem __dict__): as balas são criadas e descartadas o tempo todo.
+    __slots__ = ('x', 'y', 'width', 'height', 'color', 'type', 'damage', 'behavior',
+                 'dx', 'dy', 'speed', 'angle', 'particle_list', 'owner', 'state', 'target_enemy',
+                 'y_initial', 'initial_dx', 'return_angle', 'return_dy', 'angular_velocity',
+                 'max_speed', 'acceleration', 'homing_distance_sq', 'homing_turn_speed')
+    # Estados em que a bala ainda muda de direção: o bumerangue na ida e o míssil atrás do alvo
+    TURNING_STATES = frozenset(('straight', 'curving', 'launching', 'seeking', 'homing'))
+
     def __init__(self, x, y, color, type, dx, dy, damage, height, width=1, 
              behavior=None, particle_list=None, owner='player'):
+        self.reset(x, y, color, type, dx, dy, damage, height, width, behavior, particle_list, owner)
+
+    def reset(self, x, y, color, type, dx, dy, damage, height, width=1, 
+             behavior=None, particle_list=None, owner='player'):
+        """(Re)inicializa a bala. Usado pelo construtor e pelo ObjectPool ao reaproveitar a instância."""
         self.x = x
         self.y = y
         self.width = width
@@ -832,6 +1605,22 @@ class Bullet:
                 self.homing_distance_sq = self.behavior.get('homing_distance', 30) ** 2
                 self.homing_turn_speed = self.behavior.get('turn_speed', 0.1)
 
+    def release(self):
+        """Solta as referências a outros objetos antes de a bala voltar para o pool."""
+        self.target_enemy = None
+        self.particle_list = None
+        self.behavior = None
+
+    def gone_sideways(self, width):
+        """
+        True se a bala saiu por uma lateral e não volta mais: só as que andam em linha
+        reta (sem estado, bumerangue em 'returning', míssil em 'lost_target') e para
+        fora. Um bumerangue na ida pode passar da borda até ~25 px e voltar na curva.
+        """
+        if self.state in self.TURNING_STATES:
+            return False
+        return (self.x <= -self.width and self.dx <= 0) or (self.x >= width and self.dx >= 0)
+
     def update(self):
         # Lógica de atualização para balas com comportamento 'boomerang'
         if self.state == 'straight':
@@ -880,13 +1669,13 @@ class Bullet:
 
         # Geração de rastro de chama para balas do tipo 'orange' (míssil teleguiado)
         if self.type == 'orange' and self.state in ['launching', 'seeking', 'homing', 'lost_target']:
-            for _ in range(2):
-                rastro_color = 4 if pyxel.frame_count % 4 < 2 else 15 
-                back_x = self.x - 1.5 * math.cos(self.angle)
-                back_y = self.y - 1.5 * math.sin(self.angle)
-                particle_dx = -self.dx * 1.2 + pyxel.rndf(-0.5, 0.5)
-                particle_dy = -self.dy * 1.2 + pyxel.rndf(-0.5, 0.5)
-                self.particle_list.append(FlameParticle(back_x, back_y, particle_dx, particle_dy, rastro_color, pyxel.rndi(6, 12)))
+            rng = self.particle_list.rng
+            rastro_color = 4 if rt.frame_count % 4 < 2 else 15 
+            back_x = self.x - 1.5 * math.cos(self.angle)
+            back_y = self.y - 1.5 * math.sin(self.angle)
+            particle_dx = -self.dx * 1.2 + rng.uniform(-0.5, 0.5, 2)
+            particle_dy = -self.dy * 1.2 + rng.uniform(-0.5, 0.5, 2)
+            self.particle_list.spawn(back_x, back_y, particle_dx, particle_dy, rastro_color, rng.integers(6, 13, 2), effect='missile_trail')
 
         # Atualiza a posição da bala
         self.x += self.dx
@@ -905,49 +1694,477 @@ class Bullet:
             pyxel.rect(self.x, self.y, self.width, self.height, self.color)
 
 
-class ExplosionParticle:
-    def __init__(self, x, y, dx, dy, color, lifetime):
-        self.x = x
-        self.y = y
-        self.dx = dx 
-        self.dy = dy 
-        self.color = color
-        self.lifetime = lifetime # Tempo de vida da partícula em frames
+class ObjectPool:
+    """
+    Reaproveita instâncias de uma classe por meio de uma lista livre.
+    acquire() devolve um objeto reinicializado com reset(*args), e release()
+    o devolve à lista livre. A classe precisa ter reset() (mesmos argumentos do
+    construtor) e release() (que solta referências a outros objetos).
+    """
+    def __init__(self, cls, prealloc=0):
+        self.cls = cls
+        self.free = [cls.__new__(cls) for _ in range(prealloc)]
+        self.created = prealloc # Total de instâncias já criadas pelo pool
+        self.in_use = 0
+        self.high_water = 0     # Maior número de instâncias em uso ao mesmo tempo
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            obj = self.free.pop()
+        else:
+            obj = self.cls.__new__(self.cls)
+            self.created += 1
+        obj.reset(*args, **kwargs)
+        self.in_use += 1
+        if self.in_use > self.high_water:
+            self.high_water = self.in_use
+        return obj
+
+    def release(self, obj):
+        obj.release()
+        self.in_use -= 1
+        self.free.append(obj)
+
+    def release_all(self, objs):
+        for obj in objs:
+            self.release(obj)
+
+    def stats(self):
+        return {'in_use': self.in_use, 'free': len(self.free), 'created': self.created, 'high_water': self.high_water}
+
+
+class EnemyBulletStore:
+    """
+    Balas dos inimigos em arrays contíguos do NumPy (structure of arrays), como
+    no ParticleSystem: posição, velocidade, tamanho e cor. Integração, remoção
+    das balas fora da tela e o teste contra a caixa do jogador são feitos em
+    poucas operações vetorizadas por frame, qualquer que seja o número de balas.
+    As balas vivas ocupam as posições [0, count) na ordem em que foram criadas.
+    """
+    def __init__(self, capacity=256):
+        self.count = 0
+        self.high_water = 0 # Maior número de balas vivas ao mesmo tempo
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.dx = np.zeros(capacity, dtype=np.float64)
+        self.dy = np.zeros(capacity, dtype=np.float64)
+        self.size = np.ones(capacity, dtype=np.int32) # Balas quadradas: largura = altura
+        self.color = np.zeros(capacity, dtype=np.int32)
+
+    def _arrays(self):
+        return (self.x, self.y, self.dx, self.dy, self.size, self.color)
+
+    def _grow(self, required):
+        capacity = self.capacity
+        while capacity < required:
+            capacity *= 2
+        old_arrays, n = self._arrays(), self.count
+        self._allocate(capacity)
+        for new_array, old_array in zip(self._arrays(), old_arrays):
+            new_array[:n] = old_array[:n]
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def spawn(self, x, y, dx, dy, color, size):
+        """Cria balas em lote (escalares são replicados). Retorna o número de balas criadas."""
+        columns = np.broadcast_arrays(x, y, dx, dy, size, color)
+        amount = columns[0].size
+        if amount == 0:
+            return 0
+        if self.count + amount > self.capacity:
+            self._grow(self.count + amount)
+        start = self.count
+        end = start + amount
+        for array, values in zip(self._arrays(), columns):
+            array[start:end] = values.ravel()
+        self.count = end
+        if end > self.high_water:
+            self.high_water = end
+        return amount
 
     def update(self):
-        self.x += self.dx
-        self.y += self.dy
-        self.lifetime -= 1
-        return self.lifetime > 0 # Retorna se a partícula ainda está viva
+        n = self.count
+        self.x[:n] += self.dx[:n]
+        self.y[:n] += self.dy[:n]
+
+    def first_hit(self, x, y, width, height):
+        """Índice da bala mais antiga que sobrepõe a caixa (mesmo teste AABB do jogo), ou None."""
+        n = self.count
+        if n == 0:
+            return None
+        bx, by, size = self.x[:n], self.y[:n], self.size[:n]
+        hits = (bx < x + width) & (bx + size > x) & (by < y + height) & (by + size > y)
+        index = int(hits.argmax())
+        return index if hits[index] else None
+
+    def remove(self, index):
+        """Remove uma bala mantendo a ordem das demais. Retorna a cor dela."""
+        color = int(self.color[index])
+        n = self.count
+        for array in self._arrays():
+            array[index:n - 1] = array[index + 1:n]
+        self.count = n - 1
+        return color
+
+    def cull(self, width, height):
+        """Remove as balas que saíram da tela (por qualquer lado)."""
+        n = self.count
+        if n == 0:
+            return
+        x, y, size = self.x[:n], self.y[:n], self.size[:n]
+        keep = (y < height) & (y > -size) & (x < width) & (x > -size)
+        alive = int(np.count_nonzero(keep))
+        if alive == n:
+            return
+        for array in self._arrays():
+            array[:alive] = array[:n][keep]
+        self.count = alive
 
     def draw(self):
-        pyxel.pset(self.x, self.y, self.color)
+        n = self.count
+        if n == 0:
+            return
+        rect = pyxel.rect
+        for x, y, size, color in zip(self.x[:n].tolist(), self.y[:n].tolist(),
+                                     self.size[:n].tolist(), self.color[:n].tolist()):
+            rect(x, y, size, size, color)
 
 
-class PixelDebrisParticle:
-    """Representa um único pixel que se desprende de um inimigo destruído."""
-    def __init__(self, x, y, color, dx, dy, lifetime, friction=0.98):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.dx = dx
-        self.dy = dy
-        self.lifetime = lifetime
-        self.friction = friction # Fator de desaceleração (atrito do "espaço")
+class BulletEmitter:
+    """
+    Gera os disparos de um padrão de tiro (AssetManager.emitter_patterns).
+    Cada disparo é um lote de ângulos, base + deslocamentos, convertido em
+    velocidades com cos/sin vetorizados e entregue de uma vez ao EnemyBulletStore.
+    Os deslocamentos de cada padrão são calculados uma vez; só o espiral guarda
+    estado (o ângulo que avança a cada disparo), por isso cada inimigo tem o seu.
+    """
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.kind = pattern['type']
+        count = pattern['count']
+        if self.kind == 'aimed':
+            half = math.radians(pattern.get('spread_deg', 0)) / 2
+            self.offsets = np.linspace(-half, half, count) if count > 1 else np.zeros(1)
+        elif self.kind == 'fan':
+            half = math.radians(pattern['arc_deg']) / 2
+            self.offsets = np.linspace(-half, half, count) if count > 1 else np.zeros(1)
+        elif self.kind in ('radial', 'spiral'):
+            self.offsets = np.arange(count) * (2 * math.pi / count)
+        else:
+            raise ValueError(f"Padrão de tiro desconhecido: {self.kind}")
+        self.phase = math.radians(pattern.get('direction_deg', 0)) # Ângulo base dos padrões não mirados
+        self.step = math.radians(pattern.get('step_deg', 0))
+
+    def emit(self, store, x, y, target_x, target_y):
+        """Dispara um lote a partir de (x, y). Retorna o número de balas criadas."""
+        pattern = self.pattern
+        if self.kind == 'aimed':
+            base = math.atan2(target_y - y, target_x - x)
+        else:
+            base = self.phase
+            self.phase += self.step # Só o espiral tem passo; nos outros fica parado
+        angles = base + self.offsets
+        speed = pattern['speed']
+        color = pattern.get('color')
+        if color is None:
+            color = 15 if rt.frame_count % 10 < 5 else 14 # Efeito de piscar amarelo
+        return store.spawn(x, y, speed * np.cos(angles), speed * np.sin(angles), color, pattern['size'])
+
+
+class ParticleBudget:
+    """
+    Limita o número total de partículas vivas e decide, por prioridade do efeito,
+    quais spawns são aceitos, afinados ou recusados.
+
+    Cada nível de prioridade só pode ocupar uma fração do limite: a maior
+    prioridade usa o limite inteiro e as menores, proporcionalmente menos. Assim,
+    quando o jogo está cheio de partículas, os efeitos cosméticos são cortados
+    antes das faíscas de impacto. Se o tempo medido do frame passar do orçamento,
+    o limite efetivo encolhe na mesma proporção.
+    """
+    # Prioridade de cada efeito (maior = mais importante)
+    DEFAULT_PRIORITIES = {
+        'player_hit': 5,      # Faíscas quando o jogador é atingido
+        'hit_spark': 4,       # Faíscas de impacto nos inimigos
+        'laser_spark': 4,
+        'enemy_explosion': 3, # Detritos de pixel dos inimigos
+        'asteroid_debris': 3,
+        'shatter_dust': 2,    # Poeira quando um asteroide se parte
+        'engine_flame': 1,    # Chama da nave
+        'missile_trail': 0,   # Rastro dos mísseis
+    }
+
+    def __init__(self, cap=20000, frame_budget_ms=1000 / 60, priorities=None):
+        self.cap = cap
+        self.frame_budget_ms = frame_budget_ms
+        self.priorities = dict(self.DEFAULT_PRIORITIES)
+        if priorities:
+            self.priorities.update(priorities)
+        self.max_priority = max(self.priorities.values())
+        self.frame_ms = 0.0 # Tempo de frame medido (suavizado)
+        self.stores = []
+        self.requested = {}
+        self.dropped = {}
+
+    def track(self, store):
+        """Registra uma lista de partículas cujo tamanho conta para o limite."""
+        self.stores.append(store)
+
+    def live_count(self):
+        return sum(len(store) for store in self.stores)
+
+    def observe_frame(self, frame_ms):
+        """Informa o tempo de trabalho do último frame (média móvel para evitar oscilações)."""
+        self.frame_ms += (frame_ms - self.frame_ms) * 0.1
+
+    def effective_cap(self):
+        if self.frame_ms > self.frame_budget_ms:
+            return self.cap * self.frame_budget_ms / self.frame_ms
+        return self.cap
+
+    def allow(self, effect, amount):
+        """Retorna quantas das 'amount' partículas pedidas pelo efeito podem ser criadas."""
+        priority = self.priorities.get(effect, 0)
+        limit = self.effective_cap() * (priority + 1) / (self.max_priority + 1)
+        allowed = max(0, min(amount, int(limit) - self.live_count()))
+
+        self.requested[effect] = self.requested.get(effect, 0) + amount
+        if allowed < amount:
+            self.dropped[effect] = self.dropped.get(effect, 0) + amount - allowed
+        return allowed
+
+    def total_dropped(self):
+        return sum(self.dropped.values())
+
+    def report(self):
+        """Resumo por efeito: partículas pedidas e descartadas."""
+        return {effect: {'requested': requested, 'dropped': self.dropped.get(effect, 0)}
+                for effect, requested in self.requested.items()}
+
+
+class ParticleSystem:
+    """
+    Armazena partículas (faíscas, detritos e chamas) em arrays contíguos do NumPy,
+    no formato "structure of arrays". Em vez de um objeto Python por partícula,
+    cada atributo (x, y, dx, dy, atrito, cor, tempo de vida e tamanho) vive em
+    seu próprio array, e a integração, o atrito e a remoção das partículas mortas
+    são feitos em poucas operações vetorizadas por frame.
+    """
+    # Atrito padrão dos detritos (fator de desaceleração do "espaço")
+    DEBRIS_FRICTION = 0.98
+
+    def __init__(self, capacity=1024, rng=None, budget=None):
+        self.count = 0 # Número de partículas vivas (ocupam as posições [0, count) dos arrays)
+        self.high_water = 0 # Maior número de partículas vivas ao mesmo tempo (para dimensionar a capacidade)
+        self.rng = rng if rng is not None else np.random.default_rng() # Usado pelos efeitos para gerar valores em lote
+        self.budget = budget # ParticleBudget opcional, que pode recusar ou reduzir os spawns
+        if budget is not None:
+            budget.track(self)
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.dx = np.zeros(capacity, dtype=np.float64)
+        self.dy = np.zeros(capacity, dtype=np.float64)
+        self.friction = np.ones(capacity, dtype=np.float64)
+        self.color = np.zeros(capacity, dtype=np.int32)
+        self.lifetime = np.zeros(capacity, dtype=np.int32)
+        self.size = np.ones(capacity, dtype=np.int32)
+
+    def _arrays(self):
+        return (self.x, self.y, self.dx, self.dy, self.friction, self.color, self.lifetime, self.size)
+
+    def _grow(self, required):
+        """Dobra a capacidade até caber 'required' partículas, preservando as vivas."""
+        capacity = self.capacity
+        while capacity < required:
+            capacity *= 2
+        old_arrays, n = self._arrays(), self.count
+        self._allocate(capacity)
+        for new_array, old_array in zip(self._arrays(), old_arrays):
+            new_array[:n] = old_array[:n]
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def spawn(self, x, y, dx, dy, color, lifetime, size=1, friction=1.0, effect=None):
+        """
+        Cria partículas em lote. Cada argumento pode ser um escalar ou um array;
+        escalares são replicados para todas as partículas criadas.
+        'effect' identifica o efeito no orçamento de partículas, que pode reduzir
+        (de forma espaçada) ou recusar o lote. Retorna o número de partículas criadas.
+        """
+        columns = np.broadcast_arrays(x, y, dx, dy, friction, color, lifetime, size)
+        amount = columns[0].size
+        if amount == 0:
+            return 0
+
+        if self.budget is not None:
+            allowed = self.budget.allow(effect, amount)
+            if allowed == 0:
+                return 0
+            if allowed < amount:
+                # Afinamento: mantém partículas espaçadas uniformemente pelo lote
+                keep = np.linspace(0, amount - 1, allowed).astype(np.intp)
+                columns = [values.ravel()[keep] for values in columns]
+                amount = allowed
+
+        if self.count + amount > self.capacity:
+            self._grow(self.count + amount)
+        start = self.count
+        end = start + amount
+
+        for array, values in zip(self._arrays(), columns):
+            array[start:end] = values.ravel()
+        self.count = end
+        if end > self.high_water:
+            self.high_water = end
+        return amount
 
     def update(self):
-        self.x += self.dx
-        self.y += self.dy
-        
-        # Aplica o atrito para desacelerar a partícula
-        self.dx *= self.friction
-        self.dy *= self.friction
-        
-        self.lifetime -= 1
-        return self.lifetime > 0
+        """Integra posição, aplica atrito, envelhece e compacta as partículas mortas."""
+        n = self.count
+        if n == 0:
+            return
+
+        dx, dy = self.dx[:n], self.dy[:n]
+        self.x[:n] += dx
+        self.y[:n] += dy
+        # Aplica o atrito para desacelerar (atrito 1.0 = partícula sem desaceleração)
+        dx *= self.friction[:n]
+        dy *= self.friction[:n]
+        self.lifetime[:n] -= 1
+
+        # Compactação: move as partículas vivas para o início dos arrays, mantendo a ordem.
+        alive = self.lifetime[:n] > 0
+        alive_count = int(np.count_nonzero(alive))
+        if alive_count != n:
+            for array in self._arrays():
+                array[:alive_count] = array[:n][alive]
+            self.count = alive_count
 
     def draw(self):
-        pyxel.pset(self.x, self.y, self.color)
+        n = self.count
+        if n == 0:
+            return
+        self._draw_points(self.x[:n], self.y[:n], self.color[:n], self.size[:n])
+
+    @staticmethod
+    def _draw_points(xs, ys, colors, sizes):
+        xs, ys, colors = xs.tolist(), ys.tolist(), colors.tolist()
+        pset = pyxel.pset
+        if (sizes == 1).all():
+            for x, y, color in zip(xs, ys, colors):
+                pset(x, y, color)
+        else:
+            rect = pyxel.rect
+            for x, y, color, size in zip(xs, ys, colors, sizes.tolist()):
+                if size == 1:
+                    pset(x, y, color)
+                else:
+                    rect(x, y, size, size, color)
+
+
+class AnalyticParticleSystem(ParticleSystem):
+    """
+    Variante do ParticleSystem em que nada é integrado frame a frame.
+
+    Com atrito constante, a posição de uma partícula tem forma fechada: depois de
+    'a' frames, x = x0 + dx * (1 - f^a) / (1 - f) (ou x0 + dx * a sem atrito).
+    Por isso cada partícula guarda só o estado em que nasceu e o frame de
+    nascimento; update() apenas avança o relógio, e as posições são calculadas no
+    draw(). Qualquer instante dentro da vida das partículas pode ser avaliado com
+    positions(time), o que permite repetir ou voltar o efeito sem custo extra.
+    Os arrays x/y/dx/dy guardam o estado de nascimento, e as partículas mortas
+    só são removidas de tempos em tempos (ou quando falta espaço).
+    """
+    COMPACT_INTERVAL = 30 # Frames entre remoções das partículas mortas
+
+    def __init__(self, capacity=1024, rng=None, budget=None):
+        self.time = 0 # Frames de simulação desde a criação do sistema
+        self.last_compact = 0
+        super().__init__(capacity, rng, budget)
+
+    def _allocate(self, capacity):
+        super()._allocate(capacity)
+        self.birth = np.zeros(capacity, dtype=np.int64)
+
+    def _arrays(self):
+        return super()._arrays() + (self.birth,)
+
+    def _grow(self, required):
+        # Antes de aumentar os arrays, tenta liberar o espaço das partículas mortas
+        required -= self._compact()
+        if required > self.capacity:
+            super()._grow(required)
+
+    def _alive(self, time):
+        n = self.count
+        age = time - self.birth[:n]
+        return (age >= 0) & (age < self.lifetime[:n])
+
+    def _compact(self):
+        """Remove as partículas mortas, mantendo a ordem. Retorna quantas foram removidas."""
+        self.last_compact = self.time
+        n = self.count
+        if n == 0:
+            return 0
+        alive = self._alive(self.time)
+        alive_count = int(np.count_nonzero(alive))
+        if alive_count != n:
+            for array in self._arrays():
+                array[:alive_count] = array[:n][alive]
+            self.count = alive_count
+        return n - alive_count
+
+    def __len__(self):
+        return int(np.count_nonzero(self._alive(self.time)))
+
+    def spawn(self, *args, **kwargs):
+        amount = super().spawn(*args, **kwargs)
+        if amount:
+            self.birth[self.count - amount:self.count] = self.time
+        return amount
+
+    def update(self):
+        self.time += 1
+        if self.time - self.last_compact >= self.COMPACT_INTERVAL:
+            self._compact()
+
+    def positions(self, time=None):
+        """Posições (x, y) de todas as partículas guardadas no instante 'time' e a máscara das vivas."""
+        if time is None:
+            time = self.time
+        n = self.count
+        age = time - self.birth[:n]
+        alive = (age >= 0) & (age < self.lifetime[:n])
+        frames = age.astype(np.float64)
+        friction = self.friction[:n]
+        # Soma da série geométrica 1 + f + f^2 + ... + f^(a-1)
+        moving = friction != 1.0
+        distance = frames.copy()
+        distance[moving] = (1.0 - friction[moving] ** frames[moving]) / (1.0 - friction[moving])
+        return self.x[:n] + self.dx[:n] * distance, self.y[:n] + self.dy[:n] * distance, alive
+
+    def draw(self):
+        if self.count == 0:
+            return
+        xs, ys, alive = self.positions()
+        n = self.count
+        self._draw_points(xs[alive], ys[alive], self.color[:n][alive], self.size[:n][alive])
 
 
 class Enemy:
@@ -960,14 +2177,13 @@ class Enemy:
 
     # A matriz SPRITE_DATA foi removida.
 
-    def __init__(self, x, y, type, color, health, movement_pattern, asset_manager, game_particles_list=None, **kwargs):
+    def __init__(self, x, y, type, color, health, movement_pattern, asset_manager, **kwargs):
 
         self.x = x
         self.y = y
         self.type = type 
         self.color = color
         self.health = health
-        self.game_particles_list = game_particles_list 
         self.asset_manager = asset_manager
         self.animation_data = self.asset_manager.get_enemy_animation_data()
         self.glow_sprite_data = self.asset_manager.get_enemy_glow_data()
@@ -983,7 +2199,7 @@ class Enemy:
         # Inicialização baseada no tipo de padrão
         if self.pattern_type == 'simple_down':
             speed_min, speed_max = movement_pattern.get('speed_range', (0.5, 0.5))
-            self.speed = pyxel.rndf(speed_min, speed_max)
+            self.speed = rt.rndf(speed_min, speed_max)
         
         elif self.pattern_type == 'galaga_entry':
             self.state = 'DESCENDING_SIN'
@@ -1003,37 +2219,29 @@ class Enemy:
 
 
         self.animation_frame_index = 0
-        self.animation_timer = pyxel.rndi(0, self.ANIMATION_SPEED)
-        self.shoot_cooldown = pyxel.rndi(120, 240) # Aumentado para ser menos caótico
-        self.last_shot_frame = pyxel.frame_count
+        self.animation_timer = rt.rndi(0, self.ANIMATION_SPEED)
+        self.shoot_cooldown = rt.rndi(120, 240) # Aumentado para ser menos caótico
+        self.last_shot_frame = rt.frame_count
+
+        # Padrão de tiro: o da onda tem prioridade sobre o da definição do inimigo
+        emitter_name = kwargs.get('emitter', asset_manager.get_enemy_definitions().get(type, {}).get('emitter'))
+        self.emitter = None
+        if emitter_name is not None:
+            self.emitter = BulletEmitter(asset_manager.get_emitter_pattern(emitter_name))
+            self.shoot_cooldown = self.emitter.pattern.get('cooldown', self.shoot_cooldown)
 
     def _update_simple_down(self):
         self.y += self.speed
 
 
 
-    def shoot(self, player_x, player_y):
-        """Cria e retorna uma bala direcionada à posição do jogador."""
-        # Calcula o ângulo do centro do inimigo para o centro do jogador.
+    def shoot(self, player_x, player_y, enemy_bullets):
+        """Dispara o padrão de tiro do inimigo, do centro dele, mirando o centro do jogador."""
         enemy_center_x = self.x + self.width / 2
         enemy_center_y = self.y + self.height / 2
         player_center_x = player_x + Player.SPRITE_W / 2
         player_center_y = player_y + Player.SPRITE_H / 2
-        
-        angle = math.atan2(player_center_y - enemy_center_y, player_center_x - enemy_center_x)
-        
-        # Define as propriedades da bala.
-        speed = 1.0 # Bala lenta
-        color = 15 if pyxel.frame_count % 10 < 5 else 14 # Efeito de piscar amarelo
-        size = 2
-        
-        # Calcula os vetores de movimento.
-        dx = speed * math.cos(angle)
-        dy = speed * math.sin(angle)
-        
-        # Cria a instância da bala, especificando que o 'owner' é 'enemy'.
-        new_bullet = Bullet(enemy_center_x, enemy_center_y, color, 'enemy_shot', dx, dy, 1, size, size, owner='enemy')
-        return new_bullet
+        return self.emitter.emit(enemy_bullets, enemy_center_x, enemy_center_y, player_center_x, player_center_y)
 
 
 
@@ -1090,8 +2298,16 @@ class Enemy:
         self.health -= amount
         return self.health <= 0 
 
-    def update(self, player=None):
-        # Roteador de movimento
+    def get_bounds(self):
+        """Retorna a caixa (x, y, largura, altura) usada pela broadphase de colisão."""
+        return self.x, self.y, self.width, self.height
+
+    def update(self, player=None, enemy_bullets=None):
+        self.move()
+        return self.act(player, enemy_bullets)
+
+    def move(self):
+        # Roteador de movimento (em grupo, o EnemyMovementBatch faz o mesmo passo com arrays)
         if self.pattern_type == 'simple_down':
             self._update_simple_down()
         elif self.pattern_type == 'galaga_entry':
@@ -1099,6 +2315,8 @@ class Enemy:
         elif self.pattern_type == 'side_entry_align':
             self._update_side_entry_align()
 
+    def act(self, player=None, enemy_bullets=None):
+        """Animação e tiro do frame, depois do movimento. Retorna o número de balas disparadas."""
         # Animação do sprite (funciona para todos)
         self.animation_timer += 1
         if self.animation_timer >= self.ANIMATION_SPEED:
@@ -1106,12 +2324,12 @@ class Enemy:
             self.animation_frame_index = 1 - self.animation_frame_index
         
         # Lógica de tiro (só atira quando parado)
-        if self.state == 'HALTED' and self.type == 'yellow' and player:
-            if pyxel.frame_count - self.last_shot_frame > self.shoot_cooldown:
-                self.last_shot_frame = pyxel.frame_count
-                return self.shoot(player.x, player.y)
+        if self.state == 'HALTED' and self.emitter is not None and player and enemy_bullets is not None:
+            if rt.frame_count - self.last_shot_frame > self.shoot_cooldown:
+                self.last_shot_frame = rt.frame_count
+                return self.shoot(player.x, player.y, enemy_bullets)
         
-        return None
+        return 0
             
     def draw(self, glow_mode=0):
         """
@@ -1136,7 +2354,7 @@ class Enemy:
         elif glow_mode == 3:
             glow_state_to_draw = 'high'
         elif glow_mode == 4: # Modo Pulsante (alterna entre médio e alto)
-            if pyxel.frame_count % 60 < 30:
+            if rt.frame_count % 60 < 30:
                 glow_state_to_draw = 'high'
             else:
                 glow_state_to_draw = 'medium'
@@ -1160,30 +2378,32 @@ class Enemy:
 
 
 class Asteroid(Enemy):
-    def __init__(self, x, y, size_type, movement_pattern, asset_manager, initial_dx=None, initial_dy=None, game_particles_list=None):
+    _shape_ids = itertools.count()
+
+    def __init__(self, x, y, size_type, movement_pattern, asset_manager, initial_dx=None, initial_dy=None):
         asteroid_color = 4 
         self.size_type = size_type
         if self.size_type == 'small':
-            self.base_size, asteroid_health, self.num_vertices, self.irregularity = 6, 2, pyxel.rndi(5, 7), 2.0
+            self.base_size, asteroid_health, self.num_vertices, self.irregularity = 6, 2, rt.rndi(5, 7), 2.0
         elif self.size_type == 'medium':
-            self.base_size, asteroid_health, self.num_vertices, self.irregularity = 12, 5, pyxel.rndi(7, 9), 3.5
+            self.base_size, asteroid_health, self.num_vertices, self.irregularity = 12, 5, rt.rndi(7, 9), 3.5
         elif self.size_type == 'large':
-            self.base_size, asteroid_health, self.num_vertices, self.irregularity = 24, 10, pyxel.rndi(9, 12), 5.0
+            self.base_size, asteroid_health, self.num_vertices, self.irregularity = 24, 10, rt.rndi(9, 12), 5.0
         
         # Armazena o padrão para que os fragmentos (shatter) possam usá-lo também.
         self.movement_pattern = movement_pattern
         
         # Chama o construtor da classe base, passando o padrão de movimento.
-        super().__init__(x, y, 'asteroid', asteroid_color, asteroid_health, movement_pattern, asset_manager, game_particles_list)
+        super().__init__(x, y, 'asteroid', asteroid_color, asteroid_health, movement_pattern, asset_manager)
         # --- MUDANÇA PRINCIPAL: USA OS VALORES DO PADRÃO ---
         dx_min, dx_max = movement_pattern['dx_range']
         dy_min, dy_max = movement_pattern['dy_range']
         as_min, as_max = movement_pattern['angular_speed_range']
 
-        self.dx = initial_dx if initial_dx is not None else pyxel.rndf(dx_min, dx_max)
-        self.dy = initial_dy if initial_dy is not None else pyxel.rndf(dy_min, dy_max)
-        self.angular_speed = pyxel.rndf(as_min, as_max)
-        self.rotation = pyxel.rndf(0, math.pi * 2)
+        self.dx = initial_dx if initial_dx is not None else rt.rndf(dx_min, dx_max)
+        self.dy = initial_dy if initial_dy is not None else rt.rndf(dy_min, dy_max)
+        self.angular_speed = rt.rndf(as_min, as_max)
+        self.rotation = rt.rndf(0, math.pi * 2)
 
         self._generate_vertices()
 
@@ -1194,51 +2414,86 @@ class Asteroid(Enemy):
         
         for i in range(self.num_vertices):
             # Adiciona uma pequena aleatoriedade ao ângulo e ao raio para a irregularidade
-            angle = i * angle_step + pyxel.rndf(-0.1, 0.1) 
-            radius = self.base_size / 2 + pyxel.rndf(-self.irregularity, self.irregularity)
+            angle = i * angle_step + rt.rndf(-0.1, 0.1) 
+            radius = self.base_size / 2 + rt.rndf(-self.irregularity, self.irregularity)
             vx = radius * math.cos(angle)
             vy = radius * math.sin(angle)
             self.vertices.append((vx, vy))
 
-    def get_rotated_vertices(self):
-        # Calcula os vértices do asteroide após a rotação atual
+        # Raio do círculo que envolve o polígono em qualquer rotação.
+        self.bounding_radius = max(math.hypot(vx, vy) for vx, vy in self.vertices)
+        self._world_cache_key = None # Invalida o cache da forma no mundo
+        self.shape_id = next(Asteroid._shape_ids) # Identifica a forma no cache de sprites rotacionados
+
+    def _update_world_cache(self):
+        """
+        Recalcula os vértices no mundo e a caixa (AABB) do asteroide, mas só quando
+        a posição ou a rotação mudaram desde o último cálculo. Assim a trigonometria
+        é feita uma única vez por passo da simulação, não importa quantos consumidores
+        (balas, laser, colisão com o jogador, explosões e desenho) peçam a forma.
+        """
+        key = (self.x, self.y, self.rotation)
+        if key == self._world_cache_key:
+            return
+
         center_x = self.x + self.base_size / 2
         center_y = self.y + self.base_size / 2
-        rotated_vertices = []
-        for vx, vy in self.vertices:
-            x_rot = vx * math.cos(self.rotation) - vy * math.sin(self.rotation)
-            y_rot = vx * math.sin(self.rotation) + vy * math.cos(self.rotation)
-            rotated_vertices.append((center_x + x_rot, center_y + y_rot))
-        return rotated_vertices
-
-    def update(self, player=None):
-        # Nao chamamos super().update() aqui para que os asteroides nao gerem particulas de brilho
+        cos_r = math.cos(self.rotation)
+        sin_r = math.sin(self.rotation)
+        rotated_vertices = [(center_x + (vx * cos_r - vy * sin_r), center_y + (vx * sin_r + vy * cos_r))
+                            for vx, vy in self.vertices]
+        xs = [vx for vx, _ in rotated_vertices]
+        ys = [vy for _, vy in rotated_vertices]
+        min_x, min_y = min(xs), min(ys)
+
+        self._world_vertices = rotated_vertices
+        self._world_coords = [c for vertex in rotated_vertices for c in vertex] # Formato plano [x0, y0, x1, y1, ...]
+        self._world_aabb = (min_x, min_y, max(xs) - min_x, max(ys) - min_y)
+        self._world_circle = (center_x, center_y, self.bounding_radius)
+        self._world_cache_key = key
+
+    def get_bounds(self):
+        # Caixa justa do polígono já rotacionado (AABB em cache).
+        self._update_world_cache()
+        return self._world_aabb
+
+    def get_bounding_circle(self):
+        """Retorna (centro_x, centro_y, raio) do círculo que envolve o asteroide."""
+        self._update_world_cache()
+        return self._world_circle
+
+    def get_world_coords(self):
+        """Vértices rotacionados no formato plano usado pelo módulo geometry."""
+        self._update_world_cache()
+        return self._world_coords
+
+    def get_rotated_vertices(self):
+        # Vértices do asteroide após a rotação atual, em coordenadas do mundo.
+        # A lista é compartilhada pelo cache: quem a consome não deve modificá-la.
+        self._update_world_cache()
+        return self._world_vertices
+
+    def move(self):
         self.x += self.dx
         self.y += self.dy
         self.rotation += self.angular_speed # Atualiza o ângulo de rotação
+
+    def act(self, player=None, enemy_bullets=None):
+        # Asteroides não animam nem atiram
+        return 0
             
     def draw(self, glow_mode=0):
-        center_x = self.x + self.base_size / 2
-        center_y = self.y + self.base_size / 2
-
-        # Desenha o asteroide conectando seus vértices rotacionados
-        for i in range(self.num_vertices):
-            x1_rel, y1_rel = self.vertices[i]
-            x2_rel, y2_rel = self.vertices[(i + 1) % self.num_vertices] # Conecta o último vértice ao primeiro
+        # Caminho rápido: um único blt do contorno já rasterizado no atlas
+        sprite_cache = self.asset_manager.asteroid_sprite_cache
+        if sprite_cache is not None and sprite_cache.draw(self):
+            return
 
-            # Aplica a rotação aos vértices
-            x1_rot = x1_rel * math.cos(self.rotation) - y1_rel * math.sin(self.rotation)
-            y1_rot = x1_rel * math.sin(self.rotation) + y1_rel * math.cos(self.rotation)
-            x2_rot = x2_rel * math.cos(self.rotation) - y2_rel * math.sin(self.rotation)
-            y2_rot = x2_rel * math.sin(self.rotation) + y2_rel * math.cos(self.rotation)
-            
-            # Converte para coordenadas absolutas na tela
-            x1_abs = center_x + x1_rot
-            y1_abs = center_y + y1_rot
-            x2_abs = center_x + x2_rot
-            y2_abs = center_y + y2_rot
-            
+        # Desenha o asteroide conectando seus vértices rotacionados (já em cache, em coordenadas absolutas)
+        rotated_vertices = self.get_rotated_vertices()
+        x1_abs, y1_abs = rotated_vertices[-1] # Conecta o último vértice ao primeiro
+        for x2_abs, y2_abs in rotated_vertices:
             pyxel.line(x1_abs, y1_abs, x2_abs, y2_abs, self.color)
+            x1_abs, y1_abs = x2_abs, y2_abs
 
     def shatter(self):
         fragments = []
@@ -1257,16 +2512,305 @@ class Asteroid(Enemy):
 
         # Cria novos fragmentos com velocidades de espalhamento
         for i in range(num_fragments):
-            angle = (i * (2 * math.pi / num_fragments)) + pyxel.rndf(-0.5, 0.5) 
-            fragment_speed = pyxel.rndf(0.5, 1.0) / 2.0 
+            angle = (i * (2 * math.pi / num_fragments)) + rt.rndf(-0.5, 0.5) 
+            fragment_speed = rt.rndf(0.5, 1.0) / 2.0 
             frag_dx = (self.dx * 0.2 + fragment_speed * math.cos(angle)) # Adiciona um pouco do movimento original
             frag_dy = (self.dy * 0.2 + fragment_speed * math.sin(angle))
-            offset_x = pyxel.rndf(-self.base_size / 8, self.base_size / 8) # Pequeno offset para posicionamento
-            offset_y = pyxel.rndf(-self.base_size / 8, self.base_size / 8)
-            fragments.append(Asteroid(center_x + offset_x, center_y + offset_y, fragment_size_type, self.movement_pattern, self.asset_manager, frag_dx, frag_dy, self.game_particles_list))
+            offset_x = rt.rndf(-self.base_size / 8, self.base_size / 8) # Pequeno offset para posicionamento
+            offset_y = rt.rndf(-self.base_size / 8, self.base_size / 8)
+            fragments.append(Asteroid(center_x + offset_x, center_y + offset_y, fragment_size_type, self.movement_pattern, self.asset_manager, frag_dx, frag_dy))
         return fragments
 
 
+class EnemyMovementBatch:
+    """
+    Passo de movimento dos inimigos em grupo. Inimigos que compartilham o padrão
+    de movimento (o mesmo dicionário de parâmetros) formam um grupo, avançado
+    por um kernel numpy sobre arrays de posição, estado e alvo; o resultado é
+    escrito de volta nos objetos. Cada kernel repete os ramos do método escalar
+    correspondente com a mesma ordem de operações (cada inimigo executa só o
+    ramo do estado em que começou o frame), então as trajetórias são idênticas
+    às do Enemy.move.
+
+    Os arrays de cada grupo ficam guardados entre frames e só são remontados
+    quando os membros mudam (spawn, morte, saída da tela): fora o movimento,
+    nada escreve x, y ou o estado dos inimigos, então os valores guardados
+    continuam valendo. Grupos pequenos não compensam os arrays e seguem pelo
+    caminho escalar.
+    """
+    MIN_BATCH = 128
+    # Estados na ordem dos códigos usados nos arrays; o último é sempre o parado
+    STATES = {
+        'simple_down': ('spawning',),
+        'galaga_entry': ('DESCENDING_SIN', 'MOVING_HORIZONTAL', 'ASCENDING', 'HALTED'),
+        'side_entry_align': ('ENTERING_WAVE', 'ALIGNING', 'HALTED'),
+    }
+    # Atributos constantes de cada inimigo que o kernel precisa, além de x e y
+    FIELDS = {
+        'simple_down': ('speed',),
+        'galaga_entry': ('final_x', 'final_y', 'y_start', 'width'),
+        'side_entry_align': ('final_x', 'final_y', 'direction'),
+    }
+
+    def __init__(self, min_batch=MIN_BATCH):
+        self.min_batch = min_batch
+        self.kernels = {
+            'simple_down': self._simple_down,
+            'galaga_entry': self._galaga_entry,
+            'side_entry_align': self._side_entry_align,
+        }
+        self.groups = {} # id do padrão -> arrays do grupo (ver _build_group)
+        self.batched_count = 0 # Inimigos movidos pelos kernels no último frame
+        self.rebuild_count = 0 # Grupos remontados desde o início
+
+    def clear(self):
+        self.groups.clear()
+
+    def advance(self, enemies):
+        """Move todos os inimigos um frame (só o movimento; animação e tiro ficam no Enemy.act)."""
+        kernels = self.kernels
+        members = {}
+        for enemy in enemies:
+            # Subclasses (asteroides) têm movimento próprio
+            if type(enemy) is Enemy and enemy.pattern_type in kernels:
+                key = id(enemy.movement_pattern)
+                group = members.get(key)
+                if group is None:
+                    members[key] = [enemy]
+                else:
+                    group.append(enemy)
+            else:
+                enemy.move()
+
+        cached = self.groups
+        self.groups = groups = {}
+        self.batched_count = 0
+        for key, group in members.items():
+            if len(group) < self.min_batch:
+                for enemy in group:
+                    enemy.move()
+                continue
+
+            entry = cached.get(key)
+            if entry is None or entry['members'] != group:
+                entry = self._build_group(group)
+                if entry is None:
+                    for enemy in group:
+                        enemy.move()
+                    continue
+                self.rebuild_count += 1
+            groups[key] = entry
+
+            state = entry['state']
+            halted = len(entry['names']) - 1
+            active = state != halted if entry['type'] != 'simple_down' else None
+            if active is not None and not active.any():
+                continue # Formação completa: ninguém se move
+            self.batched_count += len(group)
+            new_state = kernels[entry['type']](entry, group[0].movement_pattern)
+            self._write_back(entry, active, new_state)
+
+    def _build_group(self, group):
+        """Monta os arrays do grupo a partir dos objetos. Retorna None se o grupo precisar do caminho escalar."""
+        pattern_type = group[0].pattern_type
+        names = self.STATES[pattern_type]
+        codes = {name: code for code, name in enumerate(names)}
+        count = len(group)
+        entry = {'type': pattern_type, 'members': group, 'names': names}
+        try:
+            if pattern_type == 'simple_down':
+                entry['state'] = np.zeros(count, dtype=np.int8)
+            else:
+                entry['state'] = np.fromiter([codes[enemy.state] for enemy in group], dtype=np.int8, count=count)
+            for name in ('x', 'y') + self.FIELDS[pattern_type]:
+                entry[name] = np.fromiter(map(operator.attrgetter(name), group), dtype=float, count=count)
+        except (KeyError, TypeError):
+            # Estado desconhecido ou alvo ausente (None): o caminho escalar decide o que fazer
+            return None
+        return entry
+
+    @staticmethod
+    def _write_back(entry, active, new_state):
+        group = entry['members']
+        xs = entry['x'].tolist()
+        ys = entry['y'].tolist()
+        if active is None or active.all():
+            for enemy, x, y in zip(group, xs, ys):
+                enemy.x = x
+                enemy.y = y
+        else:
+            for i in np.flatnonzero(active).tolist():
+                enemy = group[i]
+                enemy.x = xs[i]
+                enemy.y = ys[i]
+
+        if new_state is not None:
+            # Poucos inimigos mudam de estado por frame
+            names = entry['names']
+            for i in np.flatnonzero(new_state != entry['state']).tolist():
+                group[i].state = names[new_state[i]]
+            entry['state'] = new_state
+
+    @staticmethod
+    def _simple_down(entry, pattern):
+        entry['y'] += entry['speed']
+        return None
+
+    @staticmethod
+    def _galaga_entry(entry, pattern):
+        state, x, y = entry['state'], entry['x'], entry['y']
+        fx, fy = entry['final_x'], entry['final_y']
+        new_state = state.copy()
+
+        descending = state == 0
+        if descending.any():
+            sin_phase = (y[descending] - entry['y_start'][descending]) * pattern['sin_freq_scale']
+            x[descending] = 64 + np.sin(sin_phase) * pattern['sin_amplitude'] - entry['width'][descending] / 2
+            y[descending] += pattern['speed_down']
+            new_state[descending & (y >= fy - 20)] = 1 # Ponto de início da curva horizontal
+
+        moving = state == 1
+        if moving.any():
+            xm, fxm = x[moving], fx[moving]
+            speed = pattern['horizontal_speed']
+            xm = np.where(xm < fxm, np.minimum(xm + speed, fxm), np.where(xm > fxm, np.maximum(xm - speed, fxm), xm))
+            arrived = np.abs(xm - fxm) < 1
+            xm[arrived] = fxm[arrived]
+            x[moving] = xm
+            new_state[moving] = np.where(arrived, 2, 1)
+
+        ascending = state == 2
+        if ascending.any():
+            y[ascending] -= pattern['ascend_speed']
+            done = ascending & (y <= fy)
+            y[done] = fy[done]
+            new_state[done] = 3
+        return new_state
+
+    @staticmethod
+    def _side_entry_align(entry, pattern):
+        state, x, y = entry['state'], entry['x'], entry['y']
+        new_state = state.copy()
+
+        entering = state == 0
+        if entering.any():
+            direction = entry['direction']
+            x[entering] += pattern['horizontal_speed'] * direction[entering]
+            sin_phase = x[entering] * pattern['sin_frequency']
+            y[entering] = pattern['y_center'] + np.sin(sin_phase) * pattern['sin_amplitude']
+            # Transição para o alinhamento ao cruzar o centro da tela
+            crossed = ((direction == 1) & (x > 64)) | ((direction == -1) & (x < 64))
+            new_state[entering & crossed] = 1
+
+        aligning = state == 1
+        if aligning.any():
+            fx, fy = entry['final_x'][aligning], entry['final_y'][aligning]
+            target_dx = fx - x[aligning]
+            target_dy = fy - y[aligning]
+            xa = x[aligning] + target_dx * 0.05
+            ya = y[aligning] + target_dy * 0.05
+            arrived = (np.abs(target_dx) < 1) & (np.abs(target_dy) < 1)
+            xa[arrived] = fx[arrived]
+            ya[arrived] = fy[arrived]
+            x[aligning] = xa
+            y[aligning] = ya
+            new_state[aligning] = np.where(arrived, 2, 1)
+        return new_state
+
+
+class AsteroidSpriteCache:
+    """
+    Cache de contornos de asteroides já rotacionados, rasterizados num atlas
+    (banco de imagem 1). A rotação é quantizada em ANGLE_STEPS ângulos; cada
+    (forma, ângulo, cor) ocupa um slot do tamanho da sua classe de tamanho, e o
+    desenho do asteroide vira um único blt. Os slots de cada classe são reusados
+    por LRU. Se o slot menos usado ainda foi desenhado neste frame (atlas cheio
+    de asteroides visíveis), o cache recusa e o asteroide é desenhado com linhas,
+    para não rasterizar o mesmo contorno várias vezes por frame.
+    """
+    IMAGE_BANK = 1
+    ANGLE_STEPS = 64 # Erro máximo de ~0,8 px na borda dos asteroides grandes
+    # Classe de tamanho: (lado do slot, primeira linha da região no atlas, altura da região)
+    SLOT_LAYOUT = {
+        'large': (36, 0, 144),
+        'medium': (24, 144, 72),
+        'small': (12, 216, 40),
+    }
+
+    def __init__(self, image, atlas_width=256):
+        self.image = image
+        self.angle_step = 2 * math.pi / self.ANGLE_STEPS
+        self.entries = {} # Por classe: OrderedDict chave -> [índice do slot, último frame desenhado]
+        self.free_slots = {}
+        self.slot_origins = {} # Por classe: canto superior esquerdo (u, v) de cada slot
+        for size_type, (slot, top, height) in self.SLOT_LAYOUT.items():
+            columns = atlas_width // slot
+            self.slot_origins[size_type] = [(column * slot, top + row * slot)
+                                            for row in range(height // slot) for column in range(columns)]
+            self.free_slots[size_type] = list(range(len(self.slot_origins[size_type])))
+            self.entries[size_type] = OrderedDict()
+        self.hits = self.misses = self.evictions = self.fallbacks = 0
+
+    def _rasterize(self, asteroid, angle_index, u, v, slot):
+        """Desenha o contorno no slot com o ângulo quantizado."""
+        image = self.image
+        image.rect(u, v, slot, slot, 0)
+        image.clip(u, v, slot, slot)
+        center = slot / 2
+        cos_r = math.cos(angle_index * self.angle_step)
+        sin_r = math.sin(angle_index * self.angle_step)
+        points = [(u + center + (vx * cos_r - vy * sin_r), v + center + (vx * sin_r + vy * cos_r))
+                  for vx, vy in asteroid.vertices]
+        x1, y1 = points[-1]
+        for x2, y2 in points:
+            image.line(x1, y1, x2, y2, asteroid.color)
+            x1, y1 = x2, y2
+        image.clip()
+
+    def draw(self, asteroid):
+        """Desenha o asteroide com um blt. Retorna False se ele deve ser desenhado com linhas."""
+        size_type = asteroid.size_type
+        entries = self.entries.get(size_type)
+        if entries is None:
+            return False
+        frame = rt.frame_count
+        angle_index = round(asteroid.rotation / self.angle_step) % self.ANGLE_STEPS
+        key = (asteroid.shape_id, angle_index, asteroid.color)
+        slot = self.SLOT_LAYOUT[size_type][0]
+
+        entry = entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            entries.move_to_end(key)
+            entry[1] = frame
+        else:
+            free_slots = self.free_slots[size_type]
+            if free_slots:
+                slot_index = free_slots.pop()
+            else:
+                victim_key, victim = next(iter(entries.items()))
+                if victim[1] == frame:
+                    self.fallbacks += 1
+                    return False
+                del entries[victim_key]
+                slot_index = victim[0]
+                self.evictions += 1
+            self.misses += 1
+            entry = entries[key] = [slot_index, frame]
+            u, v = self.slot_origins[size_type][slot_index]
+            self._rasterize(asteroid, angle_index, u, v, slot)
+
+        u, v = self.slot_origins[size_type][entry[0]]
+        center = slot / 2
+        pyxel.blt(round(asteroid.x + asteroid.base_size / 2 - center),
+                  round(asteroid.y + asteroid.base_size / 2 - center),
+                  self.image, u, v, slot, slot, 0)
+        return True
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'fallbacks': self.fallbacks,
+                'cached': {size_type: len(entries) for size_type, entries in self.entries.items()}}
+
 
 class BackgroundParticle:
     def __init__(self, x, y, speed, size, color):
@@ -1279,15 +2823,27 @@ class BackgroundParticle:
     def update(self):
         self.y += self.speed
         # Se a partícula sair da tela, reposiciona no topo
-        if self.y > pyxel.height:
+        if self.y > rt.height:
             self.y = -self.size
-            self.x = pyxel.rndi(0, pyxel.width - 1)
+            self.respawn()
+
+    def respawn(self):
+        """Sorteia uma nova coluna ao voltar para o topo da tela."""
+        self.x = rt.rndi(0, rt.width - 1)
+
+    def get_extent(self):
+        """Linhas ocupadas em relação a self.y: (primeira, última + 1)."""
+        return 0, self.size
 
     def draw(self):
+        self.draw_at(pyxel, self.x, self.y)
+
+    def draw_at(self, surface, x, y):
+        """Desenha em qualquer superfície do pyxel (a tela ou uma imagem)."""
         if self.size == 1:
-            pyxel.pset(self.x, self.y, self.color)
+            surface.pset(x, y, self.color)
         else:
-            pyxel.rect(self.x, self.y, self.size, self.size, self.color)
+            surface.rect(x, y, self.size, self.size, self.color)
 
 class BackgroundAsteroid:
     """
@@ -1304,22 +2860,22 @@ class BackgroundAsteroid:
         # Configurações de tamanho e forma baseadas no size_type
         if self.size_type == 'small':
             self.base_size = 6
-            self.num_vertices = pyxel.rndi(5, 7)
+            self.num_vertices = rt.rndi(5, 7)
             self.irregularity = 2.0
         elif self.size_type == 'medium':
             self.base_size = 12
-            self.num_vertices = pyxel.rndi(7, 9)
+            self.num_vertices = rt.rndi(7, 9)
             self.irregularity = 3.5
         elif self.size_type == 'large':
             self.base_size = 24
-            self.num_vertices = pyxel.rndi(9, 12)
+            self.num_vertices = rt.rndi(9, 12)
             self.irregularity = 5.0
         
         # Componentes de movimento lateral e rotação, proporcionais à velocidade principal para o efeito de profundidade
-        self.dx = pyxel.rndf(-0.1, 0.1) * self.speed * 0.5 # Pequeno desvio lateral, ajustado
+        self.dx = rt.rndf(-0.1, 0.1) * self.speed * 0.5 # Pequeno desvio lateral, ajustado
         self.dy_base = self.speed # Componente Y da velocidade (principalmente para baixo)
-        self.angular_speed = pyxel.rndf(-0.02, 0.02) * self.speed * 0.5 # Velocidade de rotação, ajustada
-        self.rotation = pyxel.rndf(0, math.pi * 2)
+        self.angular_speed = rt.rndf(-0.02, 0.02) * self.speed * 0.5 # Velocidade de rotação, ajustada
+        self.rotation = rt.rndf(0, math.pi * 2)
 
         self._generate_vertices()
 
@@ -1328,8 +2884,8 @@ class BackgroundAsteroid:
         self.vertices = []
         angle_step = (2 * math.pi) / self.num_vertices
         for i in range(self.num_vertices):
-            angle = i * angle_step + pyxel.rndf(-0.1, 0.1)
-            radius = self.base_size / 2 + pyxel.rndf(-self.irregularity, self.irregularity)
+            angle = i * angle_step + rt.rndf(-0.1, 0.1)
+            radius = self.base_size / 2 + rt.rndf(-self.irregularity, self.irregularity)
             vx = radius * math.cos(angle)
             vy = radius * math.sin(angle)
             self.vertices.append((vx, vy))
@@ -1340,60 +2896,185 @@ class BackgroundAsteroid:
         self.rotation += self.angular_speed
 
         # Reposiciona o asteroide no topo da tela quando sai por baixo
-        if self.y > pyxel.height:
+        if self.y > rt.height:
             self.y = -self.base_size
-            self.x = pyxel.rndi(0, pyxel.width - self.base_size)
-            # Reseta as propriedades de movimento e rotação para variar a aparência
-            self.dx = pyxel.rndf(-0.1, 0.1) * self.speed * 0.5
-            self.angular_speed = pyxel.rndf(-0.02, 0.02) * self.speed * 0.5
-            self.rotation = pyxel.rndf(0, math.pi * 2)
-            self._generate_vertices() # Gera uma nova forma para o asteroide
+            self.respawn()
+
+    def respawn(self):
+        """Sorteia nova coluna, movimento, rotação e forma ao voltar para o topo da tela."""
+        self.x = rt.rndi(0, rt.width - self.base_size)
+        # Reseta as propriedades de movimento e rotação para variar a aparência
+        self.dx = rt.rndf(-0.1, 0.1) * self.speed * 0.5
+        self.angular_speed = rt.rndf(-0.02, 0.02) * self.speed * 0.5
+        self.rotation = rt.rndf(0, math.pi * 2)
+        self._generate_vertices() # Gera uma nova forma para o asteroide
+
+    def get_extent(self):
+        """Linhas ocupadas em relação a self.y: (primeira, última + 1), para qualquer rotação."""
+        radius = max(math.hypot(vx, vy) for vx, vy in self.vertices)
+        half = self.base_size / 2
+        return math.floor(half - radius), math.ceil(half + radius) + 1
 
     def draw(self):
-        center_x = self.x + self.base_size / 2
-        center_y = self.y + self.base_size / 2
+        self.draw_at(pyxel, self.x, self.y)
+
+    def draw_at(self, surface, x, y):
+        """Desenha em qualquer superfície do pyxel (a tela ou uma imagem)."""
+        center_x = x + self.base_size / 2
+        center_y = y + self.base_size / 2
+        cos_r = math.cos(self.rotation)
+        sin_r = math.sin(self.rotation)
 
         # Desenha o asteroide conectando seus vértices rotacionados
         for i in range(self.num_vertices):
             x1_rel, y1_rel = self.vertices[i]
             x2_rel, y2_rel = self.vertices[(i + 1) % self.num_vertices] 
             
-            x1_rot = x1_rel * math.cos(self.rotation) - y1_rel * math.sin(self.rotation)
-            y1_rot = x1_rel * math.sin(self.rotation) + y1_rel * math.cos(self.rotation)
-            x2_rot = x2_rel * math.cos(self.rotation) - y2_rel * math.sin(self.rotation)
-            y2_rot = x2_rel * math.sin(self.rotation) + y2_rel * math.cos(self.rotation)
+            x1_rot = x1_rel * cos_r - y1_rel * sin_r
+            y1_rot = x1_rel * sin_r + y1_rel * cos_r
+            x2_rot = x2_rel * cos_r - y2_rel * sin_r
+            y2_rot = x2_rel * sin_r + y2_rel * cos_r
             
             x1_abs = center_x + x1_rot
             y1_abs = center_y + y1_rot
             x2_abs = center_x + x2_rot
             y2_abs = center_y + y2_rot
             
-            pyxel.line(x1_abs, y1_abs, x2_abs, y2_abs, self.color)
+            surface.line(x1_abs, y1_abs, x2_abs, y2_abs, self.color)
 
 
-class FlameParticle:
-    
-    def __init__(self, x, y, dx, dy, color, lifetime, size=1):
-        self.x = x
-        self.y = y
-        self.dx = dx 
-        self.dy = dy 
-        self.color = color
-        self.lifetime = lifetime
-        self.size = size
+class BackgroundLayer:
+    """
+    Camada de fundo pré-renderizada (estrelas e asteroides distantes ou médios).
+
+    Os elementos são desenhados uma única vez numa faixa de um banco de imagem
+    que funciona como um cilindro: rolar a camada só muda qual linha da faixa
+    aparece no topo da tela, e desenhá-la custa no máximo dois blt. A faixa só é
+    redesenhada quando algum elemento dá a volta (sai por baixo e é reposicionado
+    no topo com nova coluna/forma). Nessas camadas os asteroides não giram nem
+    derivam para o lado; na velocidade delas o efeito é quase imperceptível.
+    """
+    IMAGE_BANK = 2 # Banco livre no ship_game.pyxres; as faixas ocupam as linhas 0..175
+    MARGIN = 48 # Linhas da faixa escondidas acima da tela; maior que o maior asteroide de fundo
+
+    def __init__(self, speed, image=None, u=0, v=0, width=128, height=128):
+        self.speed = speed
+        self.image = image # Imagem onde a faixa é desenhada (None no modo headless)
+        self.u = u
+        self.v = v
+        self.width = width
+        self.height = height
+        self.strip_height = height + self.MARGIN
+        self.scroll = 0.0 # Quanto a camada já rolou, em pixels
+        self.items = []
+        self.rows = [] # Linha da faixa onde fica o topo de cada elemento
+        self.wrap_heap = [] # (rolagem em que o elemento dá a volta, índice), o próximo a voltar no topo
+        self.dirty = True
+
+    def add(self, item):
+        """Adiciona um elemento (BackgroundParticle ou BackgroundAsteroid) na posição atual de tela."""
+        top, _ = item.get_extent()
+        # Linha da faixa que, com a rolagem atual, aparece na posição y do elemento
+        row = int(item.y + top + self.MARGIN - int(self.scroll)) % self.strip_height
+        index = len(self.items)
+        self.items.append(item)
+        self.rows.append(row)
+        # O elemento some por baixo quando a rolagem leva a sua linha até o fim da faixa:
+        # a próxima rolagem, a partir da atual, em que scroll + row chega a um múltiplo da faixa
+        scroll = int(self.scroll)
+        heapq.heappush(self.wrap_heap, (scroll + (self.strip_height - row - scroll) % self.strip_height, index))
+        self.dirty = True
 
     def update(self):
-        self.x += self.dx
-        self.y += self.dy
-        self.lifetime -= 1
-        return self.lifetime > 0
+        self.scroll += self.speed
+        scroll = int(self.scroll)
+        wrap_heap = self.wrap_heap
+        while wrap_heap and wrap_heap[0][0] <= scroll:
+            wrap_at, index = heapq.heappop(wrap_heap)
+            # O elemento está inteiramente escondido na margem: pode mudar sem aparecer na tela
+            assert (self.rows[index] + scroll - self.MARGIN) % self.strip_height >= self.height, \
+                "elemento do fundo reposicionado ainda visível"
+            self.items[index].respawn()
+            heapq.heappush(wrap_heap, (wrap_at + self.strip_height, index))
+            self.dirty = True
+
+    def render(self):
+        """Redesenha todos os elementos na faixa."""
+        image = self.image
+        self.dirty = False
+        if image is None:
+            return
+        image.rect(self.u, self.v, self.width, self.strip_height, 0)
+        image.clip(self.u, self.v, self.width, self.strip_height)
+        for item, row in zip(self.items, self.rows):
+            top, bottom = item.get_extent()
+            y = self.v + row - top
+            item.draw_at(image, self.u + item.x, y)
+            # Elemento cortado pelo fim da faixa continua no começo dela
+            if row + bottom - top > self.strip_height:
+                item.draw_at(image, self.u + item.x, y - self.strip_height)
+        image.clip()
 
     def draw(self):
-        if self.lifetime > 0:
-            if self.size == 1:
-                pyxel.pset(self.x, self.y, self.color)
-            else:
-                pyxel.rect(self.x, self.y, self.size, self.size, self.color)
+        if self.image is None:
+            return
+        if self.dirty:
+            self.render()
+        # Linha da faixa que aparece no topo da tela
+        top = (self.MARGIN - int(self.scroll)) % self.strip_height
+        first = min(self.height, self.strip_height - top)
+        pyxel.blt(0, 0, self.image, self.u, self.v + top, self.width, first, 0)
+        if first < self.height:
+            pyxel.blt(0, first, self.image, self.u, self.v, self.width, self.height - first, 0)
+
+
+class StarField:
+    """
+    Estrelas de fundo com movimento analítico: a posição é função só do tempo,
+    y = (y0 + velocidade * t) mod (altura da tela + tamanho). Cada volta pela tela
+    sorteia uma nova coluna com um hash de (semente da estrela, número da volta),
+    então update() só avança o relógio e qualquer instante pode ser recalculado.
+    """
+    def __init__(self, xs, ys, speeds, sizes, colors, seeds, width=128, height=128):
+        # Escalares são replicados para todas as estrelas
+        xs, ys, speeds, sizes, colors, seeds = np.broadcast_arrays(xs, ys, speeds, sizes, colors, seeds)
+        self.x0 = xs.astype(np.int64)
+        self.y0 = ys.astype(np.float64)
+        self.speed = speeds.astype(np.float64)
+        self.size = sizes.astype(np.int64)
+        self.color = colors.astype(np.int32)
+        self.seed = seeds.astype(np.uint64)
+        self.width = width
+        self.height = height
+        self.time = 0
+
+    def __len__(self):
+        return len(self.x0)
+
+    def update(self):
+        self.time += 1
+
+    def positions(self, time=None):
+        """Posições (x, y) de todas as estrelas no instante 'time'."""
+        if time is None:
+            time = self.time
+        # Cada estrela percorre a tela de -tamanho até a altura da tela
+        span = self.height + self.size
+        travel = self.y0 + self.size + self.speed * time
+        laps = np.floor_divide(travel, span).astype(np.int64)
+        ys = travel - laps * span - self.size
+        # Hash (splitmix64) da semente com o número da volta; na primeira volta vale o x inicial
+        h = self.seed + laps.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+        xs = np.where(laps == 0, self.x0, (h % np.uint64(self.width)).astype(np.int64))
+        return xs, ys
+
+    def draw(self):
+        xs, ys = self.positions()
+        ParticleSystem._draw_points(xs, ys, self.color, self.size)
+
 
 class PowerUp:
     def __init__(self, x, y, type):
@@ -1414,61 +3095,124 @@ class HUD:
     """
     Classe dedicada para desenhar a Interface do Usuário (Heads-Up Display).
     Ela lê os dados do objeto 'game' para mostrar informações na tela.
+
+    A HUD é desenhada numa região fora da tela (banco de imagem 2, abaixo das
+    faixas do fundo) e copiada para a tela com um único blt por frame. Cada
+    widget guarda o valor que mostrou da última vez; só quando esse valor muda a
+    região dele é limpa e redesenhada, junto com os widgets que a cruzam (o
+    círculo da arma fica por cima do começo das barras).
     """
-    def __init__(self, game):
+    IMAGE_BANK = 2
+    V = 176 # Linhas 176..215 do banco; as faixas do BackgroundLayer usam 0..175
+    WIDTH, HEIGHT = 128, 40
+    # Widgets na ordem de desenho: (nome, região x, y, largura, altura)
+    WIDGETS = (
+        ('hp', (15, 3, 80, 5)),
+        ('energy', (15, 9, 80, 5)),
+        ('weapon', (0, 0, 17, 17)),
+        ('time', (100, 1, 28, 6)),
+        ('score', (100, 9, 28, 6)),
+        ('category', (100, 25, 28, 6)),
+        ('boost', (100, 33, 28, 6)),
+    )
+
+    def __init__(self, game, image=None):
         # Armazena uma referência ao objeto principal do jogo
         self.game = game
+        self.image = image # Região fora da tela onde a HUD fica pronta (None: desenha direto na tela)
+        self.values = {name: None for name, _ in self.WIDGETS}
+        self.drawn = set() # Widgets que já foram desenhados ao menos uma vez
+        self.redraws = 0   # Regiões redesenhadas desde o início (para conferir o cache)
+        # Para cada widget, os widgets que cruzam a sua região (inclusive ele mesmo), na ordem de desenho
+        self.overlaps = {
+            name: [(other, other_region) for other, other_region in self.WIDGETS
+                   if self._intersects(region, other_region)]
+            for name, region in self.WIDGETS
+        }
+        self.regions = dict(self.WIDGETS)
+
+    @staticmethod
+    def _intersects(a, b):
+        return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+    def _current_values(self):
+        game = self.game
+        return {
+            'hp': (game.player_hp, game.player_max_hp),
+            'energy': (game.player_energy, game.player_max_energy),
+            'weapon': game.current_bullet_type_index,
+            'time': game.game_time,
+            'score': game.score,
+            'category': game.current_enemy_category,
+            # Mostra o tempo restante do boost
+            'boost': game.boost_timer // game.game_fps if game.is_boosting else None,
+        }
 
     def draw(self):
-        # Usa a referência 'self.game' para acessar as propriedades do jogo
-        pyxel.text(100, 1, f"T: {self.game.game_time:02}", 7) # Texto geral: Branco (7)
-        pyxel.text(100, 9, f"SC: {self.game.score}", 7) # Texto geral: Branco (7)
-        
- # --- BARRAS DE HP E ENERGIA ---
-        self.draw_hp_bar()
-        self.draw_energy_bar()
-        
-        # --- ATUALIZAÇÃO DA HUD: MOSTRAR ARMA ATIVA ---
-        # Desenhar o fundo da circunferência com a cor das barras
-        pyxel.circ(8, 8, 8, 1) # Cor 1 (cinza escuro) para o fundo do círculo
-
-        # Desenhar a borda da circunferência no canto superior esquerdo
-        pyxel.circb(8, 8, 8, 7) # Cor 7 (branco) para a borda
-        
-        # Indicar o poder ativo dentro do círculo (aqui, a arma ativa)
-        current_bullet_name = self.game.bullet_type_keys[self.game.current_bullet_type_index].upper()
-        # Pega a primeira letra do nome da arma para exibir no círculo
-        display_char = current_bullet_name[0]
-        
-        # Usa a cor da bala definida em bullet_properties para a letra no círculo
-
-        bullet_display_color = self.game.asset_manager.get_bullet_properties()[current_bullet_name.lower()]['color']
-        
-        # Ajusta a posição da letra no centro do círculo
-        text_x = 9 - pyxel.FONT_WIDTH // 2 
-        text_y = 9 - pyxel.FONT_HEIGHT // 2
-        pyxel.text(text_x, text_y, display_char, bullet_display_color)
-
-
-        # Linha "SHOT:" e nome da arma (mantida)
-       # pyxel.text(1, 17, f"SHOT: {current_bullet_name}", bullet_display_color)
-
-        pyxel.text(100, 25, f"E: {self.game.current_enemy_category.upper()}", 7) # Texto geral: Branco (7)
-
-        # Mostra o tempo restante do boost
-        if self.game.is_boosting:
-            boost_seconds = self.game.boost_timer // self.game.game_fps
-            pyxel.text(100, 33, f"B: {boost_seconds}", 5) # Texto de Boost no HUD: Laranja (5)
-
-       
+        if self.image is None:
+            for name, _ in self.WIDGETS:
+                self.draw_widget(name, pyxel)
+            return
 
-    def draw_hp_bar(self):
+        values = self._current_values()
+        for name, _ in self.WIDGETS:
+            if values[name] != self.values[name] or name not in self.drawn:
+                self.values[name] = values[name]
+                self._redraw_region(name)
+        pyxel.blt(0, 0, self.IMAGE_BANK, 0, self.V, self.WIDTH, self.HEIGHT, 0)
+
+    def _redraw_region(self, name):
+        """Limpa a região do widget na imagem e redesenha tudo o que passa por ela."""
+        image = self.image
+        x, y, width, height = self.regions[name]
+        image.clip(x, self.V + y, width, height)
+        image.rect(x, self.V + y, width, height, 0)
+        # A imagem é deslocada para baixo: desenha com uma "câmera" de V linhas
+        surface = _OffsetSurface(image, 0, self.V)
+        for other, _ in self.overlaps[name]:
+            self.draw_widget(other, surface)
+            self.drawn.add(other)
+        image.clip()
+        self.redraws += 1
+
+    def draw_widget(self, name, surface):
+        """Desenha um widget em 'surface' (o módulo pyxel ou uma imagem com a mesma interface)."""
+        game = self.game
+        if name == 'hp':
+            self.draw_hp_bar(surface)
+        elif name == 'energy':
+            self.draw_energy_bar(surface)
+        elif name == 'weapon':
+            # --- MOSTRAR ARMA ATIVA ---
+            # Desenhar o fundo da circunferência com a cor das barras
+            surface.circ(8, 8, 8, 1) # Cor 1 (cinza escuro) para o fundo do círculo
+            # Desenhar a borda da circunferência no canto superior esquerdo
+            surface.circb(8, 8, 8, 7) # Cor 7 (branco) para a borda
+            # A primeira letra do nome da arma, na cor da bala (tabelas já resolvidas na inicialização)
+            display_char = game.tables.weapon_labels[game.current_bullet_type_index]
+            bullet_display_color = game.tables.weapon_colors[game.current_bullet_type_index]
+            # Ajusta a posição da letra no centro do círculo
+            text_x = 9 - pyxel.FONT_WIDTH // 2
+            text_y = 9 - pyxel.FONT_HEIGHT // 2
+            surface.text(text_x, text_y, display_char, bullet_display_color)
+        elif name == 'time':
+            surface.text(100, 1, f"T: {game.game_time:02}", 7) # Texto geral: Branco (7)
+        elif name == 'score':
+            surface.text(100, 9, f"SC: {game.score}", 7) # Texto geral: Branco (7)
+        elif name == 'category':
+            surface.text(100, 25, f"E: {game.current_enemy_category.upper()}", 7) # Texto geral: Branco (7)
+        elif name == 'boost':
+            if game.is_boosting:
+                boost_seconds = game.boost_timer // game.game_fps
+                surface.text(100, 33, f"B: {boost_seconds}", 5) # Texto de Boost no HUD: Laranja (5)
+
+    def draw_hp_bar(self, surface=pyxel):
         bar_x = 15 # Deslocado para a direita para não colidir com o círculo da arma
         bar_y = 3
         bar_width = 80 # Largura ajustada
         bar_height = 5 # Altura ajustada
 
-        pyxel.rect(bar_x, bar_y, bar_width, bar_height, 1) # Fundo (cinza escuro)
+        surface.rect(bar_x, bar_y, bar_width, bar_height, 1) # Fundo (cinza escuro)
 
         if self.game.player_max_hp > 0:
             hp_ratio = self.game.player_hp / self.game.player_max_hp
@@ -1476,16 +3220,16 @@ class HUD:
             hp_ratio = 0 
 
         current_bar_width = int(bar_width * hp_ratio)
-        pyxel.rect(bar_x, bar_y, current_bar_width, bar_height, 4) # Preenchimento (vermelho)
-        pyxel.rectb(bar_x, bar_y, bar_width, bar_height, 7) # Borda (branco)
+        surface.rect(bar_x, bar_y, current_bar_width, bar_height, 4) # Preenchimento (vermelho)
+        surface.rectb(bar_x, bar_y, bar_width, bar_height, 7) # Borda (branco)
 
-    def draw_energy_bar(self):
+    def draw_energy_bar(self, surface=pyxel):
         bar_x =15 # Deslocado para a direita
         bar_y = 9 # Abaixo da barra de HP
         bar_width = 80 # Largura ajustada
         bar_height = 5 # Altura ajustada
 
-        pyxel.rect(bar_x, bar_y, bar_width, bar_height, 1) # Fundo (cinza escuro)
+        surface.rect(bar_x, bar_y, bar_width, bar_height, 1) # Fundo (cinza escuro)
 
         if self.game.player_max_energy > 0:
             energy_ratio = self.game.player_energy / self.game.player_max_energy
@@ -1493,43 +3237,423 @@ class HUD:
             energy_ratio = 0 
 
         current_bar_width = int(bar_width * energy_ratio)
-        pyxel.rect(bar_x, bar_y, current_bar_width, bar_height, 2) # Preenchimento (azul claro/ciano)
-        pyxel.rectb(bar_x, bar_y, bar_width, bar_height, 7) # Borda (branco)
+        surface.rect(bar_x, bar_y, current_bar_width, bar_height, 2) # Preenchimento (azul claro/ciano)
+        surface.rectb(bar_x, bar_y, bar_width, bar_height, 7) # Borda (branco)
 
 
-class Game:
-    def __init__(self):
-        self.game_fps = 60 
-        pyxel.init(128, 128, title="Space Game", fps=self.game_fps)
-        pyxel.load("shipgame.pyxres")
+class _OffsetSurface:
+    """Repassa as chamadas de desenho para uma imagem, deslocando as coordenadas em (dx, dy)."""
+    def __init__(self, image, dx, dy):
+        self.image = image
+        self.dx = dx
+        self.dy = dy
 
-        self.asset_manager = AssetManager()
+    def rect(self, x, y, w, h, col):
+        self.image.rect(x + self.dx, y + self.dy, w, h, col)
 
-        # --- CONFIGURAÇÃO DA PALETA DE CORES ---
-        # Definindo as cores Pyxel de 0 a 15 de acordo com a paleta fornecida e os novos requisitos
-        
+    def rectb(self, x, y, w, h, col):
+        self.image.rectb(x + self.dx, y + self.dy, w, h, col)
 
-                # Definições de inimigos ajustadas conforme as 6 cores
-        
+    def circ(self, x, y, r, col):
+        self.image.circ(x + self.dx, y + self.dy, r, col)
 
+    def circb(self, x, y, r, col):
+        self.image.circb(x + self.dx, y + self.dy, r, col)
+
+    def text(self, x, y, s, col):
+        self.image.text(x + self.dx, y + self.dy, s, col)
+
+
+class SpatialHash:
+    """
+    Grade uniforme (spatial hash) usada como broadphase de colisão.
+    É reconstruída uma vez por frame com as caixas dos inimigos, e cada consulta
+    devolve apenas os inimigos cujas células se sobrepõem à caixa pesquisada,
+    na mesma ordem em que aparecem na lista original.
+    """
+    def __init__(self, cell_size=16):
+        self.cell_size = cell_size # Tamanho (em pixels) de cada célula da grade
+        self.cells = {}
+        self.items = []
+
+    def clear(self):
+        self.cells.clear()
+        self.items = []
+
+    def rebuild(self, entities):
+        """Reconstrói a grade a partir de uma lista de entidades com get_bounds()."""
+        self.clear()
+        for entity in entities:
+            self.insert(entity, *entity.get_bounds())
+
+    def insert(self, item, x, y, width, height):
+        index = len(self.items)
+        self.items.append(item)
+        cs = self.cell_size
+        cells = self.cells
+        for cx in range(int(x // cs), int((x + width) // cs) + 1):
+            for cy in range(int(y // cs), int((y + height) // cs) + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = [index]
+                else:
+                    bucket.append(index)
+
+    def query(self, x, y, width, height):
+        """Retorna os itens candidatos para a caixa dada, sem duplicatas e na ordem de inserção."""
+        cs = self.cell_size
+        cx0, cx1 = int(x // cs), int((x + width) // cs)
+        cy0, cy1 = int(y // cs), int((y + height) // cs)
+        cells = self.cells
+
+        if cx0 == cx1 and cy0 == cy1:
+            # Caso mais comum: a caixa cabe numa única célula.
+            indices = cells.get((cx0, cy0), ())
+        else:
+            found = set()
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    bucket = cells.get((cx, cy))
+                    if bucket:
+                        found.update(bucket)
+            indices = sorted(found)
+
+        items = self.items
+        return [items[i] for i in indices]
+
+
+class NearestNeighborIndex:
+    """
+    Índice de vizinho mais próximo sobre os centros das entidades (uma grade
+    uniforme). É reconstruído uma vez por frame e responde "qual a entidade mais
+    próxima deste ponto, dentro de um raio, com filtro de tipo" visitando só os
+    anéis de células ao redor do ponto, em vez de percorrer a lista inteira.
+    Em empate de distância vence a entidade que vem antes na lista original.
+    """
+    def __init__(self, cell_size=32):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.items = []
+        self.centers = []
+
+    def clear(self):
+        """Solta as entidades indexadas (o índice só vale dentro do frame em que foi montado)."""
+        self.cells.clear()
+        self.items = []
+        self.centers = []
+
+    def rebuild(self, entities):
+        """Reconstrói o índice com o centro da caixa (get_bounds) de cada entidade."""
+        cs = self.cell_size
+        cells = self.cells
+        cells.clear()
+        self.items = list(entities)
+        self.centers = centers = []
+        for index, entity in enumerate(self.items):
+            x, y, width, height = entity.get_bounds()
+            cx, cy = x + width / 2, y + height / 2
+            centers.append((cx, cy))
+            key = (int(cx // cs), int(cy // cs))
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = [index]
+            else:
+                bucket.append(index)
+
+    def nearest(self, x, y, max_radius, types=None, exclude_types=()):
+        """
+        Retorna a entidade mais próxima de (x, y) a no máximo 'max_radius' pixels,
+        ou None. 'types' restringe aos tipos dados; 'exclude_types' ignora tipos.
+        """
+        cs = self.cell_size
+        cells, items, centers = self.cells, self.items, self.centers
+        home_x, home_y = int(x // cs), int(y // cs)
+        best_index, best_dist_sq = -1, max_radius * max_radius
+
+        for ring in range(int(max_radius // cs) + 2):
+            # Nenhum ponto deste anel pode estar mais perto que (ring - 1) células
+            if ring > 1 and ((ring - 1) * cs) ** 2 > best_dist_sq:
+                break
+            for cx in range(home_x - ring, home_x + ring + 1):
+                # Nas colunas internas, só as duas células das pontas pertencem ao anel
+                step = 1 if cx in (home_x - ring, home_x + ring) else max(2 * ring, 1)
+                for cy in range(home_y - ring, home_y + ring + 1, step):
+                    for index in cells.get((cx, cy), ()):
+                        entity_type = items[index].type
+                        if entity_type in exclude_types or (types is not None and entity_type not in types):
+                            continue
+                        ex, ey = centers[index]
+                        dist_sq = (ex - x) ** 2 + (ey - y) ** 2
+                        if dist_sq < best_dist_sq or (dist_sq == best_dist_sq and (best_index < 0 or index < best_index)):
+                            best_index, best_dist_sq = index, dist_sq
+
+        return items[best_index] if best_index >= 0 else None
+
+
+class ColumnIndex:
+    """
+    Índice de colunas para raios verticais (o laser). Cada entidade entra nas
+    colunas cobertas pela faixa horizontal da sua caixa (get_bounds; nos asteroides,
+    a caixa justa já rotacionada). Uma consulta devolve só as entidades da coluna
+    do raio, ordenadas da borda inferior mais baixa para a mais alta, para que o
+    chamador possa parar assim que nenhum candidato puder vencer o melhor impacto.
+    Várias consultas (vários feixes, laser que atravessa) reusam a mesma reconstrução.
+    """
+    def __init__(self, column_width=8):
+        self.column_width = column_width
+        self.columns = {}
+        self.entries = [] # (borda inferior, posição na lista original, entidade)
+
+    def clear(self):
+        """Esvazia as colunas, chamado depois das consultas de cada disparo."""
+        self.columns.clear()
+        self.entries = []
+
+    def rebuild(self, entities):
+        cw = self.column_width
+        columns = self.columns
+        columns.clear()
+        self.entries = entries = []
+        for index, entity in enumerate(entities):
+            x, y, width, height = entity.get_bounds()
+            entries.append((y + height, index, entity))
+            for column in range(int(x // cw), int((x + width) // cw) + 1):
+                bucket = columns.get(column)
+                if bucket is None:
+                    columns[column] = [index]
+                else:
+                    bucket.append(index)
+
+    def candidates(self, x):
+        """Entidades cuja faixa cobre a coluna x: (borda inferior, índice, entidade), de baixo para cima."""
+        entries = self.entries
+        result = []
+        for index in self.columns.get(int(x // self.column_width), ()):
+            entry = entries[index]
+            x0, _, width, _ = entry[2].get_bounds()
+            if x0 <= x <= x0 + width:
+                result.append(entry)
+        result.sort(key=lambda entry: (-entry[0], entry[1]))
+        return result
+
+
+class FrameProfiler:
+    """
+    Mede o tempo de cada fase do PlayingState.update e do PlayingState.draw.
+    As medições de cada frame, junto com a contagem de entidades, vão para um
+    buffer circular de tamanho fixo. Desligado, begin() e mark() apontam para
+    uma função vazia, então o custo fica em uma chamada de método por fase.
+    """
+    # (nome da fase, rótulo curto usado na sobreposição)
+    PHASES = (
+        ('wave_spawner', 'WAVE'), ('input', 'INPT'), ('background', 'BKGD'),
+        ('flames', 'FLAM'), ('firing', 'FIRE'), ('enemy_update', 'ENMY'),
+        ('bullet_collision', 'BCOL'), ('enemy_bullets', 'EBUL'), ('particles', 'PART'),
+        ('player_collision', 'PCOL'), ('powerups', 'PWUP'),
+        ('draw_background', 'D.BG'), ('draw_actors', 'D.AC'), ('draw_projectiles', 'D.PR'),
+        ('draw_particles', 'D.PT'), ('draw_hud', 'D.HD'),
+    )
+    COUNTERS = ('bullets', 'enemies', 'particles', 'flame_particles')
+    STATS_INTERVAL = 30 # Frames entre recálculos do p50/p99 mostrados na sobreposição
+
+    def __init__(self, history_size=600):
+        self.phase_names = [name for name, _ in self.PHASES]
+        self.phase_index = {name: i for i, name in enumerate(self.phase_names)}
+        self.history_size = history_size
+        self.history = np.zeros((history_size, len(self.PHASES)), dtype=np.float64) # Tempos em ms
+        self.counts = np.zeros((history_size, len(self.COUNTERS)), dtype=np.int64)
+        self.frame_numbers = np.zeros(history_size, dtype=np.int64)
+        self.cursor = 0   # Próxima linha do buffer a ser escrita
+        self.recorded = 0 # Total de frames gravados desde que o profiler foi ligado
+        self._stats = None
+        self._last = 0.0
+        self.set_enabled(False)
+
+    @staticmethod
+    def _noop(*args):
+        pass
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.show_overlay = enabled
+        self.current = [0.0] * len(self.PHASES)
+        if enabled:
+            self.begin, self.mark = self._begin, self._mark
+        else:
+            self.begin, self.mark = self._noop, self._noop
+
+    def toggle(self):
+        self.set_enabled(not self.enabled)
+
+    def _begin(self):
+        self._last = time.perf_counter()
+
+    def _mark(self, phase):
+        """Soma à fase o tempo decorrido desde o begin() ou o mark() anterior."""
+        now = time.perf_counter()
+        self.current[self.phase_index[phase]] += now - self._last
+        self._last = now
+
+    def commit_frame(self, game):
+        """Grava no buffer circular as medições acumuladas do último frame (update + draw)."""
+        if not self.enabled:
+            return
+        row = self.cursor
+        self.history[row] = self.current
+        self.history[row] *= 1000.0
+        self.counts[row] = (len(game.bullets), len(game.enemies), len(game.particles), len(game.flame_particles))
+        self.frame_numbers[row] = rt.frame_count
+        self.cursor = (row + 1) % self.history_size
+        self.recorded += 1
+        self.current = [0.0] * len(self.PHASES)
+        if self.recorded % self.STATS_INTERVAL == 0:
+            self._stats = None
+
+    def _ordered_rows(self):
+        """Índices das linhas válidas do buffer, do frame mais antigo para o mais recente."""
+        if self.recorded < self.history_size:
+            return np.arange(self.recorded)
+        return (np.arange(self.history_size) + self.cursor) % self.history_size
+
+    def stats(self):
+        """Retorna (último, p50, p99) em ms para cada fase."""
+        if self._stats is None:
+            rows = self.history[self._ordered_rows()]
+            if len(rows) == 0:
+                zeros = np.zeros(len(self.PHASES))
+                return zeros, zeros, zeros
+            self._stats = (np.percentile(rows, 50, axis=0), np.percentile(rows, 99, axis=0))
+        last = self.history[(self.cursor - 1) % self.history_size]
+        return (last,) + self._stats
+
+    def draw_overlay(self, loop_stats=None):
+        last, p50, p99 = self.stats()
+        line_h = pyxel.FONT_HEIGHT
+        num_lines = len(self.PHASES) + (4 if loop_stats else 3)
+        pyxel.rect(0, 0, rt.width, num_lines * line_h + 2, 0)
+        pyxel.text(1, 1, "PHASE   MS   P50   P99", 7)
+        y = 1 + line_h
+        for i, (_, label) in enumerate(self.PHASES):
+            pyxel.text(1, y, f"{label} {last[i]:5.2f} {p50[i]:5.2f} {p99[i]:5.2f}", 6)
+            y += line_h
+        num_update = self.phase_index['draw_background']
+        pyxel.text(1, y, f"UPD {last[:num_update].sum():5.2f} DRW {last[num_update:].sum():5.2f}", 15)
+        y += line_h
+        bullets, enemies, particles, flames = self.counts[(self.cursor - 1) % self.history_size]
+        pyxel.text(1, y, f"B{bullets} E{enemies} P{particles} F{flames}", 3)
+        if loop_stats:
+            y += line_h
+            pyxel.text(1, y, f"TPS {loop_stats['ticks_per_second']:.0f} FPS {loop_stats['frames_per_second']:.0f} "
+                             f"x{loop_stats['time_scale']:g}", 10)
+
+    def export_csv(self, path):
+        """Exporta o histórico do buffer para CSV (uma linha por frame, tempos em ms)."""
+        rows = self._ordered_rows()
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame'] + self.phase_names + list(self.COUNTERS))
+            for row in rows:
+                writer.writerow([int(self.frame_numbers[row])] +
+                                [f"{ms:.4f}" for ms in self.history[row]] +
+                                self.counts[row].tolist())
+        return len(rows)
+
+
+class StartupTimer:
+    """
+    Cronometra a inicialização do jogo, fase a fase, até o primeiro frame
+    completo. O tempo até o primeiro frame é comparado com uma meta; acima
+    dela, o relatório é impresso no console para mostrar qual fase pesou.
+    """
+    TARGET_FIRST_FRAME_MS = 250
+
+    def __init__(self, target_ms=TARGET_FIRST_FRAME_MS):
+        self.target_ms = target_ms
+        self.start = self._last = time.perf_counter()
+        self.phases = [] # (nome da fase, ms)
+        self.first_frame_ms = None
+
+    def mark(self, phase):
+        """Fecha a fase 'phase' com o tempo decorrido desde a marcação anterior."""
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000))
+        self._last = now
+
+    def finish_first_frame(self):
+        self.mark('first_frame')
+        self.first_frame_ms = (self._last - self.start) * 1000
+
+    @property
+    def within_target(self):
+        return self.first_frame_ms is not None and self.first_frame_ms <= self.target_ms
+
+    def report(self):
+        lines = [f"{name:<14} {ms:8.2f} ms" for name, ms in self.phases]
+        if self.first_frame_ms is not None:
+            verdict = "ok" if self.within_target else "ACIMA DA META"
+            lines.append(f"{'1º frame':<14} {self.first_frame_ms:8.2f} ms (meta {self.target_ms} ms: {verdict})")
+        return "\n".join(lines)
+
+
+class GameplayHooks:
+    """
+    Pontos de observação da partida, para ferramentas que rodam o jogo de fora
+    (ex.: balance.py). Esta implementação não faz nada; um coletor herda dela e
+    sobrescreve só os eventos que lhe interessam. Os ganchos só observam: não
+    podem alterar o estado do jogo nem consumir o gerador de números aleatórios.
+    """
+    def enemy_damaged(self, enemy, weapon, amount):
+        pass
+
+    def enemy_killed(self, enemy, weapon):
+        pass
+
+    def player_damaged(self, amount, source):
+        pass
+
+    def wave_started(self, category, wave_number):
+        pass
+
+    def wave_cleared(self, category, wave_number):
+        pass
+
+
+class Game:
+    def __init__(self, headless=False, input_source=None, clock=None, rng=None, asset_overrides=None, hooks=None):
+        """
+        Cria o jogo. Com headless=True nenhuma janela é aberta: a entrada, o relógio
+        e o gerador de números aleatórios podem ser injetados, e a simulação é
+        avançada manualmente com step(), sem desenhar nada. 'asset_overrides' é
+        mesclado nos dados do AssetManager antes de qualquer uso (ver apply_overrides).
+        'hooks' (um GameplayHooks) é instalado antes da primeira onda, para que o
+        observador já receba o wave_started dela.
+        """
+        self.startup = StartupTimer()
+        self.game_fps = 60 
+        self.headless = headless
+        set_runtime(Runtime(input_source, clock, rng, width=128, height=128, headless=headless))
+
+        if not headless:
+            pyxel.init(rt.width, rt.height, title="Space Game", fps=self.game_fps)
+            pyxel.load("shipgame.pyxres")
+            self._setup_palette()
+        self.startup.mark('pyxel')
+
+        self.asset_manager = AssetManager()
+        if asset_overrides:
+            self.asset_manager.apply_overrides(asset_overrides)
+        self.tables = AssetTables(self.asset_manager)
+        # Observadores da partida (dano, abates, ondas); o padrão não faz nada
+        self.hooks = hooks if hooks is not None else GameplayHooks()
+        # O que não é preciso para o primeiro frame fica para depois dele (ver frame_update).
+        # Nada aqui pode consumir o gerador de números do jogo, senão os replays mudariam.
+        self._deferred_init = []
+        if headless:
+            self._build_sprite_caches() # Sem janela não há primeiro frame para esperar
+        else:
+            self._deferred_init.append(self._build_sprite_caches)
+        self.startup.mark('assets')
 
-        pyxel.colors[0]  = 0x000000 # 0: Preto
-        pyxel.colors[1]  = 0x999999 # 1: Cinza
-        pyxel.colors[2]  = 0x00FFFF # 2: Ciano (agora definido como Branco)
-        pyxel.colors[3]  = 0x00FF00 # 3: Verde
-        pyxel.colors[4]  = 0xFF0000 # 4: Vermelho
-        pyxel.colors[5]  = 0xFF7500 # 5: Laranja
-        pyxel.colors[6]  = 0xCCCCCC # 6: Cinza Claro
-        pyxel.colors[7]  = 0xFFFFFF # 7: Branco
-        pyxel.colors[8]  = 0xFF00FF # 8: Magenta
-        pyxel.colors[9]  = 0x800080 # 9: Roxo Claro
-        pyxel.colors[10] = 0x4C004C # 10: Roxo Médio
-        pyxel.colors[11] = 0x330033 # 11: Roxo escuro (Teal)
-        pyxel.colors[12] = 0x804000 # 12: Marrom
-        pyxel.colors[13] = 0x4C4C00 # 13: Amarelo Médio
-        pyxel.colors[14] = 0x808000 # 14: Amarelo Claro
-        pyxel.colors[15] = 0xFFFF00 # 15: Amarelo
-        # --- FIM DA CONFIGURAÇÃO DA PALETA DE CORES ---
 
         self.player_hp = 100        # HP inicial do player
         self.player_max_hp = 100    # HP máximo inicial
@@ -1545,16 +3669,15 @@ class Game:
 # Índice para controlar qual padrão está selecionado.
         self.current_movement_pattern_index = 0
 
-        self.player = Player(pyxel.width / 2 - (Player(0,0, self.asset_manager).width // 2), pyxel.height - 16, self.asset_manager)
+        self.player = Player(rt.width / 2 - (Player(0,0, self.asset_manager).width // 2), rt.height - 16, self.asset_manager)
         
         ### NOVO: CONTROLE DE ONDAS E SPAWN ###
         self.wave_number = 1
         self.wave_spawn_timer = 0
         self.wave_spawn_delay = 180 # 3 segundos de delay entre ondas
-        self.enemy_spawn_timer = 0
-        self.enemies_to_spawn = [] # Uma "fila" de inimigos a serem criados
+        self.wave_timeline = WaveTimeline(self.asset_manager, rt.width) # Agenda dos spawns da onda atual
         # Instancia a HUD (Heads-Up Display)
-        self.hud = HUD(self)
+        self.hud = HUD(self, None if headless else pyxel.images[HUD.IMAGE_BANK])
         
         self.state_manager = StateManager(self)
 
@@ -1570,15 +3693,38 @@ class Game:
 
         # Definimos o estado inicial do jogo
         self.state_manager.change_state("playing")
+        self.startup.mark('states')
 
 
         # Listas para gerenciar os objetos do jogo
         self.bullets = []
-        self.particles = [] 
+        # Pool de balas (do jogador e dos inimigos), reaproveitadas em vez de recriadas a cada tiro
+        self.bullet_pool = ObjectPool(Bullet, prealloc=64)
+        # Partículas de efeitos (faíscas/detritos) e de chamas, armazenadas em arrays do NumPy
+        self.fx_rng = rt.rng.fx
+        # Orçamento global de partículas, compartilhado pelas duas listas
+        self.particle_budget = ParticleBudget(cap=20000, frame_budget_ms=1000 / self.game_fps)
+        self._frame_work_ms = 0.0 # Tempo gasto em update + draw no frame atual
+        self.particles = AnalyticParticleSystem(capacity=4096, rng=self.fx_rng, budget=self.particle_budget)
         self.enemies = []
-        self.flame_particles = [] 
+        self.flame_particles = AnalyticParticleSystem(capacity=1024, rng=self.fx_rng, budget=self.particle_budget)
         self.powerups = []
-        self.enemy_bullets = [] # Nova lista para as balas dos inimigos.
+        self.enemy_bullets = EnemyBulletStore(capacity=256) # Balas dos inimigos, em arrays
+
+        self.enemy_index = NearestNeighborIndex(cell_size=32) # Aquisição de alvo dos mísseis teleguiados
+        self.laser_columns = ColumnIndex(column_width=8) # Candidatos do laser por coluna
+        self.enemy_movement = EnemyMovementBatch() # Movimento dos inimigos em grupo, por padrão
+        # Broadphase de colisão bala-inimigo. O tamanho da célula pode ser ajustado conforme a densidade
+        # das ondas em game.enemy_grid.cell_size: a grade é reconstruída a cada frame e já usa o novo valor.
+        self.enemy_grid = SpatialHash(cell_size=16)
+
+        # Profiler de fases do frame (F1 liga a sobreposição, F2 exporta o histórico em CSV)
+        self.profiler = FrameProfiler(history_size=600)
+        self.profiler_csv_path = "frame_profile.csv"
+        # Replay da sessão atual (F3 grava a semente e as teclas de todos os frames até agora)
+        self.replay_path = "last_session.sgrp"
+        # Laço de passo fixo: a simulação roda a game_fps ticks por segundo, independente do desenho (F4 muda a escala de tempo)
+        self.loop = LoopController(tick_rate=self.game_fps)
         # Estado do boost do jogador
         self.is_boosting = False
         self.boost_timer = 0
@@ -1617,42 +3763,49 @@ class Game:
         self.charge_timer = 0
         
         # Nomes dos tipos de bala para alternar - inclui os novos e a reorganização
-        self.bullet_type_keys = list(self.asset_manager.get_bullet_properties().keys())
+        self.bullet_type_keys = self.tables.weapon_names
         self.current_bullet_type_index = 0 
         self.last_shot_frame = {bullet_type: 0 for bullet_type in self.bullet_type_keys} 
         self.is_laser_active = False 
         self.laser_draw_end_y = 0 
         self.laser_spark_point = None
         
-        # Geração das partículas de fundo (estrelas e agora asteroides de fundo)
-        self.background_particles = [] 
-        self.midground_particles = [] 
-        self.foreground_particles = [] 
-
         # Velocidades para as camadas de fundo (estrelas e asteroides de fundo usarão essas)
         self.bg_speed_distant = 0.1
         self.bg_speed_medium = 0.75
         self.bg_speed_close = 3.0
 
+        self.startup.mark('game_objects')
+
+        # Geração das partículas de fundo (estrelas e agora asteroides de fundo)
+        # As camadas distante e média são pré-renderizadas lado a lado no banco de imagem 2
+        strip_image = None if headless else pyxel.images[BackgroundLayer.IMAGE_BANK]
+        self.background_layer = BackgroundLayer(self.bg_speed_distant, strip_image, u=0, width=rt.width, height=rt.height)
+        self.midground_layer = BackgroundLayer(self.bg_speed_medium, strip_image, u=rt.width, width=rt.width, height=rt.height)
+        self.background_layers = (self.background_layer, self.midground_layer)
+
         # Partículas de fundo (estrelas)
         # Distantes: Roxo Escuro (11)
         # Médias: Roxo Médio (10)
         # Próximas: Cinza escuro (1)
         for _ in range(50): 
-            x = pyxel.rndi(0, pyxel.width - 1)
-            y = pyxel.rndi(0, pyxel.height - 1)
-            self.background_particles.append(BackgroundParticle(x, y, self.bg_speed_distant, 1, 11)) 
+            x = rt.rndi(0, rt.width - 1)
+            y = rt.rndi(0, rt.height - 1)
+            self.background_layer.add(BackgroundParticle(x, y, self.bg_speed_distant, 1, 11)) 
 
         for _ in range(30): 
-            x = pyxel.rndi(0, pyxel.width - 1)
-            y = pyxel.rndi(0, pyxel.height - 1)
-            self.midground_particles.append(BackgroundParticle(x, y, self.bg_speed_medium, 1, 10)) 
+            x = rt.rndi(0, rt.width - 1)
+            y = rt.rndi(0, rt.height - 1)
+            self.midground_layer.add(BackgroundParticle(x, y, self.bg_speed_medium, 1, 10)) 
 
+        # Próximas: estrelas analíticas (só o relógio avança a cada frame)
+        star_xs, star_ys, star_sizes = [], [], []
         for _ in range(10): 
-            x = pyxel.rndi(0, pyxel.width - 1)
-            y = pyxel.rndi(0, pyxel.height - 1)
-            size = pyxel.rndi(1, 2)
-            self.foreground_particles.append(BackgroundParticle(x, y, self.bg_speed_close, size, 1)) 
+            star_xs.append(rt.rndi(0, rt.width - 1))
+            star_ys.append(rt.rndi(0, rt.height - 1))
+            star_sizes.append(rt.rndi(1, 2))
+        star_seeds = [rt.rndi(0, 2**31 - 1) for _ in star_xs]
+        self.foreground_stars = StarField(star_xs, star_ys, self.bg_speed_close, star_sizes, 1, star_seeds, rt.width, rt.height)
 
         # --- ADIÇÃO: Asteroides de Fundo ---
         # Asteroides de fundo distantes
@@ -1661,24 +3814,63 @@ class Game:
         # Asteroides de fundo distantes
         for _ in range(5): 
             size = asteroid_sizes['large'] # Usa a variável local
-            x = pyxel.rndi(0, pyxel.width - size)
-            y = pyxel.rndi(0, pyxel.height - size)
-            self.background_particles.append(BackgroundAsteroid(x, y, 'large', self.bg_speed_distant, 11))
+            x = rt.rndi(0, rt.width - size)
+            y = rt.rndi(0, rt.height - size)
+            self.background_layer.add(BackgroundAsteroid(x, y, 'large', self.bg_speed_distant, 11))
 
         for _ in range(5):
             size = asteroid_sizes['medium'] # Usa a variável local
-            x = pyxel.rndi(0, pyxel.width - size)
-            y = pyxel.rndi(0, pyxel.height - size)
-            self.midground_particles.append(BackgroundAsteroid(x, y, 'medium', self.bg_speed_medium, 10))
+            x = rt.rndi(0, rt.width - size)
+            y = rt.rndi(0, rt.height - size)
+            self.midground_layer.add(BackgroundAsteroid(x, y, 'medium', self.bg_speed_medium, 10))
 
             
         
+        self.startup.mark('background')
+
         #self.spawn_enemy_wave() 
         self._setup_wave()
+        self.startup.mark('first_wave')
 
-        pyxel.run(self.update, self.draw) 
+        if not headless:
+            pyxel.run(self.frame_update, self.frame_draw)
+
+
+    def _build_sprite_caches(self):
+        # Tabela de pixels dos sprites para as explosões (a folha de sprites não muda em tempo de execução)
+        self.asset_manager.build_sprite_pixel_tables(Enemy.SPRITE_W, Enemy.SPRITE_H,
+                                                     None if self.headless else pyxel.images[Enemy.SPRITE_BANK])
+        if not self.headless:
+            self.asset_manager.asteroid_sprite_cache = AsteroidSpriteCache(pyxel.images[AsteroidSpriteCache.IMAGE_BANK])
+
+    def run_deferred_init(self):
+        """Roda as etapas da inicialização adiadas para depois do primeiro frame."""
+        start = time.perf_counter()
+        while self._deferred_init:
+            self._deferred_init.pop(0)()
+        self.startup.phases.append(('deferred', (time.perf_counter() - start) * 1000))
+
+    def _setup_palette(self):
+        # --- CONFIGURAÇÃO DA PALETA DE CORES ---
+        # Definindo as cores Pyxel de 0 a 15 de acordo com a paleta fornecida e os novos requisitos
+        pyxel.colors[0]  = 0x000000 # 0: Preto
+        pyxel.colors[1]  = 0x999999 # 1: Cinza
+        pyxel.colors[2]  = 0x00FFFF # 2: Ciano (agora definido como Branco)
+        pyxel.colors[3]  = 0x00FF00 # 3: Verde
+        pyxel.colors[4]  = 0xFF0000 # 4: Vermelho
+        pyxel.colors[5]  = 0xFF7500 # 5: Laranja
+        pyxel.colors[6]  = 0xCCCCCC # 6: Cinza Claro
+        pyxel.colors[7]  = 0xFFFFFF # 7: Branco
+        pyxel.colors[8]  = 0xFF00FF # 8: Magenta
+        pyxel.colors[9]  = 0x800080 # 9: Roxo Claro
+        pyxel.colors[10] = 0x4C004C # 10: Roxo Médio
+        pyxel.colors[11] = 0x330033 # 11: Roxo escuro (Teal)
+        pyxel.colors[12] = 0x804000 # 12: Marrom
+        pyxel.colors[13] = 0x4C4C00 # 13: Amarelo Médio
+        pyxel.colors[14] = 0x808000 # 14: Amarelo Claro
+        pyxel.colors[15] = 0xFFFF00 # 15: Amarelo
+        # --- FIM DA CONFIGURAÇÃO DA PALETA DE CORES ---
 
-    
     def restart_game(self):
         """Reseta o jogo para seu estado inicial."""
         self.player_lives = 3
@@ -1687,12 +3879,16 @@ class Game:
         self.score = 0
         self.state_manager.change_state("playing")
         
-        self.player.x = pyxel.width / 2 - (self.player.width // 2)
-        self.player.y = pyxel.height - 16
+        self.player.x = rt.width / 2 - (self.player.width // 2)
+        self.player.y = rt.height - 16
         self.player.is_alive = True
         self.player.invincibility_timer = 0
         
-        self.bullets, self.particles, self.enemies, self.flame_particles, self.powerups, self.enemy_bullets = [], [], [], [], [], []
+        self.bullet_pool.release_all(self.bullets)
+        self.enemy_bullets.clear()
+        self.bullets, self.enemies, self.powerups = [], [], []
+        self.particles.clear()
+        self.flame_particles.clear()
         
         self.current_enemy_category = 'aliens'
         
@@ -1703,108 +3899,42 @@ class Game:
         self.reset_screen_shake()
 
     def _setup_wave(self):
-        """Prepara a lista de inimigos a serem gerados para a onda atual."""
-        self.enemies_to_spawn = [] # Limpa a fila
-
-        enemy_defs = self.asset_manager.get_enemy_definitions()
-        movement_patterns = self.asset_manager.get_movement_patterns()
-        
-        if self.current_enemy_category == 'aliens':
-            if self.wave_number == 1: # Formação de Grade (Inspirado na Fase 1)
-                pattern = movement_patterns['alien_grid_formation']
-                num_rows, num_cols, spacing_x, spacing_y = 3, 5, 16, 12
-                num_enemy_types = len(self.specific_enemy_types)
-                start_x = (128 - (num_cols * Enemy.SPRITE_W + (num_cols - 1) * spacing_x)) / 2
-                start_y = -((num_rows * Enemy.SPRITE_H) + ((num_rows - 1) * spacing_y))
-                for row in range(num_rows):
-                    for col in range(num_cols):
-                        enemy_random_index = pyxel.rndi(0, num_enemy_types-1)
-                        enemy_type = self.specific_enemy_types[enemy_random_index]
-                        enemy_def = enemy_defs[enemy_type]
-                        x, y = start_x + col * (Enemy.SPRITE_W + spacing_x), start_y + row * (Enemy.SPRITE_H + spacing_y)
-                        self.enemies_to_spawn.append({'x': x, 'y': y, 'type': enemy_type, 'def': enemy_def, 'pattern': pattern, 'delay': 0})
-
-            elif self.wave_number == 2: # Entrada Galaga (Inspirado na Fase 2)
-                pattern = self.asset_manager.get_movement_patterns()['alien_galaga_entry']
-                num_enemies = 8
-                final_positions = [(20 + i * 12, 40) for i in range(num_enemies)] # Posições finais em linha
-                for i in range(num_enemies):
-                    enemy_type = random.choice(self.specific_enemy_types)
-                    enemy_def = enemy_defs[enemy_type]
-                    kwargs = {'final_x': final_positions[i][0], 'final_y': final_positions[i][1]}
-                    self.enemies_to_spawn.append({'x': 0, 'y': -10, 'type': enemy_type, 'def': enemy_def, 'pattern': pattern, 'delay': 30 * i, 'kwargs': kwargs})
-
-            elif self.wave_number == 3: # Entrada Lateral (Inspirado na Fase 3)
-                pattern = self.asset_manager.get_movement_patterns()['alien_side_entry_align']
-                num_enemies = 10
-                final_positions = [(20 + (i % 5) * 18, 20 + (i // 5) * 15) for i in range(num_enemies)] # Grid 2x5
-                for i in range(num_enemies):
-                    enemy_type = random.choice(self.specific_enemy_types)
-                    enemy_def = enemy_defs[enemy_type]
-                    direction = 1 if i % 2 == 0 else -1
-                    kwargs = {'final_x': final_positions[i][0], 'final_y': final_positions[i][1], 'direction': direction}
-                    self.enemies_to_spawn.append({'x': 0, 'y': 0, 'type': enemy_type, 'def': enemy_def, 'pattern': pattern, 'delay': 20 * i, 'kwargs': kwargs})
-            
-            else: # Se acabaram as ondas de aliens, reinicia o ciclo de ondas de aliens
-                self.wave_number = 1
-                self._setup_wave()
-
-        elif self.current_enemy_category == 'asteroids':
-            if self.wave_number == 1:
-                wave_patterns = ['asteroid_slow_drift']
-                num_asteroids = 5
-            elif self.wave_number == 2:
-                wave_patterns = ['asteroid_slow_drift', 'asteroid_fast_fall']
-                num_asteroids = 8
-            else: # Se acabaram as ondas de asteroides, reinicia o ciclo de ondas de asteroides
-                self.wave_number = 1
-                self._setup_wave()
-                return # Retorna para evitar executar o código de spawn abaixo com valores antigos
-
-            for _ in range(num_asteroids):
-                pattern_name = random.choice(wave_patterns)
-                movement_pattern = self.asset_manager.get_movement_patterns()[pattern_name]
-                size_type = random.choice(['medium', 'large'])
-                asteroid_size_ref = self.asset_manager.get_asteroid_sizes()[size_type]
-                x, y = pyxel.rndi(0, pyxel.width - asteroid_size_ref), pyxel.rndi(-40, -20)
-                self.enemies_to_spawn.append({'is_asteroid': True, 'x': x, 'y': y, 'size': size_type, 'pattern': movement_pattern, 'delay': pyxel.rndi(0, 60)})
+        """Agenda os spawns da onda atual (as definições ficam no AssetManager)."""
+        self.wave_number = self.wave_timeline.load(self.current_enemy_category, self.wave_number)
+        self.hooks.wave_started(self.current_enemy_category, self.wave_number)
+
+    def _spawn_from_timeline(self, enemy_data):
+        """Cria o inimigo ou asteroide descrito por um evento da agenda de ondas."""
+        if enemy_data.get('is_asteroid'):
+            return Asteroid(
+                x=enemy_data['x'], y=enemy_data['y'],
+                size_type=enemy_data['size'],
+                movement_pattern=enemy_data['pattern'],
+                asset_manager=self.asset_manager
+            )
+        enemy_def = self.tables.enemy_definitions[enemy_data['type']]
+        return Enemy(
+            x=enemy_data['x'], y=enemy_data['y'], type=enemy_data['type'],
+            color=enemy_def['color'], health=enemy_def['health'],
+            movement_pattern=enemy_data['pattern'], asset_manager=self.asset_manager, **enemy_data.get('kwargs', {})
+        )
 
     def _update_wave_spawner(self):
-        """Verifica se é hora de gerar a próxima onda ou o próximo inimigo da fila."""
-        if not self.enemies and not self.enemies_to_spawn: # Se a tela está limpa e a fila vazia
+        """Verifica se é hora de gerar a próxima onda ou os próximos inimigos da agenda."""
+        timeline = self.wave_timeline
+        timeline.tick()
+        if not self.enemies and not timeline: # Se a tela está limpa e a agenda vazia
             self.wave_spawn_timer += 1
+            if self.wave_spawn_timer == 1:
+                self.hooks.wave_cleared(self.current_enemy_category, self.wave_number)
             if self.wave_spawn_timer > self.wave_spawn_delay:
                 self.wave_number += 1
                 self.wave_spawn_timer = 0
-                self.enemy_spawn_timer = 0
                 self._setup_wave()
-        
-        elif self.enemies_to_spawn:
-            self.enemy_spawn_timer += 1
-            # O primeiro inimigo da fila tem um delay, então verificamos contra ele
-            if self.enemy_spawn_timer >= self.enemies_to_spawn[0]['delay']:
-                enemy_data = self.enemies_to_spawn.pop(0)
-                
-                # Lógica para criar o tipo certo de objeto
-                if enemy_data.get('is_asteroid'):
-                    self.enemies.append(Asteroid(
-                    x=enemy_data['x'], y=enemy_data['y'], 
-                    size_type=enemy_data['size'],
-                    movement_pattern=enemy_data['pattern'],
-                    asset_manager=self.asset_manager
-                    ))
-                    
-                else: # É um inimigo alienígena padrão
-                    kwargs = enemy_data.get('kwargs', {})
-                    self.enemies.append(Enemy(
-                    x=enemy_data['x'], y=enemy_data['y'], type=enemy_data['type'], 
-                    color=enemy_data['def']['color'], health=enemy_data['def']['health'], 
-                    movement_pattern=enemy_data['pattern'], asset_manager=self.asset_manager, **kwargs
-                    ))
-                
-                # Reseta o timer para o delay do próximo inimigo (se houver)
-                if self.enemies_to_spawn:
-                    self.enemy_spawn_timer = 0
+
+        elif timeline:
+            for enemy_data in timeline.due():
+                self.enemies.append(self._spawn_from_timeline(enemy_data))
     
     def spawn_test_enemy(self):
         """Limpa e gera um único inimigo de teste usando o padrão de movimento selecionado."""
@@ -1814,7 +3944,7 @@ class Game:
         enemy_type = self.enemy_types_sequence[self.current_enemy_type_index]
         # CORREÇÃO: Busca e armazena os dados ANTES de usá-los
         enemy_data = self.asset_manager.get_enemy_definitions()[enemy_type]
-        spawn_x, spawn_y = pyxel.width / 2 - Enemy.SPRITE_W / 2, 15
+        spawn_x, spawn_y = rt.width / 2 - Enemy.SPRITE_W / 2, 15
 
         # Pega o NOME do padrão atual usando o índice.
         pattern_name = self.movement_pattern_keys[self.current_movement_pattern_index]
@@ -1828,8 +3958,8 @@ class Game:
         self.enemies.append(new_enemy)
 
     def spawn_powerup(self):
-        powerup_x = pyxel.rndi(0, pyxel.width - PowerUp(0,0,'boost').width)
-        powerup_y = -PowerUp(0,0,'boost').height - pyxel.rndi(10, 30)
+        powerup_x = rt.rndi(0, rt.width - PowerUp(0,0,'boost').width)
+        powerup_y = -PowerUp(0,0,'boost').height - rt.rndi(10, 30)
         self.powerups.append(PowerUp(powerup_x, powerup_y, 'boost'))
 
     # Método auxiliar para detecção de colisão AABB (Axis-Aligned Bounding Box)
@@ -1839,116 +3969,31 @@ class Game:
                 obj1_y < obj2_y + obj2_height and
                 obj1_y + obj1_height > obj2_y)
 
-    # Método auxiliar para detecção de intersecção de linha (usado para laser com asteroides)
-    def _line_intersection(self, p1, p2, p3, p4):
-        x1, y1 = p1; x2, y2 = p2; x3, y3 = p3; x4, y4 = p4
-        den = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
-        if den == 0: return None # Linhas são paralelas ou colineares
-        t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / den
-        u = -((x1 - x2) * (y1 - y3) - (y1 - y2) * (x1 - x3)) / den
-        # Verifica se os pontos de intersecção estão dentro dos segmentos de linha
-        if 0 <= t <= 1 and 0 <= u <= 1:
-            return x1 + t * (x2 - x1), y1 + t * (y2 - y1)
-        return None
-    
-
-    def _is_point_in_polygon(self, point_x, point_y, polygon_vertices):
-        """
-        Verifica se um ponto está dentro de um polígono usando o algoritmo Ray Casting.
-        Retorna True se o ponto estiver dentro, False caso contrário.
-        """
-        num_vertices = len(polygon_vertices)
-        if num_vertices < 3:
-            return False # Não é um polígono válido
-
-        intersections = 0
-        # O "raio" é um segmento de linha que vai do ponto até um ponto bem fora da tela à direita.
-        ray_end_x = pyxel.width + 10 
-
-        for i in range(num_vertices):
-            p1 = polygon_vertices[i]
-            # Garante que a última aresta conecte o último vértice ao primeiro.
-            p2 = polygon_vertices[(i + 1) % num_vertices] 
-
-            # Verifica se o nosso raio imaginário cruza esta aresta do polígono.
-            if self._line_intersection((point_x, point_y), (ray_end_x, point_y), p1, p2):
-                intersections += 1
-        
-        # Se o número de interseções for ímpar, o ponto está dentro.
-        return intersections % 2 == 1
-
-
-    def _check_polygon_collision(self, poly1_vertices, poly2_vertices):
-        """
-        Verifica a colisão entre dois polígonos convexos.
-        Retorna True se houver colisão, False caso contrário.
-        """
-        # Etapa 1: Verificar se alguma aresta do Polígono 1 cruza com alguma do Polígono 2
-        for i in range(len(poly1_vertices)):
-            p1 = poly1_vertices[i]
-            p2 = poly1_vertices[(i + 1) % len(poly1_vertices)] # Aresta do Polígono 1
-
-            for j in range(len(poly2_vertices)):
-                p3 = poly2_vertices[j]
-                p4 = poly2_vertices[(j + 1) % len(poly2_vertices)] # Aresta do Polígono 2
-
-                if self._line_intersection(p1, p2, p3, p4):
-                    return True # Encontrou uma interseção de arestas
-
-        # Etapa 2: Se não houver cruzamento de arestas, verificar se um polígono está dentro do outro.
-        # Basta testar um único ponto de cada polígono.
-        if self._is_point_in_polygon(poly1_vertices[0][0], poly1_vertices[0][1], poly2_vertices):
-            return True
-        
-        if self._is_point_in_polygon(poly2_vertices[0][0], poly2_vertices[0][1], poly1_vertices):
-            return True
-
-        return False
-
-
 
     def create_pixel_explosion(self, enemy):
             """
             Cria uma explosão de "detritos de pixel" baseada no sprite atual do inimigo.
-            Este método lê cada pixel do sprite do inimigo diretamente da folha de sprites (Image Bank)
-            e cria uma partícula para cada um, simulando um efeito de despedaçamento.
+            Usa a tabela de pixels montada pelo AssetManager no carregamento (offsets e
+            cores de cada pixel visível do frame) e cria todas as partículas de uma vez,
+            simulando um efeito de despedaçamento.
             """
-            # Obtém a lista de frames de animação para o tipo específico do inimigo.
-            frames = enemy.animation_data[enemy.type]
-            
-            # Pega as coordenadas (u, v) do frame de animação que estava sendo exibido no momento da destruição.
+            # Pega os pixels do frame de animação que estava sendo exibido no momento da destruição.
             # Isso garante que a explosão corresponda visualmente ao inimigo.
-            u, v = frames[enemy.animation_frame_index]
-            
-            # Itera sobre cada pixel dentro da área do sprite (largura x altura).
-            for y_offset in range(enemy.height):
-                for x_offset in range(enemy.width):
-                    
-                    # --- CORREÇÃO APLICADA AQUI ---
-                    # Usamos `pyxel.image(banco).pget(x, y)` para obter a cor do pixel diretamente da
-                    # folha de sprites (Image Bank), em vez de `pyxel.pget(x, y)` que lê da tela.
-                    # `enemy.SPRITE_BANK` nos dá o número do banco de imagem correto (neste caso, 0).
-                    pixel_color = pyxel.images[enemy.SPRITE_BANK].pget(u + x_offset, v + y_offset)                    
-                    # A cor 0 é a cor de transparência padrão do Pyxel.
-                    # Só criamos partículas para pixels que são visíveis (cor diferente de 0).
-                    if pixel_color != 0:
-                        # Gera uma velocidade aleatória (dx, dy) para a partícula, para que ela se espalhe.
-                        dx = pyxel.rndf(-1.5, 1.5)
-                        dy = pyxel.rndf(-1.5, 1.5)
-                        
-                        # Define um tempo de vida aleatório para a partícula.
-                        lifetime = pyxel.rndi(20, 40)
-                        
-                        # Cria a instância da partícula de detrito de pixel.
-                        particle = PixelDebrisParticle(
-                            enemy.x + x_offset,   # Posição inicial X no mundo do jogo.
-                            enemy.y + y_offset,   # Posição inicial Y no mundo do jogo.
-                            pixel_color,          # A cor que lemos do sprite.
-                            dx, dy,               # A velocidade de espalhamento.
-                            lifetime              # O tempo que a partícula ficará na tela.
-                        )
-                        # Adiciona a nova partícula à lista de partículas do jogo para ser atualizada e desenhada.
-                        self.particles.append(particle)
+            offsets_x, offsets_y, colors = self.asset_manager.get_sprite_pixel_table(enemy.type, enemy.animation_frame_index)
+
+            # Cria todas as partículas de detrito de uma vez, com velocidade e tempo de vida aleatórios.
+            num_particles = len(colors)
+            rng = self.particles.rng
+            self.particles.spawn(
+                enemy.x + offsets_x,                   # Posição inicial X no mundo do jogo.
+                enemy.y + offsets_y,                   # Posição inicial Y no mundo do jogo.
+                rng.uniform(-1.5, 1.5, num_particles), # A velocidade de espalhamento.
+                rng.uniform(-1.5, 1.5, num_particles),
+                colors,                                # As cores lidas do sprite.
+                rng.integers(20, 41, num_particles),   # O tempo que a partícula ficará na tela.
+                friction=ParticleSystem.DEBRIS_FRICTION,
+                effect='enemy_explosion'
+            )
 
     def create_shatter_effect(self, asteroid):
         """
@@ -1957,48 +4002,46 @@ class Game:
         """
         # Gera uma quantidade menor de partículas para um efeito mais contido.
         num_particles = int((asteroid.width * asteroid.height) / 20)
-        for _ in range(num_particles):
-            # Gera uma posição aleatória dentro da caixa delimitadora do asteroide.
-            px = asteroid.x + pyxel.rndf(0, asteroid.width)
-            py = asteroid.y + pyxel.rndf(0, asteroid.height)
-
-            # Usa velocidades menores para simular poeira em vez de uma explosão.
-            dx = pyxel.rndf(-0.8, 0.8)
-            dy = pyxel.rndf(-0.8, 0.8)
-            lifetime = pyxel.rndi(15, 30)
-            self.particles.append(PixelDebrisParticle(px, py, asteroid.color, dx, dy, lifetime))
-
-
-    def create_hit_sparks(self, x, y, color):
+        rng = self.particles.rng
+        # Posições aleatórias dentro da caixa delimitadora do asteroide e
+        # velocidades menores para simular poeira em vez de uma explosão.
+        self.particles.spawn(
+            asteroid.x + rng.uniform(0, asteroid.width, num_particles),
+            asteroid.y + rng.uniform(0, asteroid.height, num_particles),
+            rng.uniform(-0.8, 0.8, num_particles),
+            rng.uniform(-0.8, 0.8, num_particles),
+            asteroid.color,
+            rng.integers(15, 31, num_particles),
+            friction=ParticleSystem.DEBRIS_FRICTION,
+            effect='shatter_dust'
+        )
+
+
+    def create_hit_sparks(self, x, y, color, effect='hit_spark'):
         """
         Cria um pequeno efeito de faíscas no ponto de impacto de um projétil.
-        Usado para feedback visual quando um tiro atinge um inimigo.
+        Usado para feedback visual quando um tiro atinge um inimigo (ou o jogador,
+        com effect='player_hit', que tem prioridade maior no orçamento de partículas).
         """
+        rng = self.particles.rng
         # Gera um pequeno número de partículas (2 a 3) para o efeito.
-        for _ in range(pyxel.rndi(2, 3)):
-            # Define uma velocidade de espalhamento alta e aleatória.
-            dx = pyxel.rndf(-2, 2)
-            dy = pyxel.rndf(-2, 2)
-            
-            # Define um tempo de vida muito curto (entre 4 e 8 frames).
-            lifetime = pyxel.rndi(4, 8)
-            
-            # Cria a partícula de explosão, que aqui serve como uma faísca.
-            spark = ExplosionParticle(x, y, dx, dy, color, lifetime)
-            
-            # Adiciona a faísca à lista principal de partículas do jogo.
-            self.particles.append(spark)                  
+        num_sparks = int(rng.integers(2, 4))
+        # Velocidade de espalhamento alta e tempo de vida muito curto (entre 4 e 8 frames).
+        self.particles.spawn(x, y, rng.uniform(-2, 2, num_sparks), rng.uniform(-2, 2, num_sparks),
+                             color, rng.integers(4, 9, num_sparks), effect=effect)
 
     def create_asteroid_debris_explosion(self, asteroid):
         """
         Cria uma explosão de detritos que corresponde à forma do asteroide.
         Combina partículas no contorno e no interior para um efeito mais preciso.
         """
+        rng = self.particles.rng
         # Pega os vértices já rotacionados do asteroide.
         rotated_vertices = asteroid.get_rotated_vertices()
         
         # ### 1. GERAÇÃO DE PARTÍCULAS DE CONTORNO ###
         # Itera sobre cada aresta do polígono (de um vértice ao próximo).
+        edge_xs, edge_ys = [], []
         for i in range(len(rotated_vertices)):
             p1 = rotated_vertices[i]
             p2 = rotated_vertices[(i + 1) % len(rotated_vertices)] # Garante que o último vértice se conecte ao primeiro.
@@ -2008,32 +4051,26 @@ class Game:
             # Gera aproximadamente 1 partícula a cada 2 pixels de comprimento da aresta.
             num_particles_on_edge = max(1, int(edge_length / 2))
 
-            for j in range(num_particles_on_edge):
-                # Interpola a posição ao longo da aresta para posicionar a partícula.
-                # j / num_particles_on_edge nos dá uma fração de 0.0 a 1.0.
-                t = j / num_particles_on_edge
-                px = p1[0] + t * (p2[0] - p1[0])
-                py = p1[1] + t * (p2[1] - p1[1])
-                
-                # Cria a partícula de detrito.
-                dx = pyxel.rndf(-1.5, 1.5)
-                dy = pyxel.rndf(-1.5, 1.5)
-                lifetime = pyxel.rndi(25, 45)
-                self.particles.append(PixelDebrisParticle(px, py, asteroid.color, dx, dy, lifetime))
+            # Interpola as posições ao longo da aresta (frações de 0.0 a 1.0).
+            t = np.arange(num_particles_on_edge) / num_particles_on_edge
+            edge_xs.append(p1[0] + t * (p2[0] - p1[0]))
+            edge_ys.append(p1[1] + t * (p2[1] - p1[1]))
+
+        num_edge_particles = sum(len(xs) for xs in edge_xs)
+        self.particles.spawn(np.concatenate(edge_xs), np.concatenate(edge_ys),
+                             rng.uniform(-1.5, 1.5, num_edge_particles), rng.uniform(-1.5, 1.5, num_edge_particles),
+                             asteroid.color, rng.integers(25, 46, num_edge_particles),
+                             friction=ParticleSystem.DEBRIS_FRICTION, effect='asteroid_debris')
 
         # ### 2. GERAÇÃO DE PARTÍCULAS DE PREENCHIMENTO ###
         # Calcula o número de partículas internas com base na área aproximada do asteroide.
         num_interior_particles = int((asteroid.width * asteroid.height) / 4)
-        for _ in range(num_interior_particles):
-            # Gera uma posição aleatória dentro da caixa delimitadora do asteroide.
-            px = asteroid.x + pyxel.rndf(0, asteroid.width)
-            py = asteroid.y + pyxel.rndf(0, asteroid.height)
-
-            # Cria a partícula de detrito.
-            dx = pyxel.rndf(-1.0, 1.0) # Velocidade um pouco menor para o interior.
-            dy = pyxel.rndf(-1.0, 1.0)
-            lifetime = pyxel.rndi(20, 40)
-            self.particles.append(PixelDebrisParticle(px, py, asteroid.color, dx, dy, lifetime))
+        # Posições aleatórias dentro da caixa delimitadora, com velocidade um pouco menor para o interior.
+        self.particles.spawn(asteroid.x + rng.uniform(0, asteroid.width, num_interior_particles),
+                             asteroid.y + rng.uniform(0, asteroid.height, num_interior_particles),
+                             rng.uniform(-1.0, 1.0, num_interior_particles), rng.uniform(-1.0, 1.0, num_interior_particles),
+                             asteroid.color, rng.integers(20, 41, num_interior_particles),
+                             friction=ParticleSystem.DEBRIS_FRICTION, effect='asteroid_debris')
 
     def trigger_screen_shake(self, duration, intensity):
         """Ativa o efeito de screen shake."""
@@ -2047,8 +4084,78 @@ class Game:
         self.shake_offset_x = 0
         self.shake_offset_y = 0
     
+    def frame_update(self):
+        """Callback de update do pyxel: roda os ticks de simulação que o laço de passo fixo pedir."""
+        # A escala de tempo é do laço, não da simulação: não passa pelo rt nem vai para o replay
+        if pyxel.btnp(pyxel.KEY_F4):
+            self.loop.cycle_time_scale()
+        if self._deferred_init and self.startup.first_frame_ms is not None:
+            self.run_deferred_init()
+        for _ in range(self.loop.begin_frame()):
+            self.update()
+
+    def frame_draw(self):
+        """Callback de draw do pyxel: desenha, a não ser que o laço tenha pulado este frame."""
+        if self.loop.draw_this_frame:
+            self.draw()
+            if self.startup.first_frame_ms is None:
+                self.startup.finish_first_frame()
+                if not self.startup.within_target:
+                    print("Inicialização acima da meta:\n" + self.startup.report())
+
     def update(self):
+        """Um tick de simulação (1/game_fps segundo de jogo)."""
+        frame_start = time.perf_counter()
+        # O orçamento de partículas recebe o tempo de trabalho (update + draw) do frame anterior
+        self.particle_budget.observe_frame(self._frame_work_ms)
+        self._frame_work_ms = 0.0
+        self.profiler.commit_frame(self)
+        rt.begin_frame()
+
+        # Teclas de depuração do profiler: F1 liga/desliga, F2 exporta o histórico
+        if rt.btnp(pyxel.KEY_F1):
+            self.profiler.toggle()
+        if rt.btnp(pyxel.KEY_F2):
+            self.profiler.export_csv(self.profiler_csv_path)
+        if rt.btnp(pyxel.KEY_F3) and isinstance(rt.input, RecordingInput):
+            self.save_replay(self.replay_path)
+
         self.state_manager.active_state.update()
+        self._frame_work_ms += (time.perf_counter() - frame_start) * 1000
+
+    def pool_stats(self):
+        """Ocupação dos pools, para ajudar a dimensioná-los."""
+        return {
+            'bullets': self.bullet_pool.stats(),
+            'particles': {'live': len(self.particles), 'capacity': self.particles.capacity, 'high_water': self.particles.high_water},
+            'flame_particles': {'live': len(self.flame_particles), 'capacity': self.flame_particles.capacity, 'high_water': self.flame_particles.high_water},
+            'enemy_bullets': {'live': len(self.enemy_bullets), 'capacity': self.enemy_bullets.capacity, 'high_water': self.enemy_bullets.high_water},
+            'particle_budget': {'cap': self.particle_budget.cap, 'effective_cap': int(self.particle_budget.effective_cap()), 'dropped': self.particle_budget.total_dropped()},
+        }
+
+    def save_replay(self, path):
+        """
+        Grava a sessão atual (semente + teclas de cada frame) num arquivo de replay.
+        Só funciona quando a entrada é uma RecordingInput. Retorna o nº de frames gravados.
+        """
+        if not isinstance(rt.input, RecordingInput):
+            raise RuntimeError("a entrada atual não está sendo gravada")
+        return replay.save(path, rt.rng.seed, rt.input.runs)
+
+    @classmethod
+    def from_replay(cls, path, headless=True):
+        """
+        Cria um jogo que reproduz o replay gravado em 'path': mesma semente e mesmas
+        teclas a cada frame. No modo headless, avance com step(); a sessão refeita
+        é idêntica à original enquanto o código do jogo não mudar.
+        """
+        seed, runs = replay.load(path)
+        return cls(headless=headless, input_source=ReplayInput(runs), rng=SeededRandom(seed))
+
+    def step(self, num_frames=1):
+        """Avança a simulação 'num_frames' frames sem desenhar (usado no modo headless)."""
+        for _ in range(num_frames):
+            self.update()
 
 
         
@@ -2061,24 +4168,27 @@ class Game:
         self.is_laser_active = True
         laser_x = self.player.x + (self.player.width // 2)
         closest_impact_y, closest_target, final_spark_point = 0, None, None
-
-        for enemy in self.enemies:
+        closest_index = -1
+
+        # Só os inimigos cuja faixa horizontal cobre a coluna do laser, do mais baixo para o mais alto.
+        self.laser_columns.rebuild(self.enemies)
+        for bottom, index, enemy in self.laser_columns.candidates(laser_x):
+            # Nenhum candidato restante pode ser atingido antes do alvo atual
+            if bottom < closest_impact_y:
+                break
             if enemy.y + enemy.height > self.player.y: continue
-            impact_y_cand, impact_x_cand = -1, -1
 
             if isinstance(enemy, Asteroid):
-                verts = enemy.get_rotated_vertices()
-                best_y = -1
-                for i in range(enemy.num_vertices):
-                    intersect = self._line_intersection((laser_x, self.player.y), (laser_x, 0), verts[i], verts[(i + 1) % enemy.num_vertices])
-                    if intersect and intersect[1] > best_y:
-                        best_y = intersect[1]
-                if best_y != -1: impact_y_cand, impact_x_cand = best_y, laser_x
-            elif laser_x >= enemy.x and laser_x <= enemy.x + enemy.width:
-                impact_y_cand, impact_x_cand = enemy.y + enemy.height, laser_x
-
-            if impact_y_cand > closest_impact_y:
-                closest_impact_y, closest_target, final_spark_point = impact_y_cand, enemy, (impact_x_cand, impact_y_cand)
+                impact_y_cand = geometry.vertical_segment_hit(enemy.get_world_coords(), laser_x, 0, self.player.y)
+                if impact_y_cand is None: continue
+            else:
+                impact_y_cand = bottom
+
+            # Em empate, vence o inimigo que vem antes na lista (como na varredura linear)
+            if impact_y_cand > closest_impact_y or (impact_y_cand == closest_impact_y and 0 <= index < closest_index):
+                closest_impact_y, closest_target, closest_index = impact_y_cand, enemy, index
+                final_spark_point = (laser_x, impact_y_cand)
+        self.laser_columns.clear() # Não segura inimigos até o próximo disparo
 
         if closest_target:
             damage_to_deal = props['damage_per_frame']
@@ -2087,7 +4197,9 @@ class Game:
 
             # ### MUDANÇA PRINCIPAL ###
             # Verificamos se o dano do laser derrotou o inimigo.
+            self.hooks.enemy_damaged(closest_target, 'red', damage_to_deal)
             if closest_target.take_damage(damage_to_deal):
+                self.hooks.enemy_killed(closest_target, 'red')
                 self.score += 1
                 self.laser_draw_end_y, self.laser_spark_point = closest_impact_y, final_spark_point
                 # Se o inimigo foi derrotado, nós o RETORNAMOS para que o método update() saiba.
@@ -2095,8 +4207,9 @@ class Game:
             
             # Se o inimigo foi atingido mas NÃO foi derrotado, apenas criamos as faíscas.
             self.laser_draw_end_y, self.laser_spark_point = closest_impact_y, final_spark_point
-            spark_color = 4 if pyxel.frame_count % 4 < 2 else 5
-            self.particles.append(ExplosionParticle(final_spark_point[0] + pyxel.rndf(-2, 2), final_spark_point[1] + pyxel.rndf(-2, 2), pyxel.rndf(-1, 1), pyxel.rndf(-1, 1), spark_color, pyxel.rndi(5, 10)))
+            spark_color = 4 if rt.frame_count % 4 < 2 else 5
+            rng = self.particles.rng
+            self.particles.spawn(final_spark_point[0] + rng.uniform(-2, 2), final_spark_point[1] + rng.uniform(-2, 2), rng.uniform(-1, 1), rng.uniform(-1, 1), spark_color, rng.integers(5, 11), effect='laser_spark')
         else:
             self.laser_draw_end_y, self.laser_spark_point = 0, None
         
@@ -2118,9 +4231,9 @@ class Game:
 
         # Fire the projectiles
         for i in range(props['num_shots']):
-            angle = math.radians(props['angles_deg'][i]) + pyxel.rndf(-math.radians(props['spread_deg'])/2, math.radians(props['spread_deg'])/2)
+            angle = math.radians(props['angles_deg'][i]) + rt.rndf(-math.radians(props['spread_deg'])/2, math.radians(props['spread_deg'])/2)
             dx, dy = props['speed'] * math.cos(angle), props['speed'] * math.sin(angle) 
-            self.bullets.append(Bullet(player_center_x, bullet_y, props['color'], self.bullet_type_keys[self.current_bullet_type_index], dx, dy, props['damage'], size['height'], size['width'], behavior, self.flame_particles))
+            self.bullets.append(self.bullet_pool.acquire(player_center_x, bullet_y, props['color'], self.bullet_type_keys[self.current_bullet_type_index], dx, dy, props['damage'], size['height'], size['width'], behavior, self.flame_particles))
         
         # Since there's no burst logic, always return True to indicate a shot was fired
         # and allow the main cooldown in update() to be applied.
@@ -2129,8 +4242,9 @@ class Game:
 
 
     def draw(self):
-
+        draw_start = time.perf_counter()
         self.state_manager.active_state.draw()
+        self._frame_work_ms += (time.perf_counter() - draw_start) * 1000
 
 
 
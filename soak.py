@@ -0,0 +1,215 @@
+"""
+Teste de longa duração (soak) da simulação, sem janela.
+
+Um Game headless é jogado pelo AutopilotInput por muitos frames (horas de
+jogo, milhares de ondas). A cada janela de frames são registrados o custo de
+frame (p50/p99), o tamanho das listas de entidades e dos pools e a memória.
+No fim, a primeira e a última parte da sessão são comparadas para apontar:
+
+    - deriva do custo de frame (o jogo fica mais lento com o tempo);
+    - crescimento das listas de entidades (algo que nunca é removido);
+    - crescimento da memória.
+
+Uso:
+    python soak.py --hours 2                 # 2 horas de jogo (432 mil frames)
+    python soak.py -f 60000 --window 1800 --csv soak.csv
+    python soak.py --tracemalloc             # memória pelo tracemalloc (mais lento, mais preciso)
+    python soak.py --diagnostics             # amostras de vazamento por onda (ver diagnostics.py)
+
+Com algum problema acima dos limites, o script sai com código 1.
+"""
+import argparse
+import csv
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from diagnostics import ENTITY_LISTS, LeakDiagnostics
+from ship_gamev21 import AutopilotInput, FrameClock, Game, GameplayHooks, SeededRandom
+
+
+class WaveCounter(GameplayHooks):
+    def __init__(self):
+        self.cleared = 0
+        self.started = 0
+
+    def wave_started(self, category, wave_number):
+        self.started += 1
+
+    def wave_cleared(self, category, wave_number):
+        self.cleared += 1
+
+
+def entity_counts(game):
+    """Tamanho de cada lista de entidades e do pool de balas."""
+    return {
+        'bullets': len(game.bullets),
+        'enemies': len(game.enemies),
+        'powerups': len(game.powerups),
+        'particles': len(game.particles),
+        'flame_particles': len(game.flame_particles),
+        'enemy_bullets': len(game.enemy_bullets),
+        'bullet_pool_free': game.bullet_pool.stats()['free'],
+    }
+
+
+def memory_kb(traced):
+    """Memória atual: a rastreada pelo tracemalloc, ou o RSS do processo."""
+    if traced:
+        return tracemalloc.get_traced_memory()[0] / 1024
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # Sem /proc: o pico, em KB no Linux
+
+
+def run_soak(frames, window, seed, traced=False, progress=None, diagnostics=False):
+    """
+    Roda a sessão e retorna (linhas, diagnóstico): uma linha (dict) por janela de
+    'window' frames, e o LeakDiagnostics da sessão (ou None, sem 'diagnostics').
+    """
+    clock = FrameClock()
+    bot = AutopilotInput()
+    leaks = None
+    if diagnostics:
+        traced = True # O diagnóstico liga o tracemalloc de qualquer jeito
+        waves = leaks = LeakDiagnostics()
+    else:
+        waves = WaveCounter()
+        if traced:
+            tracemalloc.start()
+    game = Game(headless=True, input_source=bot, clock=clock, rng=SeededRandom(seed), hooks=waves)
+    bot.attach(game)
+    if leaks is not None:
+        leaks.attach(game)
+
+    rows = []
+    frame_times = np.zeros(window)
+    perf_counter = time.perf_counter
+    try:
+        for start in range(0, frames - window + 1, window):
+            for i in range(window):
+                t0 = perf_counter()
+                game.update()
+                frame_times[i] = perf_counter() - t0
+                if leaks is not None:
+                    leaks.end_frame() # Fora da medição: as amostras de onda são lentas
+            row = {'frame': start + window,
+                   'p50_ms': float(np.percentile(frame_times, 50) * 1000),
+                   'p99_ms': float(np.percentile(frame_times, 99) * 1000),
+                   'waves_cleared': waves.cleared,
+                   'memory_kb': memory_kb(traced)}
+            row.update(entity_counts(game))
+            rows.append(row)
+            if progress:
+                progress(row)
+    finally:
+        if leaks is not None:
+            leaks.stop()
+        elif traced:
+            tracemalloc.stop()
+    return rows, leaks
+
+
+def find_drift(rows, threshold, entity_slack, check_timing=True, check_memory=True):
+    """
+    Compara o primeiro quarto das janelas (depois da primeira, que inclui o
+    aquecimento) com o último. Retorna as descrições dos problemas encontrados.
+    """
+    rows = rows[1:]
+    if len(rows) < 4:
+        return []
+    quarter = len(rows) // 4
+    first, last = rows[:quarter], rows[-quarter:]
+
+    def mean(part, key):
+        return sum(row[key] for row in part) / len(part)
+
+    problems = []
+    for key in ('p50_ms', 'p99_ms'):
+        before, after = mean(first, key), mean(last, key)
+        if check_timing and after > before * (1 + threshold):
+            problems.append(f"custo de frame {key}: {before:.3f} -> {after:.3f}")
+    for key in ('bullets', 'enemies', 'powerups', 'particles', 'flame_particles', 'enemy_bullets'):
+        before, after = mean(first, key), mean(last, key)
+        if after > before * (1 + threshold) + entity_slack:
+            problems.append(f"{key}: média {before:.0f} -> {after:.0f}")
+    before, after = mean(first, 'memory_kb'), mean(last, 'memory_kb')
+    if check_memory and after > before * (1 + threshold):
+        problems.append(f"memória: {before:.0f} KB -> {after:.0f} KB")
+    return problems
+
+
+def print_diagnostics(leaks):
+    samples = leaks.samples
+    print(f"Diagnóstico: {len(samples)} amostras, uma por onda limpa")
+    if not samples:
+        return
+    print(f"{'onda':>6} {'frame':>9} " + " ".join(f"{name[:8]:>8}" for name in ENTITY_LISTS) + f" {'inimigos':>8} {'KB':>8}")
+    step = max(1, len(samples) // 10) # No máximo ~10 linhas, espalhadas pela sessão
+    for row in samples[::step] + ([samples[-1]] if (len(samples) - 1) % step else []):
+        instances = row['instances']
+        print(f"{row['waves_cleared']:>6} {row['frame']:>9} " +
+              " ".join(f"{row['entities'][name]:>8}" for name in ENTITY_LISTS) +
+              f" {instances.get('Enemy', 0) + instances.get('Asteroid', 0):>8} {row['traced_kb']:>8.0f}")
+    grown = {name: change for name, change in leaks.growth().items() if change > 0}
+    if grown:
+        print("Cresceu da primeira para a última amostra: " +
+              ", ".join(f"{name} +{change:.0f}" for name, change in sorted(grown.items())))
+    for line in leaks.total_growth(5):
+        print("  " + line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sessão longa headless com o piloto automático.")
+    parser.add_argument('-f', '--frames', type=int, default=60 * 60 * 30, help="frames de jogo (padrão: 30 minutos)")
+    parser.add_argument('--hours', type=float, help="duração em horas de jogo (substitui --frames)")
+    parser.add_argument('--window', type=int, default=3600, help="frames por janela de medição")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--tracemalloc', action='store_true', help="mede a memória com o tracemalloc")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="crescimento relativo tolerado entre o início e o fim (0.25 = 25%%)")
+    parser.add_argument('--entity-slack', type=float, default=50,
+                        help="crescimento absoluto tolerado nas listas de entidades")
+    parser.add_argument('--diagnostics', action='store_true',
+                        help="amostra listas, instâncias, referências penduradas e tracemalloc a cada onda limpa")
+    parser.add_argument('--csv', help="grava as janelas neste arquivo CSV")
+    args = parser.parse_args(argv)
+
+    frames = int(args.hours * 60 * 60 * 60) if args.hours else args.frames
+    print(f"{'frame':>9} {'p50 ms':>7} {'p99 ms':>7} {'ondas':>6} {'balas':>6} {'inim.':>6} "
+          f"{'part.':>6} {'chamas':>6} {'b.inim':>6} {'mem KB':>9}")
+
+    def progress(row):
+        print(f"{row['frame']:>9} {row['p50_ms']:>7.3f} {row['p99_ms']:>7.3f} {row['waves_cleared']:>6} "
+              f"{row['bullets']:>6} {row['enemies']:>6} {row['particles']:>6} {row['flame_particles']:>6} "
+              f"{row['enemy_bullets']:>6} {row['memory_kb']:>9.0f}", flush=True)
+
+    rows, leaks = run_soak(frames, args.window, args.seed, args.tracemalloc, progress, args.diagnostics)
+    if args.csv and rows:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    # Com o tracemalloc ligado os tempos não são confiáveis, e com o diagnóstico a memória
+    # medida inclui as próprias amostras (quem a avalia é o LeakDiagnostics)
+    problems = find_drift(rows, args.threshold, args.entity_slack,
+                          check_timing=not (args.tracemalloc or args.diagnostics), check_memory=leaks is None)
+    if leaks is not None:
+        print_diagnostics(leaks)
+        problems += leaks.problems()
+    for problem in problems:
+        print("DERIVA: " + problem)
+    if not problems:
+        print("Sem deriva acima dos limites.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())